@@ -0,0 +1,64 @@
+# benchmarks/bench_bundle_codecs.py
+# Compara presets/codecs de los miembros del .pmvault (tiempo de export/import y tamaño).
+#
+#   python benchmarks/bench_bundle_codecs.py --entries 20000
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from synthetic import make_vault
+
+from sqlalchemy.orm import sessionmaker
+
+from password_vault.db import build_engine, init_db
+from password_vault.pmvault_bundle import export_unified_pmvault, import_unified_pmvault, CODEC_PRESETS
+
+# Además de los presets, combinaciones sueltas para ver el coste de comprimir dos veces
+EXTRA = {
+    "double-deflate": {"payload.bin": ("deflate", 6)},
+    "sql-bz2": {"vault.sql": ("bz2", 9)},
+}
+
+def _run(Session, key, workdir, label, preset, codecs=None):
+    out = os.path.join(workdir, f"{label}.pmvault")
+    t0 = time.perf_counter()
+    export_unified_pmvault(Session, key, out, preset=preset, codecs=codecs)
+    t_export = time.perf_counter() - t0
+
+    eng = build_engine("sqlite:///" + os.path.join(workdir, f"{label}-import.db"))
+    init_db(eng)
+    dst = sessionmaker(bind=eng, expire_on_commit=False, future=True)
+    t0 = time.perf_counter()
+    import_unified_pmvault(dst, key, out)
+    t_import = time.perf_counter() - t0
+    eng.dispose()
+    return {
+        "label": label,
+        "export_s": round(t_export, 4),
+        "import_s": round(t_import, 4),
+        "size_bytes": os.path.getsize(out),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--entries", type=int, default=20000)
+    ap.add_argument("--json", action="store_true", help="salida JSON en lugar de tabla")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine, Session, key = make_vault("sqlite:///" + os.path.join(workdir, "src.db"), args.entries)
+        results = [_run(Session, key, workdir, name, name) for name in CODEC_PRESETS]
+        results += [_run(Session, key, workdir, name, "balanced", c) for name, c in EXTRA.items()]
+        engine.dispose()
+
+    if args.json:
+        print(json.dumps({"entries": args.entries, "results": results}, indent=2))
+        return
+    print(f"{'codec':<16}{'export s':>10}{'import s':>10}{'MiB':>10}")
+    for r in results:
+        print(f"{r['label']:<16}{r['export_s']:>10.3f}{r['import_s']:>10.3f}{r['size_bytes'] / 2**20:>10.2f}")
+
+if __name__ == "__main__":
+    main()
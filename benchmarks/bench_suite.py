@@ -0,0 +1,219 @@
+# benchmarks/bench_suite.py
+# Suite de benchmarks reproducible sobre vaults sintéticos (ver synthetic.py).
+#
+#   python benchmarks/bench_suite.py --sizes 1000,10000 --out results.json
+#   python benchmarks/bench_suite.py --sizes 1000,10000 --save-baseline
+#   python benchmarks/bench_suite.py --sizes 1000,10000 --baseline benchmarks/baseline.json
+#
+# Mide: unlock (derive_key + verify_master), _load_entries por vista, búsqueda,
+# refresh_table (solo si hay Tk con display), export/import .pmvault y
+# build_sql_dump_string. Los vaults generados se guardan en --cache-dir y se
+# reutilizan (misma semilla => mismos datos). Con --baseline compara el mejor
+# tiempo de cada medida y sale con código 1 si alguna empeora más de --tolerance.
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from functools import partial
+from types import SimpleNamespace
+
+from synthetic import make_vault, bench_key, MASTER, SALT
+
+import sqlalchemy
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+import password_vault.app as app_mod
+from password_vault.db import build_engine, init_db, Entry, Setting
+from password_vault.crypto import derive_key, verify_master
+from password_vault.vaults import VaultHandle
+from password_vault.export_sql import build_sql_dump_string
+from password_vault.pmvault_bundle import export_unified_pmvault, import_unified_pmvault
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+VIEWS = {"vault": "", "favoritos": "Favoritos", "papelera": "Papelera"}
+SEARCHES = {"site": "github", "user": "ana12", "miss": "zzz-sin-resultados"}
+
+def _time(fn, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return {"best_s": round(min(runs), 6), "median_s": round(statistics.median(runs), 6),
+            "runs": [round(r, 6) for r in runs]}
+
+def _vault(cache_dir: str, n: int, seed: int):
+    """Vault sintético de n entradas (se genera solo la primera vez)."""
+    path = os.path.join(cache_dir, f"vault-{n}-{seed}.db")
+    url = "sqlite:///" + path
+    if os.path.exists(path):
+        engine = build_engine(url)
+        init_db(engine)
+        Session = sessionmaker(bind=engine, expire_on_commit=False, future=True)
+        with Session() as s:
+            if s.execute(select(func.count()).select_from(Entry)).scalar() == n:
+                return engine, Session
+        engine.dispose()
+        os.remove(path)
+    engine, Session, _ = make_vault(url, n, seed)
+    return engine, Session
+
+def _app_stub(query: str, vault):
+    """Lo mínimo de PasswordVaultApp que usan _load_entries/refresh_table (vault sellado o no)."""
+    stub = SimpleNamespace(search_var=SimpleNamespace(get=lambda: query), vault=vault,
+                           page=0, _page_total=0,
+                           pager=SimpleNamespace(pack=lambda **kw: None, pack_forget=lambda: None))
+    for name in ("_load_entries", "_load_sealed_page", "_filter_entries", "_refresh_table", "_insert_rows"):
+        setattr(stub, name, partial(getattr(app_mod.PasswordVaultApp, name), stub))
+    return stub
+
+def _tk_tree():
+    """Treeview en una ventana oculta, o None si no hay display."""
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk()
+    except Exception:
+        return None, None
+    root.withdraw()
+    tree = ttk.Treeview(root, columns=("id", "title", "user", "email", "url", "updated"), show="headings")
+    return root, tree
+
+def bench_unlock(repeat: int) -> dict:
+    key = bench_key()
+    with tempfile.TemporaryDirectory() as d:
+        _, Session, _ = make_vault("sqlite:///" + os.path.join(d, "unlock.db"), 0)
+        with Session() as s:
+            verifier = s.query(Setting).first().verifier
+
+    def _unlock():
+        k = derive_key(MASTER, SALT)
+        assert verify_master(k, verifier)
+    return _time(_unlock, repeat)
+
+def bench_size(n: int, args, results: list) -> None:
+    def add(name: str, fn, repeat: int = args.repeat):
+        if any(name.startswith(s) for s in args.skip):
+            return
+        r = {"bench": name, "size": n, **_time(fn, repeat)}
+        results.append(r)
+        print(f"{n:>9} {name:<28}{r['best_s']:>11.4f}{r['median_s']:>11.4f}", flush=True)
+
+    engine, Session = _vault(args.cache_dir, n, args.seed)
+    key = bench_key()
+    # _load_entries/refresh_table usan el vault activo; sin caché de vistas para medir la carga real
+    vault = VaultHandle("bench", str(engine.url), engine, Session, key, cache_size=0)
+
+    for view, q in VIEWS.items():
+        add(f"load_entries.{view}", lambda q=q: app_mod.PasswordVaultApp._load_entries(_app_stub(q, vault)))
+    for label, q in SEARCHES.items():
+        add(f"search.{label}", lambda q=q: app_mod.PasswordVaultApp._load_entries(_app_stub(q, vault)))
+
+    root, tree = _tk_tree()
+    if tree is not None:
+        stub = _app_stub("", vault)
+        stub.tree = tree
+        stub.set_status = lambda msg: None
+        stub._tv_bg = lambda: "#ffffff"
+        stub._alt_row_bg = lambda: "#f5f5f5"
+
+        def _refresh():
+            app_mod.PasswordVaultApp.refresh_table(stub)
+            root.update_idletasks()
+        add("refresh_table", _refresh)
+        root.destroy()
+    elif n == args.sizes[0]:
+        print("          refresh_table omitido: Tk sin display", flush=True)
+
+    add("sql_dump_string", lambda: build_sql_dump_string(Session))
+
+    with tempfile.TemporaryDirectory() as d:
+        out = os.path.join(d, "bench.pmvault")
+        add("export_pmvault", lambda: export_unified_pmvault(Session, key, out))
+        if os.path.exists(out):
+            counter = iter(range(10 ** 6))
+
+            def _import():
+                eng = build_engine("sqlite:///" + os.path.join(d, f"import-{next(counter)}.db"))
+                init_db(eng)
+                import_unified_pmvault(sessionmaker(bind=eng, expire_on_commit=False, future=True), key, out)
+                eng.dispose()
+            add("import_pmvault", _import)
+    engine.dispose()
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """[(bench, size, base_s, now_s, ratio)] de las medidas más lentas que la baseline."""
+    base = {(r["bench"], r["size"]): r["best_s"] for r in baseline.get("results", [])}
+    regressions = []
+    print(f"\n{'size':>9} {'bench':<28}{'base s':>11}{'now s':>11}{'ratio':>8}")
+    for r in results:
+        b = base.get((r["bench"], r["size"]))
+        if not b:
+            continue
+        ratio = r["best_s"] / b
+        flag = "  <-- regresión" if ratio > 1 + tolerance else ""
+        print(f"{r['size']:>9} {r['bench']:<28}{b:>11.4f}{r['best_s']:>11.4f}{ratio:>8.2f}{flag}")
+        if flag:
+            regressions.append((r["bench"], r["size"], b, r["best_s"], ratio))
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks de PasswordVault sobre vaults sintéticos")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="tamaños separados por comas")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--skip", default="", help="prefijos de medidas a omitir (p. ej. import,refresh)")
+    ap.add_argument("--cache-dir", default=os.path.join(HERE, ".cache"))
+    ap.add_argument("--out", help="guarda los resultados en este JSON")
+    ap.add_argument("--baseline", help="compara con este JSON de resultados")
+    ap.add_argument("--save-baseline", action="store_true", help=f"escribe {DEFAULT_BASELINE}")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="empeoramiento admitido (0.25 = 25%%)")
+    args = ap.parse_args()
+    args.sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    args.skip = [x.strip() for x in args.skip.split(",") if x.strip()]
+    os.makedirs(args.cache_dir, exist_ok=True)
+
+    results = []
+    print(f"{'size':>9} {'bench':<28}{'best s':>11}{'median s':>11}")
+    if "unlock" not in args.skip:
+        r = {"bench": "unlock", "size": 0, **bench_unlock(args.repeat)}
+        results.append(r)
+        print(f"{0:>9} {'unlock':<28}{r['best_s']:>11.4f}{r['median_s']:>11.4f}", flush=True)
+    for n in args.sizes:
+        bench_size(n, args, results)
+
+    report = {
+        "meta": {
+            "created": datetime.utcnow().isoformat() + "Z",
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "sizes": args.sizes,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} medidas por encima de la tolerancia")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/synthetic.py
+# Generador de vaults sintéticos (reproducible por semilla) para benchmarks.
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from password_vault.db import build_engine, init_db, Entry, Setting
+from password_vault.crypto import derive_key, make_verifier, encrypt_text
+
+MASTER = "benchmark-master"
+SALT = b"pv-benchmark-salt"
+
+_SITES = [
+    "github.com", "gitlab.com", "google.com", "mail.google.com", "amazon.es", "netflix.com",
+    "bank.example.com", "intranet.corp.local", "aws.amazon.com", "login.microsoftonline.com",
+    "twitter.com", "linkedin.com", "reddit.com", "bbva.es", "correos.es", "steamcommunity.com",
+]
+_WORDS = ["trabajo", "personal", "banco", "correo", "nube", "juegos", "compras", "viejo", "2fa", "backup"]
+
+def bench_key() -> bytes:
+    """Clave fija para todos los benchmarks (el coste de scrypt se mide aparte)."""
+    return derive_key(MASTER, SALT)
+
+def _fake_row(rng: random.Random, i: int, key: bytes, now: datetime) -> dict:
+    site = rng.choice(_SITES)
+    user = f"{rng.choice(['ana', 'luis', 'marta', 'dev', 'admin', 'ops'])}{rng.randint(1, 9999)}"
+    pwd = "".join(rng.choice("abcdefghijkLMNOPQ0123456789!@#$%") for _ in range(rng.randint(12, 28)))
+    notes = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(0, 12)))
+    ts = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 3))
+    return {
+        "title": f"{site.split('.')[-2].capitalize()} {i}",
+        "username": user,
+        "email": f"{user}@{rng.choice(['gmail.com', 'outlook.com', 'empresa.es'])}",
+        "url": f"https://{site}/{rng.choice(['login', 'signin', 'account', ''])}",
+        "notes": notes,
+        "password_encrypted": encrypt_text(key, pwd),
+        "created_at": ts,
+        "updated_at": ts,
+        "is_favorite": rng.random() < 0.05,
+        "deleted_at": (ts + timedelta(days=1)) if rng.random() < 0.03 else None,
+    }
+
+def make_vault(url: str, n: int, seed: int = 1234, key: Optional[bytes] = None, batch: int = 5000):
+    """
+    Crea (o amplía) un vault en 'url' con 'n' entradas sintéticas usando el
+    modelo Entry. Devuelve (engine, SessionLocal, key).
+    """
+    key = key or bench_key()
+    engine = build_engine(url)
+    init_db(engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False, future=True)
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1)
+    with Session() as s:
+        if s.query(Setting).first() is None:
+            s.add(Setting(kdf_salt=SALT, verifier=make_verifier(key)))
+            s.commit()
+        rows = []
+        for i in range(n):
+            rows.append(_fake_row(rng, i, key, now))
+            if len(rows) >= batch:
+                s.execute(insert(Entry.__table__), rows)
+                s.commit()
+                rows = []
+        if rows:
+            s.execute(insert(Entry.__table__), rows)
+            s.commit()
+    return engine, Session, key
@@ -0,0 +1,324 @@
+# password_vault/agent.py
+# Agente local: desbloquea una vez (scrypt) y atiende peticiones por un socket Unix
+# con asyncio, manteniendo la clave en memoria y el pool de conexiones caliente.
+# Se bloquea solo (borra la clave y sale) tras 'idle_timeout' segundos sin uso.
+#
+# Protocolo: una línea JSON por petición y otra por respuesta.
+#   -> {"token": "...", "op": "lookup", "url": "https://github.com/login"}
+#   <- {"ok": true, "entries": [{"id": ..., "password": "..."}]}
+# Operaciones: ping, lookup (url), search (text, view, limit), get (ref),
+# copy (ref: copia la contraseña al portapapeles del agente, no la envía), lock.
+#
+# Autenticación: el socket y el archivo de token son 0600 dentro de un directorio
+# 0700; cada petición lleva el token y en Linux se comprueba además el uid del
+# proceso cliente (SO_PEERCRED). Windows no está soportado (sin sockets Unix en asyncio).
+#
+# El cliente (agent_request) solo usa la stdlib: los scripts que lo importan no
+# cargan SQLAlchemy ni cryptography.
+import os
+import sys
+import json
+import hmac
+import time
+import socket
+import struct
+import asyncio
+import signal
+import secrets
+import shutil
+import threading
+import subprocess
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_IDLE_TIMEOUT = 15 * 60     # segundos sin peticiones antes de bloquearse
+CLIPBOARD_CLEAR_AFTER = 20         # igual que "Copiar" en la app
+SEARCH_LIMIT = 50
+
+class AgentError(Exception):
+    pass
+
+def default_paths() -> Tuple[str, str]:
+    """(socket, token). Bajo $XDG_RUNTIME_DIR si existe (las rutas de socket son cortas)."""
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if base:
+        d = os.path.join(base, "passwordvault")
+    else:
+        uid = os.getuid() if hasattr(os, "getuid") else 0
+        d = os.path.join("/tmp", f"passwordvault-{uid}")
+    return os.path.join(d, "agent.sock"), os.path.join(d, "agent.token")
+
+# ===== Cliente =====
+
+def agent_request(op: str, socket_path: Optional[str] = None, token: Optional[str] = None,
+                  timeout: float = 5.0, **params) -> Dict[str, Any]:
+    """Envía una petición al agente y devuelve la respuesta (AgentError si falla)."""
+    sock_default, token_path = default_paths()
+    if socket_path:
+        token_path = os.path.splitext(socket_path)[0] + ".token"
+    socket_path = socket_path or sock_default
+    if token is None:
+        try:
+            with open(token_path, "r", encoding="ascii") as fh:
+                token = fh.read().strip()
+        except OSError:
+            raise AgentError("El agente no está en marcha")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        try:
+            s.connect(socket_path)
+        except OSError:
+            raise AgentError("El agente no está en marcha")
+        s.sendall(json.dumps({"token": token, "op": op, **params}).encode("utf-8") + b"\n")
+        with s.makefile("rb") as fh:
+            line = fh.readline()
+    if not line:
+        raise AgentError("El agente cerró la conexión")
+    resp = json.loads(line.decode("utf-8"))
+    if not resp.get("ok"):
+        raise AgentError(resp.get("error") or "Error del agente")
+    return resp
+
+# ===== Portapapeles sin Tk =====
+
+def _clipboard_cmd() -> Optional[list]:
+    for cmd in (["wl-copy"], ["xclip", "-selection", "clipboard"], ["xsel", "--clipboard", "--input"],
+                ["pbcopy"]):
+        if shutil.which(cmd[0]):
+            return cmd
+    return None
+
+def _set_clipboard(text: str) -> bool:
+    cmd = _clipboard_cmd()
+    if not cmd:
+        return False
+    subprocess.run(cmd, input=text.encode("utf-8"), check=False, timeout=5)
+    return True
+
+# ===== Servidor =====
+
+class VaultAgent:
+    """Atiende peticiones con la clave ya derivada (ver módulo)."""
+    def __init__(self, session_factory, key: bytes, socket_path: Optional[str] = None,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        from .crypto import decrypt_text
+        from .queries import get_entry, iter_entries, lookup_by_url
+        from .sealed import opened
+        self._decrypt = decrypt_text
+        self._get_entry = get_entry
+        self._iter_entries = iter_entries
+        self._lookup = lookup_by_url
+        self._opened = opened
+        self._sf = session_factory
+        self._key: Optional[bytes] = key
+        sock_default, self.token_path = default_paths()
+        self.socket_path = socket_path or sock_default
+        if socket_path:
+            self.token_path = os.path.splitext(socket_path)[0] + ".token"
+        self.idle_timeout = idle_timeout
+        self._token = secrets.token_hex(32)
+        self._last = time.monotonic()
+        self._stopped: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._clients: Dict[asyncio.Task, Any] = {}     # tarea del cliente -> writer
+        # Limpieza pendiente del portapapeles tras un 'copy' (se fuerza al bloquear o salir)
+        self._clip_lock = threading.Lock()
+        self._clip_pending = False
+        self._clip_timer: Optional[asyncio.TimerHandle] = None
+        self._ops = {
+            "lookup": self._op_lookup,
+            "search": self._op_search,
+            "get": self._op_get,
+            "copy": self._op_copy,
+        }
+
+    def run(self) -> None:
+        asyncio.run(self.serve())
+
+    async def serve(self) -> None:
+        if sys.platform == "win32" or not hasattr(asyncio, "start_unix_server"):
+            raise AgentError("El agente necesita sockets Unix (no disponible en Windows)")
+        self._stopped = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._prepare_paths()
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self._write_token()
+        # SIGTERM/SIGHUP bloquean como 'lock' (limpieza del portapapeles incluida)
+        for sig in (signal.SIGTERM, signal.SIGHUP):
+            self._loop.add_signal_handler(sig, self.lock)
+        watchdog = asyncio.create_task(self._idle_watchdog())
+        try:
+            async with server:
+                await self._stopped.wait()
+                await self._close_clients()
+        finally:
+            watchdog.cancel()
+            self._clear_clipboard_now()     # también si se sale con Ctrl+C o por un error
+            for sig in (signal.SIGTERM, signal.SIGHUP):
+                self._loop.remove_signal_handler(sig)
+            self._key = None
+            for p in (self.socket_path, self.token_path):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+
+    def _prepare_paths(self) -> None:
+        d = os.path.dirname(self.socket_path)
+        os.makedirs(d, mode=0o700, exist_ok=True)
+        os.chmod(d, 0o700)
+        try:
+            agent_request("ping", self.socket_path, timeout=0.5)
+        except AgentError:
+            pass
+        else:
+            raise AgentError("Ya hay un agente escuchando en " + self.socket_path)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)   # socket huérfano de un agente anterior
+
+    def _write_token(self) -> None:
+        fd = os.open(self.token_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="ascii") as fh:
+            fh.write(self._token)
+
+    async def _idle_watchdog(self) -> None:
+        while True:
+            remaining = self.idle_timeout - (time.monotonic() - self._last)
+            if remaining <= 0:
+                self.lock()
+                return
+            await asyncio.sleep(min(remaining, 30))
+
+    async def _close_clients(self) -> None:
+        """Cierra las conexiones abiertas y espera a sus tareas (terminan sin cancelarse)."""
+        for writer in list(self._clients.values()):
+            writer.close()
+        if self._clients:
+            await asyncio.gather(*self._clients, return_exceptions=True)
+
+    def lock(self) -> None:
+        self._key = None
+        self._clear_clipboard_now()
+        if self._stopped is not None:
+            self._stopped.set()
+
+    # --- Portapapeles ---
+    def _schedule_clear(self) -> None:
+        """(En el bucle) Programa la limpieza; un 'copy' nuevo reinicia la cuenta."""
+        if self._clip_timer is not None:
+            self._clip_timer.cancel()
+        self._clip_timer = self._loop.call_later(
+            CLIPBOARD_CLEAR_AFTER, lambda: self._loop.run_in_executor(None, self._clear_clipboard))
+
+    def _clear_clipboard(self) -> None:
+        with self._clip_lock:
+            if not self._clip_pending:
+                return
+            self._clip_pending = False
+        _set_clipboard("")
+
+    def _clear_clipboard_now(self) -> None:
+        """Al bloquear o salir: el temporizador ya no llegaría a ejecutarse."""
+        if self._clip_timer is not None:
+            self._clip_timer.cancel()
+            self._clip_timer = None
+        self._clear_clipboard()
+
+    def _peer_allowed(self, writer) -> bool:
+        sock = writer.get_extra_info("socket")
+        if sock is None or not hasattr(socket, "SO_PEERCRED"):
+            return True
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        _, uid, _ = struct.unpack("3i", creds)
+        return uid == os.getuid()
+
+    async def _handle(self, reader, writer) -> None:
+        task = asyncio.current_task()
+        self._clients[task] = writer
+        try:
+            if not self._peer_allowed(writer):
+                return
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._last = time.monotonic()
+                resp = await self._dispatch(line)
+                writer.write(json.dumps(resp, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Cancelada al cerrar el bucle: se cierra la conexión y se propaga
+            writer.close()
+            raise
+        finally:
+            self._clients.pop(task, None)
+            writer.close()
+
+    async def _dispatch(self, line: bytes) -> Dict[str, Any]:
+        try:
+            req = json.loads(line.decode("utf-8"))
+        except ValueError:
+            return {"ok": False, "error": "Petición no válida"}
+        if not hmac.compare_digest(str(req.get("token", "")), self._token):
+            return {"ok": False, "error": "No autorizado"}
+        op = req.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(), "idle_timeout": self.idle_timeout}
+        if op == "lock":
+            self.lock()
+            return {"ok": True}
+        handler = self._ops.get(op)
+        if handler is None:
+            return {"ok": False, "error": f"Operación desconocida: {op}"}
+        if self._key is None:
+            return {"ok": False, "error": "Agente bloqueado"}
+        try:
+            # Las consultas van a un hilo: el bucle sigue atendiendo a otros clientes
+            return {"ok": True, **await asyncio.to_thread(handler, req)}
+        except Exception as ex:
+            return {"ok": False, "error": str(ex)}
+
+    # --- Operaciones (en hilo aparte) ---
+    def _public(self, e) -> Dict[str, Any]:
+        return {"id": e.id, "uid": e.uid, "title": e.title, "username": e.username,
+                "email": e.email, "url": e.url}
+
+    def _secret(self, e) -> Dict[str, Any]:
+        return {**self._public(e), "password": self._decrypt(self._key, e.password_encrypted)}
+
+    def _op_lookup(self, req) -> Dict[str, Any]:
+        url = req.get("url") or ""
+        limit = int(req.get("limit") or 10)
+        if not url:
+            raise AgentError("URL no válida")
+        return {"entries": [self._secret(e) for e in self._lookup(self._sf, url, limit, key=self._key)]}
+
+    def _op_search(self, req) -> Dict[str, Any]:
+        limit = int(req.get("limit") or SEARCH_LIMIT)
+        out = []
+        for e in self._iter_entries(self._sf, req.get("view") or "vault", req.get("text"), key=self._key):
+            out.append(self._public(e))
+            if len(out) >= limit:
+                break
+        return {"entries": out}
+
+    def _op_get(self, req) -> Dict[str, Any]:
+        e = self._get_entry(self._sf, str(req.get("ref", "")))
+        if e is None:
+            raise AgentError("No existe la entrada")
+        return {"entry": self._secret(self._opened(self._key, e))}
+
+    def _op_copy(self, req) -> Dict[str, Any]:
+        e = self._get_entry(self._sf, str(req.get("ref", "")))
+        if e is None:
+            raise AgentError("No existe la entrada")
+        with self._clip_lock:
+            if not _set_clipboard(self._decrypt(self._key, e.password_encrypted)):
+                raise AgentError("No hay portapapeles disponible (wl-copy, xclip, xsel o pbcopy)")
+            self._clip_pending = True
+        # Se limpia pasado un rato, como en la app; el comando se ejecuta en un hilo para
+        # no parar el bucle del agente
+        self._loop.call_soon_threadsafe(self._schedule_clear)
+        return {"copied": True, "clear_after": CLIPBOARD_CLEAR_AFTER}
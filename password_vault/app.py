@@ -1,20 +1,32 @@
 import os
 import re
+import queue
 import string
 import secrets
+import threading
 import configparser
 from pathlib import Path
 from typing import Optional
 
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 
-from sqlalchemy import select
+from sqlalchemy import func, select
+from sqlalchemy.orm.exc import StaleDataError
 
 from .events import vault_events
-
-from .pmvault_bundle import export_unified_pmvault, import_unified_pmvault
-from .db import SessionLocal, Entry, Setting, init_db
+from . import perf
+from .profiling import ActionProfiler, profiled, DEFAULT_ACTIONS
+
+from .pmvault_bundle import export_unified_pmvault, import_unified_pmvault, browse_pmvault, restore_selected
+from .batch_import import import_many_pmvault
+from .csv_import import import_csv
+from .watcher import ChangeWatcher
+from .db import DATABASE_URL, SessionLocal, Entry, Setting, init_db, engine as _default_engine
+from .vaults import VaultHandle, VaultRegistry
+from .queries import entries_page
+from . import sealed
+from . import attachments
 from .crypto import (
     derive_key, make_verifier, verify_master,
     encrypt_text, decrypt_text
@@ -64,6 +76,36 @@ def _save_theme(theme: str) -> None:
     except Exception:
         pass
 
+# --- Vaults adicionales (sección [vaults]: nombre = URL) ---
+_VAULTS_INI_SECTION = "vaults"
+_DEFAULT_VAULT_NAME = "Principal"
+PAGE_SIZE = 200     # filas por página con metadatos cifrados (solo se descifra la página)
+
+def _load_saved_vaults() -> list:
+    cfg = configparser.ConfigParser()
+    cfg.optionxform = str      # respeta mayúsculas en los nombres
+    try:
+        if _UI_INI_PATH.exists():
+            cfg.read(_UI_INI_PATH, encoding="utf-8")
+            if cfg.has_section(_VAULTS_INI_SECTION):
+                return list(cfg.items(_VAULTS_INI_SECTION))
+    except Exception:
+        pass
+    return []
+
+def _save_vaults(vaults) -> None:
+    try:
+        _UI_INI_PATH.parent.mkdir(parents=True, exist_ok=True)
+        cfg = configparser.ConfigParser()
+        cfg.optionxform = str
+        if _UI_INI_PATH.exists():
+            cfg.read(_UI_INI_PATH, encoding="utf-8")
+        cfg[_VAULTS_INI_SECTION] = {name: url for name, url in vaults}
+        with _UI_INI_PATH.open("w", encoding="utf-8") as f:
+            cfg.write(f)
+    except Exception:
+        pass
+
 # -------- tema y bootstrap --------
 USE_BOOTSTRAP = True
 try:
@@ -204,7 +246,8 @@ class MasterGate:
                 (self.e_pwd2 or self.e_pwd).focus_set()
                 return
             salt = os.urandom(16)
-            key = derive_key(p1, salt)
+            with perf.span("unlock.derive_key"):
+                key = derive_key(p1, salt)
             verifier = make_verifier(key)
             with SessionLocal() as s:
                 s.add(Setting(kdf_salt=salt, verifier=verifier))
@@ -217,7 +260,8 @@ class MasterGate:
             if not st:
                 self.var_msg.set("No hay configuración de bóveda.")
                 return
-            key = derive_key(p1, st.kdf_salt)
+            with perf.span("unlock.derive_key"):
+                key = derive_key(p1, st.kdf_salt)
             if not verify_master(key, st.verifier):
                 self.var_msg.set("Contraseña incorrecta.")
                 self.e_pwd.focus_set()
@@ -335,11 +379,153 @@ class EntryDialog:
 
 # ------------------ App principal ------------------
 
+class BackupBrowser:
+    """Lista las entradas de un .pmvault (solo su índice) y restaura las elegidas."""
+    def __init__(self, master, path: str, entries: list):
+        self.top = (tb.Toplevel(master) if USE_BOOTSTRAP else tk.Toplevel(master))
+        self.top.title(f"Copia: {os.path.basename(path)}")
+        self.top.geometry("760x460")
+        self.entries = entries
+        self.result = None
+
+        Frame = tb.Frame if USE_BOOTSTRAP else ttk.Frame
+        EntryW = tb.Entry if USE_BOOTSTRAP else ttk.Entry
+        Button = tb.Button if USE_BOOTSTRAP else ttk.Button
+        Tree = tb.Treeview if USE_BOOTSTRAP else ttk.Treeview
+
+        frm = Frame(self.top, padding=10); frm.pack(fill="both", expand=True)
+        self.q = tk.StringVar()
+        e = EntryW(frm, textvariable=self.q); e.pack(fill="x")
+        e.bind("<KeyRelease>", lambda ev: self._fill())
+
+        self.tv = Tree(frm, columns=("title", "username", "url"), show="headings", selectmode="extended")
+        for col, txt, w in (("title", "Título", 220), ("username", "Usuario", 180), ("url", "URL", 300)):
+            self.tv.heading(col, text=txt)
+            self.tv.column(col, width=w, anchor="w")
+        self.tv.pack(fill="both", expand=True, pady=8)
+
+        btns = Frame(frm); btns.pack(fill="x")
+        Button(btns, text="Cancelar", command=self.top.destroy).pack(side="right", padx=4)
+        Button(btns, text="Restaurar seleccionadas", command=self._ok,
+               **({"bootstyle": SUCCESS} if USE_BOOTSTRAP else {})).pack(side="right", padx=4)
+        self._fill()
+        self.top.grab_set()
+
+    def _fill(self):
+        self.tv.delete(*self.tv.get_children())
+        q = self.q.get().strip().lower()
+        for d in self.entries:
+            vals = (d.get("title") or "", d.get("username") or "", d.get("url") or "")
+            if q and not any(q in v.lower() for v in vals):
+                continue
+            # Copias con uid repetido (merges de versiones anteriores): se muestra una
+            if d.get("uid") and not self.tv.exists(d["uid"]):
+                self.tv.insert("", "end", iid=d["uid"], values=vals)
+
+    def _ok(self):
+        self.result = list(self.tv.selection())
+        self.top.destroy()
+
+
+class AttachmentsDialog:
+    """Adjuntos de una entrada: añadir, guardar como y eliminar (ver attachments.py)."""
+    def __init__(self, master, session_factory, key: bytes, entry_id: int, title: str):
+        self.top = (tb.Toplevel(master) if USE_BOOTSTRAP else tk.Toplevel(master))
+        self.top.title(f"Adjuntos: {title}")
+        self.top.geometry("560x340")
+        self.sf = session_factory
+        self.key = key
+        self.entry_id = entry_id
+
+        Frame = tb.Frame if USE_BOOTSTRAP else ttk.Frame
+        Button = tb.Button if USE_BOOTSTRAP else ttk.Button
+        Tree = tb.Treeview if USE_BOOTSTRAP else ttk.Treeview
+
+        frm = Frame(self.top, padding=10); frm.pack(fill="both", expand=True)
+        self.tv = Tree(frm, columns=("name", "size", "created"), show="headings", selectmode="browse")
+        for col, txt, w in (("name", "Nombre", 280), ("size", "Tamaño", 90), ("created", "Añadido", 150)):
+            self.tv.heading(col, text=txt)
+            self.tv.column(col, width=w, anchor="w")
+        self.tv.pack(fill="both", expand=True, pady=(0, 8))
+        self.tv.bind("<Double-1>", lambda ev: self._save())
+
+        btns = Frame(frm); btns.pack(fill="x")
+        Button(btns, text="Cerrar", command=self.top.destroy).pack(side="right", padx=4)
+        Button(btns, text="Eliminar", command=self._delete,
+               **({"bootstyle": DANGER} if USE_BOOTSTRAP else {})).pack(side="right", padx=4)
+        Button(btns, text="Guardar como…", command=self._save).pack(side="right", padx=4)
+        Button(btns, text="Añadir…", command=self._add,
+               **({"bootstyle": SUCCESS} if USE_BOOTSTRAP else {})).pack(side="right", padx=4)
+        self._fill()
+        self.top.grab_set()
+
+    def _fill(self):
+        self.tv.delete(*self.tv.get_children())
+        self.names = {}
+        for a in attachments.list_attachments(self.sf, self.key, self.entry_id):
+            self.names[a["id"]] = a["name"]
+            created = a["created_at"].strftime("%Y-%m-%d %H:%M") if a["created_at"] else ""
+            self.tv.insert("", "end", iid=str(a["id"]), values=(a["name"], _human_size(a["size"]), created))
+
+    def _selected(self) -> Optional[int]:
+        sel = self.tv.selection()
+        return int(sel[0]) if sel else None
+
+    def _busy(self, fn, *args):
+        self.top.config(cursor="watch"); self.top.update_idletasks()
+        try:
+            return fn(*args)
+        except Exception as ex:
+            messagebox.showerror("Adjuntos", str(ex), parent=self.top)
+        finally:
+            self.top.config(cursor="")
+
+    def _add(self):
+        paths = filedialog.askopenfilenames(parent=self.top)
+        for path in paths:
+            self._busy(attachments.add_attachment, self.sf, self.key, self.entry_id, path)
+        if paths:
+            self._fill()
+
+    def _save(self):
+        att_id = self._selected()
+        if att_id is None:
+            return
+        path = filedialog.asksaveasfilename(initialfile=self.names.get(att_id, ""), parent=self.top)
+        if path:
+            self._busy(attachments.save_attachment, self.sf, self.key, att_id, path)
+
+    def _delete(self):
+        att_id = self._selected()
+        if att_id is None:
+            return
+        if messagebox.askyesno("Adjuntos", f"¿Eliminar {self.names.get(att_id, '')}?", parent=self.top):
+            self._busy(attachments.delete_attachment, self.sf, att_id)
+            self._fill()
+
+def _human_size(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
 class PasswordVaultApp:
     def __init__(self, root, derived_key: bytes, start_theme: str = _DEFAULT_LIGHT):
         self.root = root
         self.derived_key = derived_key
-        self.key = derived_key          # compat con el resto de métodos
+        # Vaults abiertos: cada uno con su engine, sesión, clave y caché de la vista.
+        # self.key y self.vault.SessionLocal apuntan siempre al activo.
+        self.vaults = VaultRegistry()
+        self.vault = self.vaults.add(VaultHandle(_DEFAULT_VAULT_NAME, DATABASE_URL,
+                                                 _default_engine, SessionLocal, derived_key))
+        self.vault.sealed = sealed.is_enabled(SessionLocal)
+        self.page = 0
+        self._page_total = 0
+        for name, url in _load_saved_vaults():
+            if name != _DEFAULT_VAULT_NAME and not self.vaults.find_url(url):
+                self.vaults.add_url(name, url)
         self.style = (tb.Style() if USE_BOOTSTRAP else ttk.Style())
         self.current_theme = start_theme
 
@@ -359,14 +545,34 @@ class PasswordVaultApp:
         content = self._build_content(main)
         content.pack(side="right", fill="both", expand=True)
 
-        # Suscripción a eventos (después de construir la UI)
-        vault_events.entry_changed.connect(self._on_entry_changed)
+        # Suscripción a eventos (después de construir la UI). Los avisos del mismo
+        # tick de Tk llegan agrupados: un solo refresco por ráfaga.
+        # Referencia débil: una instancia destruida no se queda viva ni recibe avisos.
+        root = self.root
+        vault_events.set_scheduler(lambda cb: root.after(0, cb))
+        vault_events.entries_changed.connect(self._on_entries_changed, weak=True)
+
+        # Cambios de otras instancias/scripts sobre la misma BD
+        self._start_watcher(self.vault)
+
+        # Perfiles cProfile de las próximas acciones (PV_PROFILE=N o Ctrl+F12)
+        self.profiler = ActionProfiler(_user_config_dir() / "profiles",
+                                       vault_size=self._vault_size, on_saved=self._profile_saved)
+        self.root.bind("<Control-F12>", self._arm_profiler)
+        self.root.bind("<F12>", self._toggle_perf)
+        self.root.bind("<Shift-F12>", self._export_perf)
 
         # Carga inicial de la tabla
+        self._render_vault_list()
         self.refresh_table()
         self.set_status("Listo")
         # =======================================================
 
+    @property
+    def key(self) -> Optional[bytes]:
+        """Clave del vault activo."""
+        return self.vault.key
+
     # === Helpers de tema / Treeview (DENTRO de la clase) ===
     def _is_dark(self) -> bool:
         return (self.current_theme or "").lower() in {"darkly"}
@@ -514,6 +720,7 @@ class PasswordVaultApp:
 
 
     # Toggle del botón
+    @profiled("theme")
     def toggle_theme(self):
         new_theme = _DEFAULT_DARK if self.current_theme != _DEFAULT_DARK else _DEFAULT_LIGHT
         self._apply_theme_with_fade(new_theme)
@@ -546,10 +753,154 @@ class PasswordVaultApp:
                          command=lambda t=tag: self._quick_filter(t))
             btn.pack(anchor="w", pady=3)
 
+        Label(box, text="Vaults", font=("Segoe UI", 10, "bold")).pack(anchor="w", pady=(16, 4))
+        self.vault_box = Frame(box)
+        self.vault_box.pack(fill="x")
+        Button(box, text="+ Abrir vault…", width=18,
+               **({"bootstyle": "secondary-outline"} if USE_BOOTSTRAP else {}),
+               command=self.open_vault).pack(anchor="w", pady=(6, 3))
+
         return side
 
+    # --- Vaults ---
+    def _render_vault_list(self):
+        Button = (tb.Button if USE_BOOTSTRAP else ttk.Button)
+        for w in self.vault_box.winfo_children():
+            w.destroy()
+        for h in self.vaults.handles():
+            active = h is self.vault
+            mark = "▸" if active else ("•" if h.unlocked else "🔒")
+            btn = Button(self.vault_box, text=f"{mark} {h.name}", width=18,
+                         **({"bootstyle": PRIMARY if active else SECONDARY} if USE_BOOTSTRAP else {}),
+                         command=lambda n=h.name: self.switch_vault(n))
+            btn.pack(anchor="w", pady=2)
+            btn.bind("<Button-3>", lambda ev, n=h.name: self._vault_menu(ev, n))
+
+    def _vault_menu(self, event, name: str):
+        h = self.vaults.get(name)
+        if h is self.vault:
+            return
+        menu = tk.Menu(self.root, tearoff=0)
+        if h.unlocked:
+            menu.add_command(label="🔒 Bloquear", command=lambda: self._lock_vault(h))
+        if name != _DEFAULT_VAULT_NAME:
+            menu.add_command(label="Quitar de la lista", command=lambda: self._forget_vault(h))
+        try:
+            menu.post(event.x_root, event.y_root)
+        finally:
+            menu.grab_release()
+
+    def _persist_vaults(self):
+        _save_vaults([(h.name, h.url) for h in self.vaults.handles() if h.name != _DEFAULT_VAULT_NAME])
+
+    def _start_watcher(self, vault: VaultHandle):
+        if vault.watcher is None:
+            vault.watcher = ChangeWatcher(vault.SessionLocal)
+            vault.watcher.start(self.root)
+        else:
+            vault.watcher.resume()
+
+    def _unlock_vault(self, vault: VaultHandle) -> bool:
+        """Pide la maestra del vault (y la confirma si es nuevo). Solo aquí se paga scrypt."""
+        try:
+            first_run = vault.needs_setup()
+        except Exception as ex:
+            messagebox.showerror("Error", f"No se pudo abrir {vault.name}: {ex}", parent=self.root)
+            return False
+        prompt = "Nueva contraseña maestra" if first_run else "Contraseña maestra"
+        while True:
+            pwd = simpledialog.askstring(vault.name, f"{prompt} de «{vault.name}»:", show="*", parent=self.root)
+            if not pwd:
+                return False
+            if first_run:
+                pwd2 = simpledialog.askstring(vault.name, "Repite la contraseña:", show="*", parent=self.root)
+                if pwd2 is None:
+                    return False
+                if pwd != pwd2:
+                    messagebox.showerror("Error", "Las contraseñas no coinciden.", parent=self.root)
+                    continue
+            self.root.config(cursor="watch")
+            self.root.update_idletasks()
+            try:
+                with perf.span("unlock.derive_key", vault=vault.name):
+                    ok = vault.unlock(pwd)
+            finally:
+                self.root.config(cursor="")
+            if ok:
+                return True
+            messagebox.showerror("Error", "Contraseña incorrecta.", parent=self.root)
+
+    def switch_vault(self, name: str):
+        """Cambia el vault activo: sin derivar de nuevo la clave ni reconstruir la UI."""
+        target = self.vaults.get(name)
+        if target is self.vault:
+            return
+        if not target.unlocked and not self._unlock_vault(target):
+            return
+        with perf.span("vault.switch", vault=name):
+            current = self.vault
+            current.search_text = self.search_var.get()
+            if current.watcher is not None:
+                current.watcher.pause()
+            self.vault = target
+            self._start_watcher(target)
+            self._hide_edit_panel()
+            self.page = 0
+            self._update_seal_button()
+            self.search_var.set(target.search_text)
+            self.title_label.config(text=target.name if name != _DEFAULT_VAULT_NAME else "Vault")
+            self._render_vault_list()
+            self.refresh_table()
+        self.set_status(f"Vault activo: {name}")
+
+    def open_vault(self):
+        """Abre (o crea) otro archivo de vault SQLite y lo activa."""
+        path = filedialog.asksaveasfilename(
+            title="Abrir o crear vault", defaultextension=".db",
+            filetypes=[("Vault SQLite", ".db"), ("Todos", "*")],
+            confirmoverwrite=False, parent=self.root,
+        )
+        if not path:
+            return
+        url = f"sqlite:///{os.path.abspath(path)}"
+        known = self.vaults.find_url(url)
+        if known is not None:
+            self.switch_vault(known.name)
+            return
+        h = self.vaults.add_url(self.vaults.unique_name(Path(path).stem), url)
+        if not self._unlock_vault(h):
+            self.vaults.remove(h.name)
+            return
+        self._persist_vaults()
+        self.switch_vault(h.name)
+
+    def _lock_vault(self, vault: VaultHandle):
+        if vault.watcher is not None:
+            vault.watcher.stop()
+            vault.watcher = None
+        vault.lock()
+        self._render_vault_list()
+        self.set_status(f"{vault.name} bloqueado")
+
+    def _forget_vault(self, vault: VaultHandle):
+        self.vaults.remove(vault.name)
+        self._persist_vaults()
+        self._render_vault_list()
+
     def _quick_filter(self, text: str):
         self.search_var.set(text)
+        self.page = 0
+        self.refresh_table()
+
+    def _on_search(self):
+        self.page = 0
+        self.refresh_table()
+
+    def _go_page(self, delta: int):
+        page = self.page + delta
+        if page < 0 or page * PAGE_SIZE >= self._page_total:
+            return
+        self.page = page
         self.refresh_table()
 
         # contenido
@@ -567,9 +918,10 @@ class PasswordVaultApp:
         header.pack(fill="x")
         self.header = header
 
-        (tb.Label if USE_BOOTSTRAP else tk.Label)(
+        self.title_label = (tb.Label if USE_BOOTSTRAP else tk.Label)(
             header, text="Vault", font=("Segoe UI", 18, "bold")
-        ).pack(side="left")
+        )
+        self.title_label.pack(side="left")
 
         right = Frame(header)
         right.pack(side="right")
@@ -577,7 +929,7 @@ class PasswordVaultApp:
         self.search_var = (tb.StringVar() if USE_BOOTSTRAP else tk.StringVar())
         self.e_search = EntryW(right, textvariable=self.search_var, width=40)
         self.e_search.pack(side="left", padx=(0, 8))
-        self.e_search.bind("<KeyRelease>", lambda e: self.refresh_table())
+        self.e_search.bind("<KeyRelease>", lambda e: self._on_search())
 
         Button(
             right, text="+ New",
@@ -615,6 +967,14 @@ class PasswordVaultApp:
         Button(toolbar, text="Import",
             **({"bootstyle": SECONDARY} if USE_BOOTSTRAP else {}),
             command=self.import_vault).pack(side="left", padx=4, pady=6)
+        Button(toolbar, text="Explorar copia",
+            **({"bootstyle": SECONDARY} if USE_BOOTSTRAP else {}),
+            command=self.browse_backup).pack(side="left", padx=4, pady=6)
+        self.btn_seal = Button(toolbar, text="",
+            **({"bootstyle": "secondary-outline"} if USE_BOOTSTRAP else {}),
+            command=self.toggle_meta_encryption)
+        self.btn_seal.pack(side="right", padx=4, pady=6)
+        self._update_seal_button()
 
         table_wrap = Frame(cont, padding=(12, 8))
         table_wrap.pack(fill="both", expand=True)
@@ -696,6 +1056,13 @@ class PasswordVaultApp:
 
         status = Frame(cont, padding=(12, 8))
         status.pack(fill="x")
+        # Overlay de rendimiento (PV_PERF=1 o F12; Shift+F12 exporta los spans)
+        self.perf_label = (tb.Label if USE_BOOTSTRAP else ttk.Label)(status, text="", anchor="e")
+        self.perf_label.pack(side="right")
+        # Paginación (solo con metadatos cifrados)
+        self.pager = Frame(status)
+        Button(self.pager, text="◀", width=3, command=lambda: self._go_page(-1)).pack(side="left", padx=2)
+        Button(self.pager, text="▶", width=3, command=lambda: self._go_page(1)).pack(side="left", padx=2)
         self.status_label = (tb.Label if USE_BOOTSTRAP else ttk.Label)(
             status, text="Listo", anchor="w"
         )
@@ -710,31 +1077,110 @@ class PasswordVaultApp:
 
     
 
+    # --- Metadatos cifrados ---
+    def _update_seal_button(self):
+        if hasattr(self, "btn_seal"):
+            self.btn_seal.config(text="🔓 Descifrar metadatos" if self.vault.sealed else "🔒 Cifrar metadatos")
+
+    def toggle_meta_encryption(self):
+        vault = self.vault
+        enabling = not vault.sealed
+        question = (
+            "¿Cifrar título, usuario, correo, URL y notas de todas las entradas?\n"
+            "La búsqueda pasará a ser por palabras (o su comienzo) y la tabla se mostrará por páginas."
+            if enabling else
+            "¿Guardar de nuevo título, usuario, correo, URL y notas en claro?"
+        )
+        if not messagebox.askyesno("Metadatos", question, parent=self.root):
+            return
+
+        def _progress(n: int):
+            self.set_status(f"{'Cifrando' if enabling else 'Descifrando'}… {n} entradas")
+            self.root.update_idletasks()
+
+        try:
+            # Se perfila desde que el usuario confirma (ver add_entry)
+            with self.profiler.capture("meta_encryption"):
+                fn = sealed.enable if enabling else sealed.disable
+                n = fn(vault.SessionLocal, vault.key, progress=_progress)
+                vault.sealed = enabling
+                self.page = 0
+                self._update_seal_button()
+                vault_events.entry_changed.emit(
+                    action="import", entry_id=None,
+                    message=f"{n} entradas {'cifradas' if enabling else 'descifradas'}"
+                )
+                vault_events.flush()
+        except Exception as ex:
+            messagebox.showerror("Error", f"No se pudo completar: {ex}", parent=self.root)
+
+    # --- Rendimiento ---
+    def _vault_size(self) -> int:
+        with self.vault.SessionLocal() as s:
+            return s.execute(select(func.count()).select_from(Entry)).scalar() or 0
+
+    def _arm_profiler(self, event=None):
+        self.profiler.arm(DEFAULT_ACTIONS)
+        self.set_status(f"Perfilando las próximas {DEFAULT_ACTIONS} acciones")
+
+    def _profile_saved(self, path: str, remaining: int):
+        self.set_status(f"Perfil guardado: {os.path.basename(path)} (quedan {remaining})")
+
+    def _toggle_perf(self, event=None):
+        perf.enable(not perf.is_enabled())
+        if perf.is_enabled():
+            self.refresh_table()
+        else:
+            self.perf_label.config(text="")
+        self.set_status("Medición de rendimiento " + ("activada" if perf.is_enabled() else "desactivada"))
+
+    def _update_perf_overlay(self):
+        rec = perf.last("refresh")
+        if not rec:
+            return
+        parts = [f"refresh {rec['ms']:.1f} ms"]
+        for name, label in (("load.query", "query"), ("load.hydrate", "ORM"),
+                            ("load.filter", "filtro"), ("refresh.insert", "tabla")):
+            r = perf.last(name)
+            if r:
+                parts.append(f"{label} {r['ms']:.1f}")
+        parts.append(f"{rec.get('rows', 0)} filas")
+        self.perf_label.config(text=" · ".join(parts))
+
+    def _export_perf(self, event=None):
+        path = filedialog.asksaveasfilename(
+            defaultextension=".jsonl", filetypes=[("JSON lines", ".jsonl")],
+            initialfile="pv-perf.jsonl", parent=self.root,
+        )
+        if path:
+            n = perf.export_jsonl(path)
+            self.set_status(f"{n} spans exportados a {os.path.basename(path)}")
+
     # --- Eventos de dominio ---
-    def _on_entry_changed(self, action: str,
-                          entry_id: Optional[int] = None,
-                          message: Optional[str] = None):
+    def _on_entries_changed(self, changes):
         """
-        Refresca la tabla de forma segura desde el hilo de Tk.
-        - action: 'add' | 'edit' | 'delete' | 'import'
-        - entry_id: opcional
-        - message: opcional para status bar
+        Refresca la tabla una vez por ráfaga de cambios (ya en el hilo de Tk).
+        - changes.actions: {'add', 'edit', 'delete', 'import'}
+        - changes.ids: ids afectados (si se conocen)
+        - changes.message: último mensaje para la barra de estado
         """
-        def _do():
-            # Si hay filtro activo y fue 'add', limpiar para que se vea la nueva fila
-            if action == "add" and (self.search_var.get() or "").strip():
-                self.search_var.set("")
-            self.refresh_table()
-            if message:
-                self.set_status(message)
-            else:
-                self.set_status({
-                    "add": "Añadido",
-                    "edit": "Actualizado",
-                    "delete": "Eliminado",
-                    "import": "Importado"
-                }.get(action, "Listo"))
-        self.root.after(0, _do)   # asegura ejecución en el loop de Tk
+        self.vault.invalidate()
+        # Si hay filtro activo y se añadió algo, limpiar para que se vea la nueva fila
+        if "add" in changes.actions and (self.search_var.get() or "").strip():
+            self.search_var.set("")
+        self.refresh_table()
+        if changes.count > 1:
+            self.set_status(f"{changes.count} cambios")
+        elif changes.message:
+            self.set_status(changes.message)
+        else:
+            action = next(iter(changes.actions), "")
+            self.set_status({
+                "add": "Añadido",
+                "edit": "Actualizado",
+                "delete": "Eliminado",
+                "import": "Importado"
+            }.get(action, "Listo"))
 
     # helpers
     def set_status(self, msg: str):
@@ -774,6 +1220,10 @@ class PasswordVaultApp:
                 self.context_menu.add_command(label="⭐ Añadir a favoritos", command=self._toggle_favorite)
                 self.context_menu.add_command(label="🗑️ Mover a papelera", command=self.delete_entry)
 
+            if current_view != "papelera":
+                self.context_menu.add_separator()
+                self.context_menu.add_command(label="📎 Adjuntos…", command=self.open_attachments)
+
             self.context_menu.post(event.x_root, event.y_root)
 
         finally:
@@ -814,38 +1264,75 @@ class PasswordVaultApp:
             return
         if not messagebox.askyesno("Confirmar", "¿Eliminar esta entrada para siempre?", parent=self.root):
             return
-        with SessionLocal() as s:
-            e = s.get(Entry, eid)
-            if e:
-                s.delete(e)
-                s.commit()
-        self.refresh_table()
-        vault_events.entry_changed.emit(
-            action="delete", entry_id=eid, message="Eliminado permanentemente"
-        )
+        with self.profiler.capture("delete_forever"):
+            with self.vault.SessionLocal() as s:
+                e = s.get(Entry, eid)
+                if e:
+                    s.delete(e)
+                    s.commit()
+            attachments.gc_chunks(self.vault.SessionLocal)     # trozos que solo usaba esta entrada
+            vault_events.entry_changed.emit(
+                action="delete", entry_id=eid, message="Eliminado permanentemente"
+            )
+            vault_events.flush()
 
     
+    @profiled("favorite")
     def _toggle_favorite(self):
         eid = self.selected_id()
         if not eid:
             return
-        with SessionLocal() as s:
+        with self.vault.SessionLocal() as s:
             e = s.get(Entry, eid)
             if not e:
                 return
             e.is_favorite = not e.is_favorite
             s.commit()
-        self.refresh_table()
         vault_events.entry_changed.emit(
             action="edit", entry_id=eid,
             message="Marcado como favorito" if e.is_favorite else "Favorito quitado"
         )
+        vault_events.flush()     # el refresco entra en la misma captura (ver add_entry)
 
     def _load_entries(self):
         q = (self.search_var.get() or "").lower()
-        with SessionLocal() as s:
-            entries = s.execute(select(Entry).order_by(Entry.updated_at.desc())).scalars().all()
+        vault = self.vault
+        if vault.sealed:
+            return self._load_sealed_page(vault, q)
+        # Vista ya cargada (cambio de vault, vuelta a un filtro reciente, fundido de tema)
+        cached = vault.cached_view(q)
+        if cached is not None:
+            return cached
+        with vault.SessionLocal() as s:
+            with perf.span("load.query"):
+                result = s.execute(select(Entry).order_by(Entry.updated_at.desc()))
+            with perf.span("load.hydrate") as sp:
+                entries = result.scalars().all()
+                sp.rows = len(entries)
+
+        with perf.span("load.filter") as sp:
+            entries = self._filter_entries(entries, q)
+            sp.rows = len(entries)
+        vault.cache_view(q, entries)
+        return entries
+
+    def _load_sealed_page(self, vault, q: str):
+        """Metadatos cifrados: filtro por el índice ciego y solo se descifra la página visible."""
+        cache_key = f"{q}\0{self.page}"
+        page = vault.cached_view(cache_key)
+        if page is None:
+            tag = q.strip()
+            view = tag if tag in ("favoritos", "papelera") else "vault"
+            text = None if tag in ("favoritos", "papelera", "todos") else tag
+            with perf.span("load.query") as sp:
+                page = entries_page(vault.SessionLocal, vault.key, view, text,
+                                    offset=self.page * PAGE_SIZE, limit=PAGE_SIZE)
+                sp.rows = len(page[1])
+            vault.cache_view(cache_key, page)
+        self._page_total, entries = page
+        return entries
 
+    def _filter_entries(self, entries, q: str):
         # Filtrar por papelera/favoritos
         tag = q.strip().lower()
         if tag == "favoritos":
@@ -873,10 +1360,18 @@ class PasswordVaultApp:
         return entries
 
 
+    @profiled(lambda self: "search" if (self.search_var.get() or "").strip() else "refresh")
     def refresh_table(self):
+        with perf.span("refresh") as sp:
+            sp.rows = self._refresh_table()
+        if perf.is_enabled():
+            self._update_perf_overlay()
+
+    def _refresh_table(self) -> int:
         # Limpiar la tabla antes de volver a llenar
-        for i in self.tree.get_children():
-            self.tree.delete(i)
+        with perf.span("refresh.clear"):
+            for i in self.tree.get_children():
+                self.tree.delete(i)
 
         # Re-aplica tags de estilo por si cambió el tema
         try:
@@ -887,9 +1382,35 @@ class PasswordVaultApp:
             pass
 
         # Cargar entradas desde la base de datos
-        entries = self._load_entries()
+        with perf.span("refresh.load"):
+            entries = self._load_entries()
 
         # Insertar filas alternando estilos
+        with perf.span("refresh.insert") as sp:
+            self._insert_rows(entries)
+            sp.rows = len(entries)
+
+        # Si no hay entradas, insertar una fila vacía para que se vean las líneas completas
+        if not entries:
+            self.tree.insert(
+                "",
+                "end",
+                values=("", "", "", "", "", ""),
+                tags=("row", "evenrow")
+            )
+
+        # Actualizar la barra de estado
+        if self.vault.sealed:
+            first = self.page * PAGE_SIZE
+            self.set_status(f"{first + 1 if entries else 0}–{first + len(entries)} de {self._page_total} items")
+            self.pager.pack(side="right", padx=(0, 8))
+        else:
+            if hasattr(self, "pager"):
+                self.pager.pack_forget()
+            self.set_status(f"{len(entries)} items")
+        return len(entries)
+
+    def _insert_rows(self, entries):
         for idx, e in enumerate(entries):
             row_tag = "evenrow" if idx % 2 == 0 else "oddrow"
             email = get_email_from_entry(e)
@@ -908,18 +1429,6 @@ class PasswordVaultApp:
                 tags=("row", row_tag)
             )
 
-        # Si no hay entradas, insertar una fila vacía para que se vean las líneas completas
-        if not entries:
-            self.tree.insert(
-                "",
-                "end",
-                values=("", "", "", "", "", ""),
-                tags=("row", "evenrow")
-            )
-
-        # Actualizar la barra de estado
-        self.set_status(f"{len(entries)} items")
-
 
 
     # acciones
@@ -930,22 +1439,27 @@ class PasswordVaultApp:
             return
         d = dlg.result
         try:
-            ct = encrypt_text(self.key, d["password"] or generate_password(16))
-            with SessionLocal() as s:
-                entry = Entry(
-                    title=d["title"],
-                    username=d["username"],  # Usuario
-                    url=d["url"],
-                    notes=d["notes"],
-                    password_encrypted=ct
-                )
-                set_email_on_entry(entry, d["email"])
-                s.add(entry)
-                s.commit()
-                new_id = entry.id
-            # Refresco local + señal
-            self.refresh_table()
-            vault_events.entry_changed.emit(action="add", entry_id=new_id, message="Añadido")
+            # Se perfila la escritura y el refresco, no el tiempo con el diálogo abierto
+            with self.profiler.capture("add"):
+                ct = encrypt_text(self.key, d["password"] or generate_password(16))
+                with self.vault.SessionLocal() as s:
+                    entry = Entry(
+                        title=d["title"],
+                        username=d["username"],  # Usuario
+                        url=d["url"],
+                        notes=d["notes"],
+                        password_encrypted=ct
+                    )
+                    set_email_on_entry(entry, d["email"])
+                    s.add(entry)
+                    if self.vault.sealed:
+                        sealed.seal_entry(s, self.key, entry)
+                    s.commit()
+                    new_id = entry.id
+                # La tabla se refresca en el suscriptor de la señal; flush() lo adelanta
+                # a este tick para que entre en la misma captura
+                vault_events.entry_changed.emit(action="add", entry_id=new_id, message="Añadido")
+                vault_events.flush()
         except Exception as ex:
             messagebox.showerror("Error", f"No se pudo guardar: {ex}", parent=self.root)
 
@@ -954,41 +1468,98 @@ class PasswordVaultApp:
 
 
 
-    def edit_entry(self):
+    def open_attachments(self):
         eid = self.selected_id()
         if not eid:
             messagebox.showerror("Error", "Selecciona una fila.", parent=self.root)
             return
-        with SessionLocal() as s:
+        with self.vault.SessionLocal() as s:
             e = s.get(Entry, eid)
             if not e:
                 messagebox.showerror("Error", "Entrada no encontrada.", parent=self.root)
                 return
-            dlg = EntryDialog(self.root, data={
-                "title": e.title,
-                "username": e.username,
-                "email": get_email_from_entry(e),
-                "url": e.url,
-                "notes": e.notes
-            })
-            self.root.wait_window(dlg.top)
-            if not getattr(dlg, "result", None):
+            title = sealed.opened(self.key, e).title
+        dlg = AttachmentsDialog(self.root, self.vault.SessionLocal, self.key, eid, title)
+        self.root.wait_window(dlg.top)
+
+    def edit_entry(self):
+        eid = self.selected_id()
+        if not eid:
+            messagebox.showerror("Error", "Selecciona una fila.", parent=self.root)
+            return
+        # Foto de la entrada y su versión; la sesión se cierra antes de abrir el diálogo
+        # (no se retiene conexión ni transacción mientras el usuario escribe)
+        with self.vault.SessionLocal() as s:
+            e = s.get(Entry, eid)
+            if not e:
+                messagebox.showerror("Error", "Entrada no encontrada.", parent=self.root)
                 return
-            d = dlg.result
+            v = sealed.opened(self.key, e)
+            version = e.version
+            data = {
+                "title": v.title,
+                "username": v.username,
+                "email": get_email_from_entry(v),
+                "url": v.url,
+                "notes": v.notes
+            }
+        dlg = EntryDialog(self.root, data=data)
+        self.root.wait_window(dlg.top)
+        if not getattr(dlg, "result", None):
+            return
+        try:
+            # Como en add_entry: una captura con la escritura y el refresco
+            with self.profiler.capture("edit"):
+                if self._write_edit(eid, version, dlg.result):
+                    vault_events.entry_changed.emit(action="edit", entry_id=eid, message="Actualizado")
+                    vault_events.flush()
+        except Exception as ex:
+            messagebox.showerror("Error", f"No se pudo actualizar: {ex}", parent=self.root)
+
+    def _write_edit(self, eid: int, version: int, d: dict) -> bool:
+        """
+        Escribe la edición en una transacción corta si la entrada sigue en la versión leída
+        (el UPDATE del ORM lleva además "WHERE version = ..."). Si otro escritor la cambió
+        entretanto (otra ventana, la CLI, una sincronización) se pregunta antes de
+        sobrescribir. Devuelve si se guardó.
+        """
+        while True:
             try:
-                e.title = d["title"]
-                e.username = d["username"]
-                e.url = d["url"]
-                e.notes = d["notes"]
-                set_email_on_entry(e, d["email"])
-                if d["password"]:
-                    e.password_encrypted = encrypt_text(self.key, d["password"])
-                s.commit()
-            except Exception as ex:
-                messagebox.showerror("Error", f"No se pudo actualizar: {ex}", parent=self.root)
-                return
-        self.refresh_table()
-        vault_events.entry_changed.emit(action="edit", entry_id=eid, message="Actualizado")
+                with self.vault.SessionLocal() as s:
+                    e = s.get(Entry, eid)
+                    if not e:
+                        with self.profiler.suspend():
+                            messagebox.showerror("Conflicto", "La entrada se eliminó mientras la editabas.",
+                                                 parent=self.root)
+                        return False
+                    if e.version != version:
+                        raise StaleDataError(f"versión {e.version}, editada {version}")
+                    e.title = d["title"]
+                    e.username = d["username"]
+                    e.url = d["url"]
+                    e.notes = d["notes"]
+                    set_email_on_entry(e, d["email"])
+                    if d["password"]:
+                        e.password_encrypted = encrypt_text(self.key, d["password"])
+                    if self.vault.sealed:
+                        sealed.seal_entry(s, self.key, e)
+                    s.commit()
+                    return True
+            except StaleDataError:
+                with self.profiler.suspend():     # el tiempo de respuesta no cuenta
+                    overwrite = messagebox.askyesno(
+                        "Conflicto",
+                        "La entrada se modificó en otro sitio mientras la editabas.\n"
+                        "¿Sobrescribirla con tus cambios? (No: se descartan)",
+                        parent=self.root)
+                if not overwrite:
+                    vault_events.entry_changed.emit(action="edit", entry_id=eid, message="Edición descartada")
+                    vault_events.flush()
+                    return False
+                # Sobrescribir: se reintenta contra la versión actual
+                with self.vault.SessionLocal() as s:
+                    e = s.get(Entry, eid)
+                    version = e.version if e else version
 
         
     def _save_entry(self):
@@ -1005,7 +1576,7 @@ class PasswordVaultApp:
 
         try:
             ct = encrypt_text(self.key, pwd or generate_password(16))
-            with SessionLocal() as s:
+            with self.vault.SessionLocal() as s:
                 entry = Entry(
                     title=title,
                     username=user,
@@ -1015,9 +1586,10 @@ class PasswordVaultApp:
                 )
                 set_email_on_entry(entry, email)
                 s.add(entry)
+                if self.vault.sealed:
+                    sealed.seal_entry(s, self.key, entry)
                 s.commit()
                 new_id = entry.id
-            self.refresh_table()
             vault_events.entry_changed.emit(action="add", entry_id=new_id, message="Añadido")
             self._hide_edit_panel()
         except Exception as ex:
@@ -1031,52 +1603,61 @@ class PasswordVaultApp:
             messagebox.showerror("Error", "Selecciona una fila.", parent=self.root)
             return
 
-        with SessionLocal() as s:
-            e = s.get(Entry, eid)
-            if not e:
+        # Se confirma antes de abrir la sesión: nada retenido mientras el diálogo está abierto
+        if current_view == "papelera":
+            # Aquí se hace eliminación permanente
+            if not messagebox.askyesno("Confirmar", "¿Eliminar esta entrada para siempre?", parent=self.root):
                 return
+        elif not messagebox.askyesno("Confirmar", "¿Mover esta entrada a la papelera?", parent=self.root):
+            return
 
-            if current_view == "papelera":
-                # Aquí se hace eliminación permanente
-                if messagebox.askyesno("Confirmar", "¿Eliminar esta entrada para siempre?", parent=self.root):
+        with self.profiler.capture("delete"):
+            with self.vault.SessionLocal() as s:
+                e = s.get(Entry, eid)
+                if not e:
+                    return
+                if current_view == "papelera":
                     s.delete(e)
                     s.commit()
-                    self.refresh_table()
-                    vault_events.entry_changed.emit(action="delete", entry_id=eid, message="Eliminado permanentemente")
-            else:
-                # Mover a papelera
-                if messagebox.askyesno("Confirmar", "¿Mover esta entrada a la papelera?", parent=self.root):
+                    message = "Eliminado permanentemente"
+                else:
+                    # Mover a papelera
                     from datetime import datetime
                     e.deleted_at = datetime.utcnow()
                     s.commit()
-                    self.refresh_table()
-                    vault_events.entry_changed.emit(action="delete", entry_id=eid, message="Movido a papelera")
+                    message = "Movido a papelera"
+            if current_view == "papelera":
+                attachments.gc_chunks(self.vault.SessionLocal)
+            vault_events.entry_changed.emit(action="delete", entry_id=eid, message=message)
+            vault_events.flush()
 
 
+    @profiled("restore")
     def restore_entry(self):
         eid = self.selected_id()
         if not eid:
             return
-        with SessionLocal() as s:
+        with self.vault.SessionLocal() as s:
             e = s.get(Entry, eid)
             if e:
                 e.deleted_at = None
                 s.commit()
-        self.refresh_table()
         vault_events.entry_changed.emit(
             action="edit",
             entry_id=eid,
             message="Restaurado desde papelera"
         )
+        vault_events.flush()     # el refresco entra en la misma captura (ver add_entry)
 
 
 
+    @profiled("copy")
     def copy_password(self):
         eid = self.selected_id()
         if not eid:
             messagebox.showerror("Error", "Selecciona una fila.", parent=self.root)
             return
-        with SessionLocal() as s:
+        with self.vault.SessionLocal() as s:
             e = s.get(Entry, eid)
             if not e:
                 messagebox.showerror("Error", "Entrada no encontrada.", parent=self.root)
@@ -1100,8 +1681,15 @@ class PasswordVaultApp:
         )
         if not path:
             return
+        encrypt = messagebox.askyesno(
+            "Exportar",
+            "¿Cifrar el archivo completo?\n"
+            "(títulos, usuarios, URLs, notas y dump SQL; solo se podrá abrir con esta bóveda)",
+            parent=self.root
+        )
         try:
-            export_unified_pmvault(SessionLocal, self.key, path)
+            with self.profiler.capture("export"):
+                export_unified_pmvault(self.vault.SessionLocal, self.key, path, encrypt=encrypt)
             messagebox.showinfo(
                 "Exportar",
                 "Exportación completada.\nSe generó un único archivo .pmvault con el dump SQL embebido.",
@@ -1112,22 +1700,141 @@ class PasswordVaultApp:
             messagebox.showerror("Error", f"No se pudo exportar: {ex}", parent=self.root)
 
     def import_vault(self):
-        path = filedialog.askopenfilename(
-            filetypes=[("Cofre PasswordVault", ".pmvault")], parent=self.root
+        paths = filedialog.askopenfilenames(
+            filetypes=[("Cofre PasswordVault", ".pmvault"),
+                       ("CSV (Chrome, Firefox, Bitwarden, KeePass)", ".csv")],
+            parent=self.root
         )
-        if not path:
+        if not paths:
+            return
+        csv_paths = [p for p in paths if p.lower().endswith(".csv")]
+        if csv_paths:
+            # Una captura para todos los CSV (sin los diálogos de resultado) y su refresco
+            with self.profiler.capture("import"):
+                with vault_events.batch():   # un solo refresco para todos los CSV
+                    for p in csv_paths:
+                        self._import_csv(p)
+                vault_events.flush()
+            paths = [p for p in paths if p not in csv_paths]
+            if not paths:
+                return
+        if len(paths) > 1:
+            self._import_many(list(paths))
             return
+        path = paths[0]
         try:
             # Si quieres dejar un vault.sql junto al archivo al importar, pon True.
-            inserted, _ = import_unified_pmvault(
-                SessionLocal, self.key, path, write_sql_alongside=False
-            )
+            def _progress(n: int):
+                self.set_status(f"Importando… {n} entradas")
+                self.root.update_idletasks()
+
+            with self.profiler.capture("import"):
+                inserted, _ = import_unified_pmvault(
+                    self.vault.SessionLocal, self.key, path, write_sql_alongside=False, progress=_progress
+                )
+                vault_events.entry_changed.emit(action="import", entry_id=None, message=f"Importadas {inserted}")
+                vault_events.flush()
             messagebox.showinfo("Importar", f"Entradas añadidas: {inserted}", parent=self.root)
-            self.refresh_table()
-            vault_events.entry_changed.emit(action="import", entry_id=None, message=f"Importadas {inserted}")
         except Exception as ex:
             messagebox.showerror("Error", f"No se pudo importar: {ex}", parent=self.root)
-    
+
+    def browse_backup(self):
+        """Explora un .pmvault sin importarlo y restaura solo las entradas elegidas."""
+        path = filedialog.askopenfilename(filetypes=[("Cofre PasswordVault", ".pmvault")], parent=self.root)
+        if not path:
+            return
+        # Una captura: lectura del índice + restauración; el explorador abierto no cuenta
+        with self.profiler.capture("browse_backup"):
+            try:
+                entries = browse_pmvault(path, self.key)
+            except Exception as ex:
+                with self.profiler.suspend():
+                    messagebox.showerror("Error", f"No se pudo abrir la copia: {ex}", parent=self.root)
+                return
+            dlg = BackupBrowser(self.root, path, entries)
+            with self.profiler.suspend():
+                self.root.wait_window(dlg.top)
+            if not dlg.result:
+                return
+            try:
+                restored = restore_selected(self.vault.SessionLocal, self.key, path, dlg.result)
+            except Exception as ex:
+                with self.profiler.suspend():
+                    messagebox.showerror("Error", f"No se pudo restaurar: {ex}", parent=self.root)
+                return
+            vault_events.entry_changed.emit(
+                action="import", entry_id=None,
+                message=f"Restauradas {restored} entradas de {os.path.basename(path)}"
+            )
+            vault_events.flush()
+
+    def _import_csv(self, path: str):
+        try:
+            def _progress(n: int):
+                self.set_status(f"Importando CSV… {n} entradas")
+                self.root.update_idletasks()
+
+            res = import_csv(self.vault.SessionLocal, self.key, path, progress=_progress)
+        except Exception as ex:
+            with self.profiler.suspend():
+                messagebox.showerror("Error", f"No se pudo importar {os.path.basename(path)}: {ex}",
+                                     parent=self.root)
+            return
+        dups = res["duplicates"]
+        detail = "\n".join(f"  línea {d['line']}: {d['title']} ({d['username']})" for d in dups[:15])
+        if len(dups) > 15:
+            detail += f"\n  … y {len(dups) - 15} más"
+        with self.profiler.suspend():      # el resultado se lee fuera de la captura
+            messagebox.showinfo(
+                "Importar CSV",
+                f"Origen: {res['source']}\n"
+                f"Entradas añadidas: {res['inserted']} de {res['read']} filas\n"
+                f"Omitidas (sin contraseña o no login): {len(res['skipped'])}\n"
+                f"Duplicadas omitidas: {len(dups)}" + (f"\n{detail}" if detail else ""),
+                parent=self.root
+            )
+        vault_events.entry_changed.emit(action="import", entry_id=None, message=f"Importadas {res['inserted']}")
+
+    def _import_many(self, paths):
+        """Importación en lote en un hilo aparte; la UI solo consulta la cola con after()."""
+        results_q: "queue.Queue" = queue.Queue()
+        vault = self.vault      # aunque el usuario cambie de vault mientras tanto
+
+        def _worker():
+            try:
+                import_many_pmvault(vault.SessionLocal, vault.key, paths, on_result=results_q.put)
+            except Exception as ex:
+                results_q.put({"path": None, "error": str(ex)})
+            results_q.put(None)   # fin
+
+        done = []
+
+        def _poll():
+            while True:
+                try:
+                    res = results_q.get_nowait()
+                except queue.Empty:
+                    self.root.after(100, _poll)
+                    return
+                if res is None:
+                    break
+                done.append(res)
+                self.set_status(f"Importados {len(done)}/{len(paths)} archivos…")
+            total = sum(r.get("inserted", 0) for r in done)
+            lines = [
+                f"{os.path.basename(r['path'] or '?')}: "
+                + (f"error - {r['error']}" if r.get("error") else f"{r.get('inserted', 0)} entradas")
+                for r in done
+            ]
+            messagebox.showinfo("Importar", f"Entradas añadidas: {total}\n\n" + "\n".join(lines),
+                                parent=self.root)
+            vault.invalidate()
+            vault_events.entry_changed.emit(action="import", entry_id=None, message=f"Importadas {total}")
+
+        self.set_status(f"Importando {len(paths)} archivos…")
+        threading.Thread(target=_worker, daemon=True).start()
+        self.root.after(100, _poll)
+
 
 def main():
     # DB
@@ -0,0 +1,344 @@
+# password_vault/attachments.py
+# Adjuntos de las entradas (archivos de claves, códigos de recuperación, certificados...).
+#   - El archivo se parte en trozos de CHUNK_SIZE; cada trozo se cifra (Fernet, clave del
+#     vault) y se guarda en 'chunks' direccionado por su hash: HMAC-SHA256 del contenido
+#     con una clave HKDF propia (un hash sin clave delataría qué archivos conocidos hay)
+#   - Trozos iguales se guardan una vez: un archivo repetido no ocupa nada nuevo
+#   - Lectura y escritura en streaming: en memoria solo hay un lote de trozos
+#   - El adjunto se crea "pendiente" (content_hash vacío) y cada lote de trozos se
+#     enlaza en la misma transacción que lo guarda: gc_chunks() nunca ve trozos sin
+#     referencia de una escritura en curso. Los pendientes abandonados (proceso
+#     interrumpido) los elimina gc_chunks() pasado PENDING_GRACE
+#   - Al leer se comprueban nº de trozos, tamaño y hash del archivo (AttachmentError)
+# En los .pmvault van como attachments.idx (NDJSON) + attachments.bin (trozos seguidos).
+import os
+import hmac
+import json
+import base64
+import struct
+import hashlib
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+
+from .db import Attachment, AttachmentChunk, Chunk, Entry
+from .crypto import decrypt_bytes, decrypt_text, encrypt_bytes, encrypt_text, hmac_sha256, subkey
+
+CHUNK_SIZE = 256 * 1024
+WRITE_BATCH = 32          # trozos por lote/commit al escribir
+READ_BATCH = 8            # trozos por lote al leer (yield_per)
+MAX_ATTACHMENT_SIZE = 1024 * 1024 * 1024
+PENDING_GRACE = timedelta(days=1)   # antigüedad a partir de la cual un adjunto a medias se descarta
+_PENDING = ""                        # content_hash de un adjunto que aún se está escribiendo
+
+_CHUNK_HEADER = struct.Struct(">32sII")  # attachments.bin: hash, tamaño en claro, longitud del ciphertext
+
+class AttachmentError(Exception):
+    pass
+
+def _hash_key(key: bytes) -> bytes:
+    return subkey(key, b"attachment-chunk")
+
+def _hash(hkey: bytes, data: bytes) -> str:
+    return hmac_sha256(hkey, data).hex()
+
+# ===== Escritura =====
+
+def _store_chunks(s, key: bytes, hkey: bytes, batch: List[bytes]) -> List[int]:
+    """Ids de los trozos del lote, insertando (cifrados) solo los que no existan."""
+    hashes = [_hash(hkey, data) for data in batch]
+    t = Chunk.__table__
+    known = dict(s.execute(select(t.c.hash, t.c.id).where(t.c.hash.in_(set(hashes)))).all())
+    new = {}
+    for h, data in zip(hashes, batch):
+        if h not in known and h not in new:
+            new[h] = {"hash": h, "size": len(data), "data": encrypt_bytes(key, data)}
+    if new:
+        s.execute(insert(t), list(new.values()))
+        known.update(s.execute(select(t.c.hash, t.c.id).where(t.c.hash.in_(list(new)))).all())
+    return [known[h] for h in hashes]
+
+def add_attachment(session_factory, key: bytes, entry_id: int, source: Union[str, BinaryIO],
+                   name: Optional[str] = None,
+                   progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Adjunta un archivo (ruta o stream binario) a la entrada. Devuelve el id del adjunto.
+    'progress(bytes)' se llama tras cada lote.
+    """
+    if isinstance(source, str):
+        name = name or os.path.basename(source)
+        with open(source, "rb") as fh:
+            return add_attachment(session_factory, key, entry_id, fh, name, progress)
+    if not name:
+        raise AttachmentError("Falta el nombre del adjunto")
+    hkey = _hash_key(key)
+    size = 0
+    seq = 0
+    file_mac = hmac.new(hkey, digestmod=hashlib.sha256)   # hash del archivo completo
+    with session_factory() as s:
+        if s.get(Entry, entry_id) is None:
+            raise AttachmentError(f"No existe la entrada {entry_id}")
+        att = Attachment(entry_id=entry_id, name_encrypted=encrypt_text(key, name), size=0,
+                         content_hash=_PENDING)
+        s.add(att)
+        s.commit()
+        att_id = att.id
+        try:
+            batch: List[bytes] = []
+            while True:
+                data = source.read(CHUNK_SIZE)
+                if data:
+                    size += len(data)
+                    if size > MAX_ATTACHMENT_SIZE:
+                        raise AttachmentError("El adjunto supera el tamaño máximo")
+                    file_mac.update(data)
+                    batch.append(data)
+                if batch and (not data or len(batch) >= WRITE_BATCH):
+                    # Trozos y enlaces en la misma transacción (ver cabecera)
+                    ids = _store_chunks(s, key, hkey, batch)
+                    s.execute(insert(AttachmentChunk.__table__),
+                              [{"attachment_id": att_id, "seq": seq + i, "chunk_id": c} for i, c in enumerate(ids)])
+                    s.commit()
+                    seq += len(ids)
+                    batch = []
+                    if progress:
+                        progress(size)
+                if not data:
+                    break
+            done = s.execute(update(Attachment.__table__)
+                             .where(Attachment.id == att_id, Attachment.content_hash == _PENDING)
+                             .values(size=size, content_hash=file_mac.hexdigest())).rowcount
+            if not done:
+                raise AttachmentError("La entrada se eliminó mientras se adjuntaba el archivo")
+            s.commit()
+        except BaseException:
+            s.rollback()
+            delete_attachment(session_factory, att_id, gc=False)
+            raise
+        return att_id
+
+# ===== Lectura =====
+
+def list_attachments(session_factory, key: bytes, entry_id: int) -> List[Dict[str, Any]]:
+    t = Attachment.__table__
+    with session_factory() as s:
+        rows = s.execute(select(t).where(t.c.entry_id == entry_id, t.c.content_hash != _PENDING)
+                         .order_by(t.c.id)).all()
+    return [{"id": r.id, "uid": r.uid, "name": decrypt_text(key, r.name_encrypted), "size": r.size,
+             "created_at": r.created_at} for r in rows]
+
+def _check_links(s, att) -> None:
+    """Enlaces contiguos, todos los trozos presentes y sus tamaños suman el del adjunto."""
+    link, c = AttachmentChunk.__table__, Chunk.__table__
+    n_links, max_seq = s.execute(select(func.count(), func.max(link.c.seq))
+                                 .where(link.c.attachment_id == att.id)).one()
+    n_chunks, total = s.execute(select(func.count(), func.coalesce(func.sum(c.c.size), 0))
+                                .select_from(link.join(c, c.c.id == link.c.chunk_id))
+                                .where(link.c.attachment_id == att.id)).one()
+    if n_links != (max_seq + 1 if max_seq is not None else 0) or n_chunks != n_links or total != att.size:
+        raise AttachmentError(f"El adjunto {att.id} está incompleto o dañado")
+
+def iter_attachment(session_factory, key: bytes, attachment_id: int) -> Iterator[bytes]:
+    """
+    Contenido del adjunto, trozo a trozo (descifrados de READ_BATCH en READ_BATCH).
+    Comprueba los enlaces antes de empezar y tamaño y hash al terminar: un adjunto
+    dañado lanza AttachmentError en vez de devolverse truncado.
+    """
+    link, c = AttachmentChunk.__table__, Chunk.__table__
+    stmt = (select(c.c.data).select_from(link.join(c, c.c.id == link.c.chunk_id))
+            .where(link.c.attachment_id == attachment_id).order_by(link.c.seq)
+            .execution_options(yield_per=READ_BATCH))
+    with session_factory() as s:
+        att = s.get(Attachment, attachment_id)
+        if att is None or att.content_hash == _PENDING:
+            raise AttachmentError(f"No existe el adjunto {attachment_id}")
+        _check_links(s, att)
+        file_mac = hmac.new(_hash_key(key), digestmod=hashlib.sha256)
+        size = 0
+        for data, in s.execute(stmt):
+            plain = decrypt_bytes(key, data)
+            file_mac.update(plain)
+            size += len(plain)
+            yield plain
+        if size != att.size or not hmac.compare_digest(file_mac.hexdigest(), att.content_hash):
+            raise AttachmentError(f"El contenido del adjunto {attachment_id} no coincide con su hash")
+
+def save_attachment(session_factory, key: bytes, attachment_id: int, dest: Union[str, BinaryIO]) -> int:
+    """
+    Escribe el adjunto en 'dest' (ruta o stream). Devuelve los bytes escritos.
+    Con una ruta, si el adjunto resulta dañado no se deja el archivo a medias.
+    """
+    if isinstance(dest, str):
+        try:
+            with open(dest, "wb") as fh:
+                return save_attachment(session_factory, key, attachment_id, fh)
+        except AttachmentError:
+            os.remove(dest)
+            raise
+    n = 0
+    for data in iter_attachment(session_factory, key, attachment_id):
+        dest.write(data)
+        n += len(data)
+    return n
+
+# ===== Borrado =====
+
+def delete_attachment(session_factory, attachment_id: int, gc: bool = True) -> None:
+    with session_factory() as s:
+        s.execute(delete(AttachmentChunk.__table__).where(AttachmentChunk.attachment_id == attachment_id))
+        s.execute(delete(Attachment.__table__).where(Attachment.id == attachment_id))
+        s.commit()
+    if gc:
+        gc_chunks(session_factory)
+
+def gc_chunks(session_factory) -> int:
+    """
+    Elimina adjuntos de entradas que ya no existen, adjuntos pendientes abandonados
+    (más antiguos que PENDING_GRACE) y los trozos sin referencias. Devuelve cuántos trozos.
+    """
+    att, link, c = Attachment.__table__, AttachmentChunk.__table__, Chunk.__table__
+    dead = or_(att.c.entry_id.not_in(select(Entry.id)),
+               and_(att.c.content_hash == _PENDING, att.c.created_at < datetime.utcnow() - PENDING_GRACE))
+    with session_factory() as s:
+        s.execute(delete(link).where(link.c.attachment_id.in_(select(att.c.id).where(dead))))
+        s.execute(delete(att).where(dead))
+        s.execute(delete(link).where(link.c.attachment_id.not_in(select(att.c.id))))
+        n = s.execute(delete(c).where(c.c.id.not_in(select(link.c.chunk_id)))).rowcount
+        s.commit()
+    return n or 0
+
+# ===== Bundles (.pmvault) =====
+
+def has_attachments(session_factory, since=None) -> bool:
+    t = Attachment.__table__
+    stmt = select(t.c.id).where(t.c.content_hash != _PENDING).limit(1)
+    if since is not None:
+        stmt = stmt.where(t.c.created_at >= since)
+    with session_factory() as s:
+        return s.execute(stmt).first() is not None
+
+def export_attachments(session_factory, idx_fh, bin_fh, since=None) -> int:
+    """
+    Escribe attachments.idx (una línea por adjunto con el uid de su entrada y los hashes
+    de sus trozos) y attachments.bin (cada trozo una vez, con la cabecera _CHUNK_HEADER).
+    Los trozos ya van cifrados: se copian tal cual. Devuelve el nº de adjuntos.
+    """
+    att, link, c = Attachment.__table__, AttachmentChunk.__table__, Chunk.__table__
+    stmt = (select(att, Entry.uid.label("entry_uid")).join(Entry, Entry.id == att.c.entry_id)
+            .where(att.c.content_hash != _PENDING).order_by(att.c.id))
+    if since is not None:
+        stmt = stmt.where(att.c.created_at >= since)
+    written = set()
+    n = 0
+    with session_factory() as s:
+        for a in s.execute(stmt).all():
+            hashes = []
+            chunk_stmt = (select(c.c.id, c.c.hash).select_from(link.join(c, c.c.id == link.c.chunk_id))
+                          .where(link.c.attachment_id == a.id).order_by(link.c.seq))
+            for cid, h in s.execute(chunk_stmt).all():
+                hashes.append(h)
+                if cid in written:
+                    continue
+                size, data = s.execute(select(c.c.size, c.c.data).where(c.c.id == cid)).one()
+                bin_fh.write(_CHUNK_HEADER.pack(bytes.fromhex(h), size, len(data)))
+                bin_fh.write(data)
+                written.add(cid)
+            idx_fh.write(json.dumps({
+                "uid": a.uid, "entry_uid": a.entry_uid, "size": a.size, "content_hash": a.content_hash,
+                "name_encrypted": base64.b64encode(a.name_encrypted).decode("ascii"), "created_at": a.created_at.isoformat(),
+                "chunks": hashes,
+            }, separators=(",", ":")).encode("utf-8") + b"\n")
+            n += 1
+    return n
+
+def read_attachment_index(idx_fh) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in idx_fh if line.strip()]
+
+def import_attachments(session_factory, index: Iterable[Dict[str, Any]], bin_fh,
+                       uid_map: Optional[Dict[str, str]] = None) -> int:
+    """
+    Restaura los adjuntos de un bundle para las entradas que existan (por uid; 'uid_map'
+    traduce los uid del bundle a los de la importación en modo append); los de entradas
+    ausentes y los que ya estaban se descartan antes de leer trozos. Como en
+    add_attachment, los adjuntos se crean pendientes y cada lote de trozos se guarda y se
+    enlaza en la misma transacción (commit por lote); al final se completan. Los trozos
+    se leen en streaming y solo se insertan los que falten. Devuelve el nº de adjuntos.
+    """
+    uid_map = uid_map or {}
+    wanted = []
+    with session_factory() as s:
+        uids = list({uid_map.get(d["entry_uid"], d["entry_uid"]) for d in index})
+        entry_ids: Dict[str, int] = {}
+        for i in range(0, len(uids), 500):
+            entry_ids.update(s.execute(select(Entry.uid, Entry.id).where(Entry.uid.in_(uids[i:i + 500]))).all())
+        for d in index:
+            entry_id = entry_ids.get(uid_map.get(d["entry_uid"], d["entry_uid"]))
+            if entry_id is None:
+                continue
+            if s.execute(select(Attachment.id).where(Attachment.entry_id == entry_id,
+                                                     Attachment.content_hash == d["content_hash"])).first():
+                continue      # ya estaba (reimportación)
+            att = Attachment(entry_id=entry_id, name_encrypted=base64.b64decode(d["name_encrypted"]),
+                             size=0, content_hash=_PENDING)
+            s.add(att)
+            s.flush()
+            wanted.append((att.id, d))
+        s.commit()
+    if not wanted:
+        return 0
+
+    uses: Dict[str, List[tuple]] = {}      # hash -> [(adjunto, posición)]
+    for att_id, d in wanted:
+        for seq, h in enumerate(d["chunks"]):
+            uses.setdefault(h, []).append((att_id, seq))
+    t, link, att_t = Chunk.__table__, AttachmentChunk.__table__, Attachment.__table__
+    try:
+        with session_factory() as s:
+            def _store(batch: List[Dict[str, Any]]) -> None:
+                _insert_missing_chunks(s, batch)
+                ids = dict(s.execute(select(t.c.hash, t.c.id).where(t.c.hash.in_([b["hash"] for b in batch]))).all())
+                s.execute(insert(link), [{"attachment_id": a, "seq": seq, "chunk_id": ids[b["hash"]]}
+                                         for b in batch for a, seq in uses[b["hash"]]])
+                s.commit()
+
+            batch, seen = [], set()
+            while True:
+                head = bin_fh.read(_CHUNK_HEADER.size)
+                if len(head) < _CHUNK_HEADER.size:
+                    break
+                raw_hash, size, length = _CHUNK_HEADER.unpack(head)
+                data = bin_fh.read(length)
+                h = raw_hash.hex()
+                if h in uses and h not in seen:
+                    seen.add(h)
+                    batch.append({"hash": h, "size": size, "data": data})
+                if len(batch) >= WRITE_BATCH:
+                    _store(batch)
+                    batch = []
+            if batch:
+                _store(batch)
+
+            for att_id, d in wanted:
+                linked = s.execute(select(func.count()).select_from(link)
+                                   .where(link.c.attachment_id == att_id)).scalar()
+                if linked != len(d["chunks"]):
+                    raise AttachmentError("Faltan trozos del adjunto en el bundle")
+                s.execute(update(att_t).where(att_t.c.id == att_id, att_t.c.content_hash == _PENDING)
+                          .values(size=d["size"], content_hash=d["content_hash"]))
+            s.commit()
+    except BaseException:
+        for att_id, _ in wanted:
+            delete_attachment(session_factory, att_id, gc=False)
+        gc_chunks(session_factory)
+        raise
+    return len(wanted)
+
+def _insert_missing_chunks(s, batch: List[Dict[str, Any]]) -> None:
+    if not batch:
+        return
+    t = Chunk.__table__
+    known = set(s.execute(select(t.c.hash).where(t.c.hash.in_([b["hash"] for b in batch]))).scalars())
+    new = {b["hash"]: b for b in batch if b["hash"] not in known}
+    if new:
+        s.execute(insert(t), list(new.values()))
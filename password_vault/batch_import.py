@@ -0,0 +1,175 @@
+# password_vault/batch_import.py
+# Importación de varios .pmvault a la vez:
+#   - un pool de procesos abre (y descifra), descomprime, parsea y valida cada archivo
+#     y deja las filas ya convertidas en un archivo temporal por lotes (pickle);
+#   - un único escritor (este proceso) las inserta en la BD por lotes a medida que
+#     cada archivo termina, con un resultado por archivo, y restaura después los
+#     adjuntos del bundle (attachments.idx/.bin) para esas entradas.
+import os
+import pickle
+import tempfile
+import time
+import base64
+import binascii
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .export_import import (
+    DEFAULT_BATCH_SIZE, iter_payload_records, _record_to_row, apply_upsert_rows, insert_batch,
+)
+from .pmvault_bundle import import_attachment_members, open_bundle_zip
+from . import sealed
+
+_REQUIRED_STR = ("title", "username")
+_OPTIONAL_STR = ("url", "notes", "email", "uid", "meta_encrypted")
+
+def _validate_record(d: Dict[str, Any], n: int) -> None:
+    """Comprueba el esquema mínimo de un registro del payload."""
+    if not isinstance(d, dict):
+        raise ValueError(f"registro {n}: no es un objeto")
+    if d.get("op") == "purge":
+        if not isinstance(d.get("uid"), str):
+            raise ValueError(f"registro {n}: purge sin uid")
+        return
+    for k in _REQUIRED_STR:
+        if not isinstance(d.get(k), str):
+            raise ValueError(f"registro {n}: falta '{k}'")
+    for k in _OPTIONAL_STR:
+        if d.get(k) is not None and not isinstance(d[k], str):
+            raise ValueError(f"registro {n}: '{k}' no es texto")
+    pw = d.get("password_encrypted")
+    if not isinstance(pw, str):
+        raise ValueError(f"registro {n}: falta 'password_encrypted'")
+    try:
+        base64.b64decode(pw.encode("ascii"), validate=True)
+    except (binascii.Error, UnicodeEncodeError):
+        raise ValueError(f"registro {n}: 'password_encrypted' no es base64")
+
+def _iter_file_records(path: str, key: bytes):
+    with open_bundle_zip(path, key) as z:
+        if z is not None and "payload.bin" in z.namelist():
+            with z.open("payload.bin") as fh:
+                yield from iter_payload_records(fh)
+            return
+    with open(path, "rb") as fh:
+        yield from iter_payload_records(fh)
+
+def _parse_to_spool(path: str, key: bytes, mode: str, batch_size: int, spool_dir: str) -> Dict[str, Any]:
+    """
+    Worker (otro proceso): valida el archivo completo y escribe las filas
+    convertidas en un temporal como lotes ("rows", [...]) / ("purge", [...]), más
+    ("uid_map", {...}) en append (uid del bundle -> uid nuevo, para los adjuntos).
+    Si algo falla no se inserta nada de ese archivo.
+    """
+    t0 = time.perf_counter()
+    now = datetime.utcnow()
+    fd, spool = tempfile.mkstemp(prefix="pv-import-", suffix=".pkl", dir=spool_dir)
+    records = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            rows: List[Dict[str, Any]] = []
+            purged: List[str] = []
+            uid_map: Dict[str, str] = {}
+            for n, d in enumerate(_iter_file_records(path, key)):
+                _validate_record(d, n)
+                records += 1
+                if d.get("op") == "purge":
+                    if mode == "upsert":
+                        purged.append(d["uid"])
+                    continue
+                row = _record_to_row(d, now, keep_uid=(mode == "upsert"))
+                if mode == "append" and d.get("uid") and row.get("uid"):
+                    uid_map[d["uid"]] = row["uid"]
+                rows.append(row)
+                if len(rows) >= batch_size:
+                    pickle.dump(("rows", rows), out, protocol=pickle.HIGHEST_PROTOCOL)
+                    rows = []
+            if rows:
+                pickle.dump(("rows", rows), out, protocol=pickle.HIGHEST_PROTOCOL)
+            if purged:
+                pickle.dump(("purge", purged), out, protocol=pickle.HIGHEST_PROTOCOL)
+            if uid_map:
+                pickle.dump(("uid_map", uid_map), out, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as ex:
+        os.remove(spool)
+        return {"path": path, "error": f"{type(ex).__name__}: {ex}", "parse_s": time.perf_counter() - t0}
+    return {"path": path, "spool": spool, "records": records, "parse_s": time.perf_counter() - t0}
+
+def _iter_spool(spool: str):
+    with open(spool, "rb") as fh:
+        while True:
+            try:
+                yield pickle.load(fh)
+            except EOFError:
+                return
+
+def _write_spool(session_factory, spool: str, mode: str, seal_key: Optional[bytes] = None,
+                 uid_map: Optional[Dict[str, str]] = None) -> int:
+    """
+    Escritor único: inserta (o aplica por uid) los lotes de un archivo, commit por lote.
+    Con 'seal_key' los lotes se sellan antes de escribirlos (ver sealed.seal_rows).
+    'uid_map' recibe el mapa de uids del worker (modo append).
+    """
+    written = 0
+    now = datetime.utcnow()
+    with session_factory() as s:
+        for kind, items in _iter_spool(spool):
+            if kind == "uid_map":
+                if uid_map is not None:
+                    uid_map.update(items)
+                continue
+            if mode == "upsert":
+                if kind == "rows":
+                    apply_upsert_rows(s, items, [], now, seal_key)
+                else:
+                    apply_upsert_rows(s, [], items, now)
+            else:
+                insert_batch(s, items, seal_key)
+            s.commit()
+            written += len(items)
+    return written
+
+def import_many_pmvault(session_factory, key: bytes, paths, workers: Optional[int] = None,
+                        batch_size: int = DEFAULT_BATCH_SIZE, mode: str = "append",
+                        on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    """
+    Importa varios .pmvault en paralelo (parseo en 'workers' procesos, escritura en
+    uno solo), con sus adjuntos. Devuelve un resultado por archivo, en el orden de 'paths':
+      {"path", "inserted", "attachments", "records", "parse_s", "write_s"} o {"path", "error"}.
+    'on_result(res)' se llama en cuanto cada archivo queda escrito.
+    """
+    if mode not in ("append", "upsert"):
+        raise ValueError(f"Modo de importación desconocido: {mode}")
+    paths = list(paths)
+    workers = workers or min(len(paths), os.cpu_count() or 1) or 1
+    seal_key = sealed.seal_key_for(session_factory, key)
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory(prefix="pv-import-") as spool_dir, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_parse_to_spool, p, key, mode, batch_size, spool_dir) for p in paths]
+        for fut in as_completed(futures):
+            try:
+                res = fut.result()
+            except Exception as ex:   # el proceso murió
+                res = {"path": paths[futures.index(fut)], "error": f"{type(ex).__name__}: {ex}"}
+            spool = res.pop("spool", None)
+            if spool:
+                t0 = time.perf_counter()
+                try:
+                    uid_map: Dict[str, str] = {}
+                    res["inserted"] = _write_spool(session_factory, spool, mode, seal_key, uid_map)
+                    with open_bundle_zip(res["path"], key) as z:
+                        res["attachments"] = (import_attachment_members(
+                            session_factory, z, uid_map=uid_map if mode == "append" else None)
+                            if z is not None else 0)
+                except Exception as ex:
+                    res["error"] = f"{type(ex).__name__}: {ex}"
+                finally:
+                    res["write_s"] = time.perf_counter() - t0
+                    os.remove(spool)
+            results[res["path"]] = res
+            if on_result:
+                on_result(res)
+    sealed.reconcile(session_factory, key)
+    return [results[p] for p in paths]
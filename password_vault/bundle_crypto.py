@@ -0,0 +1,300 @@
+# password_vault/bundle_crypto.py
+# Cifrado por bloques (AEAD) de archivos .pmvault completos.
+#
+# Formato:
+#   cabecera (32 bytes): MAGIC | versión | algoritmo | reservado | chunk_size | salt
+#   bloque 0, bloque 1, ...: AES-256-GCM(texto de chunk_size bytes) + tag (16 bytes)
+# El último bloque puede ser más corto (o vacío). Cada bloque se sella de forma
+# independiente con:
+#   - clave de exportación = HKDF-SHA256(clave del vault, salt del archivo)
+#   - nonce = índice del bloque (la clave es única por archivo)
+#   - AAD = cabecera + índice + marca de "último bloque"
+# Así no se pueden reordenar, mezclar ni truncar bloques sin que falle la
+# verificación, y cualquier bloque se puede descifrar por separado (y en paralelo).
+
+import io
+import os
+import base64
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+MAGIC = b"PMVAEAD1"
+FORMAT_VERSION = 1
+ALGO_AES256_GCM = 1
+_HEADER = struct.Struct(">8sBBHI16s")
+HEADER_SIZE = _HEADER.size          # 32
+TAG_SIZE = 16
+DEFAULT_CHUNK_SIZE = 1024 * 1024    # 1 MiB de texto plano por bloque
+_HKDF_INFO = b"pmvault-bundle-aead-v1"
+
+def derive_export_key(key: bytes, salt: bytes) -> bytes:
+    """Clave AES-256 de exportación a partir de la clave Fernet del vault."""
+    raw = base64.urlsafe_b64decode(key)
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=_HKDF_INFO).derive(raw)
+
+def _aad(header: bytes, index: int, last: bool) -> bytes:
+    return header + struct.pack(">QB", index, 1 if last else 0)
+
+def _nonce(index: int) -> bytes:
+    return index.to_bytes(12, "big")
+
+def _seal_chunk(export_key: bytes, header: bytes, index: int, last: bool, data: bytes) -> bytes:
+    return AESGCM(export_key).encrypt(_nonce(index), data, _aad(header, index, last))
+
+def _open_chunk(export_key: bytes, header: bytes, index: int, last: bool, data: bytes) -> bytes:
+    return AESGCM(export_key).decrypt(_nonce(index), data, _aad(header, index, last))
+
+def _executor(workers: Optional[int]):
+    """Pool de procesos solo si se piden varios workers; None o 1 = en el propio proceso."""
+    return ProcessPoolExecutor(max_workers=workers) if workers and workers > 1 else None
+
+def is_encrypted_bundle(path: str) -> bool:
+    try:
+        with open(path, "rb") as fh:
+            return fh.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+# ===== Escritura =====
+
+class EncryptingWriter(io.RawIOBase):
+    """
+    Stream de escritura que sella en bloques todo lo que recibe y lo escribe en
+    'fh'. No es seekable: zipfile lo detecta y usa descriptores de datos, así que
+    se puede escribir un .pmvault cifrado directamente, sin zip temporal en claro.
+    Con workers > 1 los bloques se cifran en un pool de procesos (ventana acotada).
+    """
+    def __init__(self, fh, key: bytes, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 workers: Optional[int] = 1):
+        super().__init__()
+        if chunk_size <= 0:
+            raise ValueError("chunk_size debe ser mayor que 0")
+        self._fh = fh
+        self._chunk_size = chunk_size
+        salt = os.urandom(16)
+        self._header = _HEADER.pack(MAGIC, FORMAT_VERSION, ALGO_AES256_GCM, 0, chunk_size, salt)
+        self._key = derive_export_key(key, salt)
+        self._buf = bytearray()
+        self._index = 0
+        self._pos = 0
+        self._pool = _executor(workers)
+        self._window = 2 * (self._pool._max_workers if self._pool else 1)
+        self._inflight: deque = deque()
+        self._fh.write(self._header)
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def write(self, b) -> int:
+        self._buf += b
+        self._pos += len(b)
+        # Solo se emite un bloque cuando hay datos detrás: el último se sella en close()
+        while len(self._buf) > self._chunk_size:
+            self._emit(bytes(self._buf[:self._chunk_size]), last=False)
+            del self._buf[:self._chunk_size]
+        return len(b)
+
+    def _emit(self, data: bytes, last: bool) -> None:
+        args = (self._key, self._header, self._index, last, data)
+        self._index += 1
+        if self._pool is None:
+            self._fh.write(_seal_chunk(*args))
+            return
+        self._inflight.append(self._pool.submit(_seal_chunk, *args))
+        while len(self._inflight) >= self._window:
+            self._fh.write(self._inflight.popleft().result())
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            self._emit(bytes(self._buf), last=True)
+            self._buf = bytearray()
+            while self._inflight:
+                self._fh.write(self._inflight.popleft().result())
+            self._fh.flush()
+        finally:
+            if self._pool:
+                self._pool.shutdown()
+            super().close()
+
+def encrypt_file(src_path: str, dst_path: str, key: bytes,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, workers: Optional[int] = None) -> None:
+    """Cifra un archivo completo (p. ej. un .pmvault en claro)."""
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        w = EncryptingWriter(dst, key, chunk_size, workers)
+        try:
+            while True:
+                data = src.read(chunk_size)
+                if not data:
+                    break
+                w.write(data)
+        finally:
+            w.close()
+
+# ===== Lectura =====
+
+class _Layout:
+    """Geometría de un archivo cifrado: cabecera, clave y posición de cada bloque."""
+    def __init__(self, fh, key: bytes):
+        fh.seek(0, io.SEEK_END)
+        size = fh.tell()
+        fh.seek(0)
+        header = fh.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE:
+            raise ValueError("Archivo cifrado truncado")
+        magic, version, algo, _, chunk_size, salt = _HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION or algo != ALGO_AES256_GCM:
+            raise ValueError("No es un .pmvault cifrado compatible")
+        if chunk_size == 0:
+            raise ValueError("Cabecera de .pmvault cifrado no válida (chunk_size 0)")
+        body = size - HEADER_SIZE
+        stride = chunk_size + TAG_SIZE
+        count = max(1, -(-body // stride))
+        last_len = body - (count - 1) * stride
+        if last_len < TAG_SIZE:
+            raise ValueError("Archivo cifrado truncado")
+        self.header = header
+        self.chunk_size = chunk_size
+        self.stride = stride
+        self.count = count
+        self.plain_size = (count - 1) * chunk_size + (last_len - TAG_SIZE)
+        self.export_key = derive_export_key(key, salt)
+
+    def read_sealed(self, fh, index: int) -> bytes:
+        fh.seek(HEADER_SIZE + index * self.stride)
+        return fh.read(self.stride)
+
+    def open_args(self, fh, index: int) -> Tuple:
+        return (self.export_key, self.header, index, index == self.count - 1, self.read_sealed(fh, index))
+
+class EncryptedBundleReader(io.RawIOBase):
+    """
+    Vista de solo lectura y seekable del texto plano de un .pmvault cifrado.
+    Solo descifra los bloques que se leen, así que zipfile puede abrir el
+    índice central y un miembro concreto sin procesar el archivo entero.
+    Con workers > 1, cada fallo de caché descifra en paralelo los siguientes
+    bloques (lectura secuencial rápida en importaciones completas).
+    """
+    def __init__(self, path: str, key: bytes, workers: Optional[int] = 1):
+        super().__init__()
+        self._fh = open(path, "rb")
+        try:
+            self._layout = _Layout(self._fh, key)
+        except Exception:
+            self._fh.close()
+            raise
+        self._pos = 0
+        self._cache = {}
+        self._pool = _executor(workers)
+        self._readahead = self._pool._max_workers if self._pool else 1
+
+    @property
+    def chunk_count(self) -> int:
+        return self._layout.count
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        else:
+            pos = self._layout.plain_size + offset
+        if pos < 0:
+            raise ValueError("Posición negativa")
+        self._pos = pos
+        return pos
+
+    def chunk(self, index: int) -> bytes:
+        """Texto plano del bloque 'index' (verificado)."""
+        if index in self._cache:
+            return self._cache[index]
+        L = self._layout
+        wanted = range(index, min(L.count, index + self._readahead))
+        if self._pool is None or len(wanted) == 1:
+            plain = [_open_chunk(*L.open_args(self._fh, index))]
+        else:
+            jobs = [L.open_args(self._fh, i) for i in wanted]
+            plain = list(self._pool.map(_open_chunk, *zip(*jobs)))
+        self._cache = dict(zip(wanted, plain))
+        return self._cache[index]
+
+    def readinto(self, b) -> int:
+        # Se llena el buffer entero aunque cruce bloques: zipfile espera lecturas completas
+        L = self._layout
+        view = memoryview(b)
+        n = 0
+        while n < len(view) and self._pos < L.plain_size:
+            index, off = divmod(self._pos, L.chunk_size)
+            data = self.chunk(index)[off:off + len(view) - n]
+            view[n:n + len(data)] = data
+            n += len(data)
+            self._pos += len(data)
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._fh.close()
+            if self._pool:
+                self._pool.shutdown()
+        super().close()
+
+def iter_decrypted_chunks(path: str, key: bytes, indices: Optional[Iterable[int]] = None,
+                          workers: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+    """
+    Descifra y verifica bloques (todos o solo 'indices'), en paralelo si workers > 1.
+    Devuelve (índice, texto plano) en orden. Lanza InvalidTag si algo no cuadra.
+    """
+    with open(path, "rb") as fh:
+        L = _Layout(fh, key)
+        wanted = range(L.count) if indices is None else sorted(set(indices))
+        pool = _executor(workers)
+        try:
+            if pool is None:
+                for i in wanted:
+                    yield i, _open_chunk(*L.open_args(fh, i))
+                return
+            window = 2 * pool._max_workers
+            inflight: deque = deque()
+            for i in wanted:
+                inflight.append((i, pool.submit(_open_chunk, *L.open_args(fh, i))))
+                if len(inflight) >= window:
+                    j, fut = inflight.popleft()
+                    yield j, fut.result()
+            while inflight:
+                j, fut = inflight.popleft()
+                yield j, fut.result()
+        finally:
+            if pool:
+                pool.shutdown()
+
+def decrypt_file(src_path: str, dst_path: str, key: bytes, workers: Optional[int] = None) -> None:
+    """Descifra un .pmvault cifrado completo a un .pmvault (zip) en claro."""
+    with open(dst_path, "wb") as dst:
+        for _, data in iter_decrypted_chunks(src_path, key, workers=workers):
+            dst.write(data)
+
+def verify_encrypted_bundle(path: str, key: bytes, workers: Optional[int] = None) -> int:
+    """Autentica todos los bloques sin escribir nada. Devuelve el nº de bloques."""
+    n = 0
+    for _ in iter_decrypted_chunks(path, key, workers=workers):
+        n += 1
+    return n
@@ -1,6 +1,8 @@
 import base64
+import hmac as _hmac
 from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 from cryptography.hazmat.primitives import hashes, hmac
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.fernet import Fernet
 
 def derive_key(master_password: str, salt: bytes) -> bytes:
@@ -23,10 +25,25 @@ def verify_master(derived_key: bytes, verifier: bytes) -> bool:
     except Exception:
         return False
 
+def subkey(derived_key: bytes, purpose: bytes, length: int = 32) -> bytes:
+    """Clave independiente para otro uso (HKDF-SHA256), p. ej. los índices ciegos."""
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=length, salt=None, info=b"passwordvault/" + purpose)
+    return hkdf.derive(base64.urlsafe_b64decode(derived_key))
+
+def hmac_sha256(raw_key: bytes, data: bytes) -> bytes:
+    # hmac.digest de la stdlib: camino rápido en C (se llama por cada token del índice ciego)
+    return _hmac.digest(raw_key, data, "sha256")
+
 def encrypt_text(derived_key: bytes, plaintext: str) -> bytes:
     f = Fernet(derived_key)
     return f.encrypt(plaintext.encode("utf-8"))
 
+def encrypt_bytes(derived_key: bytes, data: bytes) -> bytes:
+    return Fernet(derived_key).encrypt(data)
+
+def decrypt_bytes(derived_key: bytes, ciphertext: bytes) -> bytes:
+    return Fernet(derived_key).decrypt(ciphertext)
+
 def decrypt_text(derived_key: bytes, ciphertext: bytes) -> str:
     f = Fernet(derived_key)
     return f.decrypt(ciphertext).decode("utf-8")
@@ -0,0 +1,180 @@
+# password_vault/csv_import.py
+# Importa exportaciones CSV de navegadores y gestores (Chrome, Firefox, Bitwarden, KeePass...).
+# Lee en streaming, cifra las contraseñas por lotes en un pool de hilos e inserta
+# en bloque (Core executemany sobre la tabla de Entry). Informa de duplicados.
+import csv
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import select
+
+from .db import Entry
+from .crypto import encrypt_text
+from .domains import host_of
+from . import sealed
+from .export_import import DEFAULT_BATCH_SIZE, insert_rows_chunked
+
+# Columnas de cada origen (cabeceras en minúsculas). El primer nombre presente gana.
+# "detect" son las cabeceras que identifican el formato.
+CSV_SOURCES: Dict[str, Dict[str, Any]] = {
+    "bitwarden": {
+        "detect": {"login_uri", "login_username", "login_password"},
+        "title": ["name"], "username": ["login_username"], "password": ["login_password"],
+        "url": ["login_uri"], "notes": ["notes"], "favorite": ["favorite"],
+        "type": ["type"],
+    },
+    "firefox": {
+        "detect": {"url", "username", "password", "httprealm"},
+        "title": [], "username": ["username"], "password": ["password"],
+        "url": ["url"], "notes": [],
+    },
+    "keepassxc": {
+        "detect": {"group", "title", "username", "password", "url", "notes"},
+        "title": ["title"], "username": ["username"], "password": ["password"],
+        "url": ["url"], "notes": ["notes"],
+    },
+    "keepass": {
+        "detect": {"account", "login name", "password", "web site"},
+        "title": ["account"], "username": ["login name"], "password": ["password"],
+        "url": ["web site"], "notes": ["comments"],
+    },
+    "chrome": {
+        "detect": {"name", "url", "username", "password"},
+        "title": ["name"], "username": ["username"], "password": ["password"],
+        "url": ["url"], "notes": ["note"],
+    },
+    "generic": {
+        "detect": {"title", "password"},
+        "title": ["title", "name"], "username": ["username", "user", "login"],
+        "password": ["password"], "url": ["url", "website", "uri"],
+        "notes": ["notes", "note", "comments"], "email": ["email", "e-mail"],
+    },
+}
+DEFAULT_ENCRYPT_WORKERS = 4
+
+def detect_source(headers) -> str:
+    """Elige el origen cuyas cabeceras características están todas presentes."""
+    cols = {(h or "").strip().lower() for h in headers}
+    for name, spec in CSV_SOURCES.items():
+        if spec["detect"] <= cols:
+            return name
+    raise ValueError("Formato CSV no reconocido (indica el origen explícitamente)")
+
+def _pick(row: Dict[str, str], names: List[str]) -> str:
+    for n in names:
+        v = row.get(n)
+        if v:
+            return v.strip()
+    return ""
+
+def _normalize(row: Dict[str, str], spec: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Fila CSV -> campos de Entry (contraseña aún en claro). None si no es un login."""
+    if spec.get("type") and _pick(row, spec["type"]) not in ("", "login"):
+        return None
+    password = row.get(spec["password"][0], "") if spec["password"] else ""
+    if not password:
+        return None
+    url = _pick(row, spec["url"])
+    username = _pick(row, spec["username"])
+    title = _pick(row, spec["title"]) or host_of(url) or username or "(sin título)"
+    email = _pick(row, spec.get("email", [])) or (username if "@" in username else None)
+    return {
+        "title": title[:255],
+        "username": username[:255],
+        "email": email[:255] if email else None,
+        "url": url[:512],
+        "notes": _pick(row, spec["notes"])[:4096],
+        "password": password,
+        "is_favorite": _pick(row, spec.get("favorite", [])).lower() in ("1", "true", "yes"),
+    }
+
+def _dup_key(title: str, username: str, url: str) -> tuple:
+    return ((host_of(url) or title or "").lower(), (username or "").lower())
+
+def _existing_keys(session_factory, key: Optional[bytes] = None) -> set:
+    t = Entry.__table__
+    keys = set()
+    with session_factory() as s:
+        stmt = (select(t.c.title, t.c.username, t.c.url, t.c.meta_encrypted).where(t.c.deleted_at.is_(None))
+                .execution_options(yield_per=5000))
+        for title, username, url, meta in s.execute(stmt):
+            if meta is not None and key is not None:
+                m = sealed.open_meta(key, meta)
+                title, username, url = m.get("title"), m.get("username"), m.get("url")
+            keys.add(_dup_key(title, username, url))
+    return keys
+
+def iter_csv_rows(path: str, source: Optional[str] = None):
+    """Devuelve (origen, iterador de (nº de línea, fila con cabeceras en minúsculas))."""
+    csv.field_size_limit(1024 * 1024)
+    fh = open(path, "r", encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(fh)
+        headers = [h.strip().lower() for h in next(reader, [])]
+        source = source or detect_source(headers)
+        if source not in CSV_SOURCES:
+            raise ValueError(f"Origen CSV desconocido: {source}")
+    except BaseException:
+        fh.close()
+        raise
+
+    def _rows() -> Iterator:
+        with fh:
+            for line_no, values in enumerate(reader, start=2):
+                yield line_no, dict(zip(headers, values))
+    return source, _rows()
+
+def import_csv(session_factory, key: bytes, path: str, source: Optional[str] = None,
+               batch_size: int = DEFAULT_BATCH_SIZE, workers: int = DEFAULT_ENCRYPT_WORKERS,
+               skip_duplicates: bool = True, progress=None) -> Dict[str, Any]:
+    """
+    Importa un CSV de navegador/gestor. Sin 'source' se detecta por las cabeceras.
+    Se consideran duplicadas las filas con el mismo sitio (o título) y usuario que
+    una entrada existente o una fila anterior del propio CSV; con skip_duplicates
+    se omiten. Devuelve {"source", "read", "inserted", "duplicates", "skipped"}.
+    """
+    source, rows = iter_csv_rows(path, source)
+    spec = CSV_SOURCES[source]
+    seen = _existing_keys(session_factory, key)
+    result: Dict[str, Any] = {"source": source, "read": 0, "inserted": 0, "duplicates": [], "skipped": []}
+
+    def _batches() -> Iterator[List[Dict[str, Any]]]:
+        batch: List[Dict[str, Any]] = []
+        for line_no, raw in rows:
+            result["read"] += 1
+            d = _normalize(raw, spec)
+            if d is None:
+                result["skipped"].append(line_no)
+                continue
+            k = _dup_key(d["title"], d["username"], d["url"])
+            if k in seen:
+                result["duplicates"].append({"line": line_no, "title": d["title"], "username": d["username"]})
+                if skip_duplicates:
+                    continue
+            seen.add(k)
+            batch.append(d)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _rows_encrypted(pool) -> Iterator[Dict[str, Any]]:
+        now = datetime.utcnow()
+        for batch in _batches():
+            cts = pool.map(lambda d: encrypt_text(key, d["password"]), batch)
+            for d, ct in zip(batch, cts):
+                yield {
+                    "title": d["title"], "username": d["username"], "email": d["email"],
+                    "url": d["url"], "notes": d["notes"], "password_encrypted": ct,
+                    "is_favorite": d["is_favorite"], "deleted_at": None,
+                    "created_at": now, "updated_at": now, "uid": str(uuid.uuid4()),
+                }
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        result["inserted"] = insert_rows_chunked(session_factory, _rows_encrypted(pool), batch_size, progress,
+                                                 seal_key=sealed.seal_key_for(session_factory, key))
+    sealed.reconcile(session_factory, key)
+    return result
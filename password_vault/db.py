@@ -1,11 +1,17 @@
 import os
+import uuid
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import create_engine, String, LargeBinary, DateTime, Integer, Boolean
+from sqlalchemy import (
+    create_engine, event, inspect, insert, select, update, bindparam, literal_column, null,
+    String, LargeBinary, DateTime, Integer, Boolean, Index, delete,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
 
+from .domains import domain_columns, host_of, registrable_domain
+
 # ===== Ruta segura para la BD =====
-APPDATA_DIR = os.path.join(os.getenv("APPDATA"), "PasswordVault")
+APPDATA_DIR = os.path.join(os.getenv("APPDATA") or os.path.expanduser("~"), "PasswordVault")
 os.makedirs(APPDATA_DIR, exist_ok=True)  # crea la carpeta si no existe
 DB_PATH = os.path.join(APPDATA_DIR, "vault.db")
 DATABASE_URL = f"sqlite:///{DB_PATH}"
@@ -17,7 +23,19 @@ def build_engine(url: Optional[str] = None):
 engine = build_engine()
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False, future=True)
 
+def engine_of(session_factory):
+    """Engine ligado a un sessionmaker (o el global si no tiene bind)."""
+    return session_factory.kw.get("bind") or engine
+
 # ===== Modelos =====
+def _url_host_default(ctx) -> str:
+    # Por fila también en los INSERT de Core por lotes (executemany)
+    return host_of(ctx.get_current_parameters().get("url"))
+
+def _url_domain_default(ctx) -> str:
+    params = ctx.get_current_parameters()
+    return registrable_domain(params.get("url_host") or host_of(params.get("url")))
+
 class Base(DeclarativeBase):
     pass
 
@@ -26,6 +44,10 @@ class Setting(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     kdf_salt: Mapped[bytes] = mapped_column(LargeBinary)
     verifier: Mapped[bytes] = mapped_column(LargeBinary)
+    # Metadatos de las entradas cifrados en reposo (ver sealed.py); NULL = no
+    meta_encryption: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True)
+    # Huella de la clave con la que están calculados los entries.sync_hash (ver sync.py)
+    sync_hash_key: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
 class Entry(Base):
     __tablename__ = "entries"
@@ -43,11 +65,181 @@ class Entry(Base):
     password_encrypted: Mapped[bytes] = mapped_column(LargeBinary)
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
+                                                 index=True)
 
     # Nuevas columnas
     is_favorite: Mapped[bool] = mapped_column(Boolean, default=False)
     deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
+    # Identificador estable entre vaults/exportaciones (nullable para filas antiguas; ver _backfill_uids)
+    uid: Mapped[Optional[str]] = mapped_column(String(36), default=lambda: str(uuid.uuid4()), index=True)
+
+    # Host y dominio registrable de 'url' (ver domains.py), para buscar por sitio con índice.
+    # NULL = pendiente de calcular (ver _backfill_domains); '' = la URL no tiene host.
+    url_host: Mapped[Optional[str]] = mapped_column(String(255), default=_url_host_default, index=True)
+    url_domain: Mapped[Optional[str]] = mapped_column(String(255), default=_url_domain_default, index=True)
+
+    # Título, usuario, correo, URL y notas cifrados (JSON + Fernet) cuando el vault tiene
+    # meta_encryption; entonces esas columnas quedan vacías (ver sealed.py)
+    meta_encrypted: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+
+    # Momento de la última escritura en este vault, sea cual sea su origen (la app, una
+    # importación que conserva el updated_at original, un merge, una sincronización).
+    # Las exportaciones diferenciales y el watcher avanzan sobre esta columna.
+    changed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.utcnow,
+                                                           onupdate=datetime.utcnow, index=True)
+
+    # Concurrencia optimista: el ORM añade "WHERE version = :leída" a sus UPDATE/DELETE y
+    # lanza StaleDataError si otro escritor la cambió; los UPDATE de Core la incrementan
+    # por onupdate (sync, importaciones en upsert, sellado). NULL solo hasta _backfill_versions.
+    version: Mapped[Optional[int]] = mapped_column(Integer, default=1,
+                                                   onupdate=literal_column("version") + 1)
+
+    # Hash del contenido para la sincronización (ver sync.py). Cualquier UPDATE de ORM o
+    # Core lo anula por onupdate y las altas nacen sin él: NULL = pendiente de calcular,
+    # y sync lo recalcula solo para esas filas (lo demás se compara sin descifrar).
+    sync_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, default=None,
+                                                     onupdate=null())
+
+    __mapper_args__ = {"version_id_col": version}
+
+class EntryToken(Base):
+    """Índice ciego: HMAC de palabras/prefijos de los metadatos cifrados (ver sealed.py)."""
+    __tablename__ = "entry_tokens"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    entry_id: Mapped[int] = mapped_column(Integer, index=True)
+    token: Mapped[str] = mapped_column(String(32))
+    __table_args__ = (Index("ix_entry_tokens_token_entry", "token", "entry_id"),)
+
+class Chunk(Base):
+    """Trozo cifrado de un adjunto, direccionado por contenido (ver attachments.py)."""
+    __tablename__ = "chunks"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    hash: Mapped[str] = mapped_column(String(64), unique=True)
+    size: Mapped[int] = mapped_column(Integer)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+
+class Attachment(Base):
+    __tablename__ = "attachments"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    uid: Mapped[str] = mapped_column(String(36), default=lambda: str(uuid.uuid4()), index=True)
+    entry_id: Mapped[int] = mapped_column(Integer, index=True)
+    name_encrypted: Mapped[bytes] = mapped_column(LargeBinary)
+    size: Mapped[int] = mapped_column(Integer)
+    content_hash: Mapped[str] = mapped_column(String(64), index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+class AttachmentChunk(Base):
+    """Orden de los trozos de cada adjunto (un mismo trozo puede aparecer en varios)."""
+    __tablename__ = "attachment_chunks"
+    attachment_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True)
+    chunk_id: Mapped[int] = mapped_column(Integer, index=True)
+
+class EntryTombstone(Base):
+    """Registro de entradas eliminadas para siempre (para exportaciones diferenciales)."""
+    __tablename__ = "entry_tombstones"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    uid: Mapped[str] = mapped_column(String(36), index=True)
+    purged_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+@event.listens_for(Entry, "after_delete")
+def _record_tombstone(mapper, connection, target):
+    # Los DELETE por ORM dejan rastro; los de Core deben llamar a record_tombstones()
+    if target.uid:
+        record_tombstones(connection, [target.uid])
+    if target.meta_encrypted is not None:
+        connection.execute(delete(EntryToken.__table__).where(EntryToken.__table__.c.entry_id == target.id))
+    # Los adjuntos se van con la entrada; sus trozos huérfanos los recoge attachments.gc_chunks()
+    att = Attachment.__table__
+    ids = select(att.c.id).where(att.c.entry_id == target.id).scalar_subquery()
+    connection.execute(delete(AttachmentChunk.__table__).where(AttachmentChunk.__table__.c.attachment_id.in_(ids)))
+    connection.execute(delete(att).where(att.c.entry_id == target.id))
+
+@event.listens_for(Entry, "before_update")
+def _update_domains(mapper, connection, target):
+    # Los UPDATE de Core que cambian 'url' deben añadir domain_columns() (ver apply_upsert_rows)
+    if inspect(target).attrs.url.history.has_changes():
+        cols = domain_columns(target.url)
+        target.url_host, target.url_domain = cols["url_host"], cols["url_domain"]
+
+def record_tombstones(connection, uids, when: Optional[datetime] = None) -> None:
+    rows = [{"uid": u, "purged_at": when or datetime.utcnow()} for u in uids if u]
+    if rows:
+        connection.execute(insert(EntryTombstone.__table__), rows)
+
+# ===== Migraciones ligeras =====
+def _migrate(_engine) -> None:
+    """
+    create_all no altera tablas existentes: añade las columnas nuevas del modelo
+    (siempre nullable) y los índices que falten.
+    """
+    insp = inspect(_engine)
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        with _engine.begin() as conn:
+            for col in table.columns:
+                if col.name not in existing:
+                    coltype = col.type.compile(dialect=_engine.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {coltype}")
+        for idx in table.indexes:
+            idx.create(_engine, checkfirst=True)
+
+def _backfill_changed(_engine) -> None:
+    """changed_at = updated_at en las filas anteriores a la columna (antes que el resto de backfills)."""
+    t = Entry.__table__
+    with _engine.begin() as conn:
+        conn.execute(update(t).where(t.c.changed_at.is_(None))
+                     .values(changed_at=t.c.updated_at, updated_at=t.c.updated_at))
+
+def _backfill_uids(_engine, batch: int = 1000) -> None:
+    """Asigna uid a las filas que no lo tienen, por lotes (sin tocar updated_at)."""
+    t = Entry.__table__
+    stmt = (update(t).where(t.c.id == bindparam("_id"))
+            .values(uid=bindparam("_uid"), updated_at=t.c.updated_at, changed_at=t.c.changed_at))
+    while True:
+        with _engine.begin() as conn:
+            ids = conn.execute(select(t.c.id).where(t.c.uid.is_(None)).limit(batch)).scalars().all()
+            if not ids:
+                return
+            conn.execute(stmt, [{"_id": i, "_uid": str(uuid.uuid4())} for i in ids])
+
+def _backfill_domains(_engine, batch: int = 1000) -> None:
+    """Calcula url_host/url_domain de las filas antiguas, por lotes (sin tocar updated_at)."""
+    t = Entry.__table__
+    stmt = (update(t).where(t.c.id == bindparam("_id"))
+            .values(url_host=bindparam("_host"), url_domain=bindparam("_domain"), updated_at=t.c.updated_at,
+                    changed_at=t.c.changed_at))
+    last_id = 0
+    while True:
+        with _engine.begin() as conn:
+            rows = conn.execute(select(t.c.id, t.c.url)
+                                .where(t.c.url_host.is_(None), t.c.id > last_id)
+                                .order_by(t.c.id).limit(batch)).all()
+            if not rows:
+                return
+            last_id = rows[-1].id
+            params = []
+            for r in rows:
+                cols = domain_columns(r.url)
+                params.append({"_id": r.id, "_host": cols["url_host"], "_domain": cols["url_domain"]})
+            conn.execute(stmt, params)
+
+def _backfill_versions(_engine) -> None:
+    """version = 1 en las filas anteriores a la columna (el ORM no compara con NULL)."""
+    t = Entry.__table__
+    with _engine.begin() as conn:
+        conn.execute(update(t).where(t.c.version.is_(None)).values(version=1, updated_at=t.c.updated_at,
+                                                                          changed_at=t.c.changed_at))
+
 def init_db(_engine=None):
-    (Base.metadata.create_all)(_engine or engine)
+    _engine = _engine or engine
+    (Base.metadata.create_all)(_engine)
+    _migrate(_engine)
+    _backfill_changed(_engine)
+    _backfill_uids(_engine)
+    _backfill_domains(_engine)
+    _backfill_versions(_engine)
@@ -0,0 +1,83 @@
+# password_vault/domains.py
+# Normalización de URLs a host y dominio registrable, para guardarlos en columnas
+# indexadas de Entry (url_host, url_domain) y buscar por sitio sin recorrer la tabla.
+#   "https://WWW.Accounts.Google.co.uk:443/login"  -> host "accounts.google.co.uk"
+#                                                      dominio "google.co.uk"
+# Sin dependencia de la Public Suffix List: se usa una lista corta de sufijos de
+# segundo nivel habituales; para el resto el dominio son las dos últimas etiquetas.
+import ipaddress
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+# Sufijos públicos de dos etiquetas (bajo ellos el dominio registrable tiene tres)
+_MULTI_SUFFIXES = frozenset("""
+    co.uk org.uk ac.uk gov.uk me.uk ltd.uk plc.uk net.uk
+    com.au net.au org.au edu.au gov.au
+    co.nz org.nz net.nz govt.nz
+    co.jp ne.jp or.jp ac.jp go.jp
+    co.kr or.kr
+    com.br net.br org.br gov.br
+    com.ar gob.ar com.mx gob.mx org.mx com.co gov.co com.pe gob.pe com.uy com.ve com.ec com.bo
+    com.cn net.cn org.cn gov.cn com.hk com.tw com.sg com.my
+    co.in net.in org.in gov.in
+    co.za org.za gov.za
+    com.tr gov.tr com.es gob.es nom.es org.es
+    github.io gitlab.io herokuapp.com azurewebsites.net cloudfront.net appspot.com
+    blogspot.com netlify.app vercel.app pages.dev web.app firebaseapp.com
+""".split())
+
+def host_of(url: Optional[str]) -> str:
+    """
+    Host normalizado de una URL: minúsculas, sin 'www.', sin punto final ni puerto.
+    Acepta también URLs sin esquema ('github.com/login'). '' si no hay host.
+    """
+    if not url:
+        return ""
+    url = url.strip()
+    try:
+        host = urlsplit(url if "://" in url else "//" + url).hostname or ""
+    except ValueError:
+        return ""
+    host = host.rstrip(".")
+    try:
+        host = host.encode("idna").decode("ascii")     # dominios con tildes/ñ en punycode
+    except UnicodeError:
+        pass
+    return host[4:] if host.startswith("www.") else host
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+def registrable_domain(host: str) -> str:
+    """Dominio registrable del host ('mail.google.com' -> 'google.com'); IPs y 'localhost' tal cual."""
+    if not host or _is_ip(host):
+        return host
+    labels = host.split(".")
+    if len(labels) <= 2:
+        return host
+    n = 3 if ".".join(labels[-2:]) in _MULTI_SUFFIXES else 2
+    return ".".join(labels[-n:])
+
+def parent_domains(host: str) -> List[str]:
+    """Ancestros del host hasta el dominio registrable, del más cercano al más lejano."""
+    domain = registrable_domain(host)
+    if not host or host == domain:
+        return []
+    labels = host.split(".")
+    stop = len(domain.split("."))
+    return [".".join(labels[i:]) for i in range(1, len(labels) - stop + 1)]
+
+def domain_columns(url: Optional[str]) -> Dict[str, str]:
+    """Valores de url_host/url_domain para una URL ('' si no tiene host: no se re-procesa)."""
+    host = host_of(url)
+    return {"url_host": host, "url_domain": registrable_domain(host)}
+
+def with_domains(row: Dict) -> Dict:
+    """Añade url_host/url_domain a una fila de Core que lleve 'url' (para INSERT/UPDATE por lotes)."""
+    if "url" in row:
+        row.update(domain_columns(row["url"]))
+    return row
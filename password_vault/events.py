@@ -1,28 +1,202 @@
 # password_vault/events.py
 
-from typing import Callable, List, Any, Dict
+import os
+import time
+import logging
+import weakref
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Any, Dict, Optional, Set
+
+_log = logging.getLogger(__name__)
+
+class _Subscriber:
+    """Suscriptor de una señal (referencia fuerte o débil) y sus métricas."""
+    __slots__ = ("_ref", "_fn", "name", "calls", "errors", "total", "max", "last_error")
+
+    def __init__(self, fn: Callable[..., None], weak: bool):
+        if weak:
+            # Los métodos ligados necesitan WeakMethod: el objeto método es temporal
+            self._ref = weakref.WeakMethod(fn) if hasattr(fn, "__self__") else weakref.ref(fn)
+            self._fn = None
+        else:
+            self._ref = None
+            self._fn = fn
+        self.name = getattr(fn, "__qualname__", None) or repr(fn)
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_error: Optional[BaseException] = None
+
+    def target(self) -> Optional[Callable[..., None]]:
+        return self._ref() if self._ref is not None else self._fn
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": self.total * 1000,
+            "max_ms": self.max * 1000,
+            "avg_ms": self.total * 1000 / self.calls if self.calls else 0.0,
+            "last_error": repr(self.last_error) if self.last_error else None,
+            "alive": self.target() is not None,
+        }
 
 class Signal:
-    """Señal simple tipo pub/sub."""
-    def __init__(self):
-        self._subs: List[Callable[..., None]] = []
+    """
+    Señal simple tipo pub/sub.
+    Guarda por suscriptor nº de llamadas, errores, latencia acumulada y máxima y
+    la última excepción (ver stats()). Si 'budget_ms' está fijado, los handlers
+    que tardan más se registran en el logger "password_vault.events".
+    """
+    def __init__(self, name: str = "signal", budget_ms: Optional[float] = None):
+        self.name = name
+        self.budget_ms = budget_ms
+        self._subs: List[_Subscriber] = []
 
-    def connect(self, fn: Callable[..., None]) -> Callable[..., None]:
-        self._subs.append(fn)
+    def connect(self, fn: Callable[..., None], weak: bool = False) -> Callable[..., None]:
+        """Con weak=True la señal no mantiene vivo al suscriptor (se descarta al morir)."""
+        self._subs.append(_Subscriber(fn, weak))
         return fn
 
+    def disconnect(self, fn: Callable[..., None]) -> None:
+        self._subs = [s for s in self._subs if s.target() != fn]
+
     def emit(self, *args: Any, **kwargs: Dict[str, Any]) -> None:
         # Copia para evitar problemas si alguien desconecta durante el loop
-        for fn in list(self._subs):
+        dead = False
+        for sub in list(self._subs):
+            fn = sub.target()
+            if fn is None:
+                dead = True
+                continue
+            t0 = time.perf_counter()
             try:
                 fn(*args, **kwargs)
-            except Exception:
+            except Exception as ex:
                 # Evitar que una excepción en un suscriptor rompa a los demás
-                pass
+                sub.errors += 1
+                sub.last_error = ex
+                _log.warning("Suscriptor %s de %s falló: %r", sub.name, self.name, ex)
+            finally:
+                elapsed = time.perf_counter() - t0
+                sub.calls += 1
+                sub.total += elapsed
+                if elapsed > sub.max:
+                    sub.max = elapsed
+                if self.budget_ms is not None and elapsed * 1000 > self.budget_ms:
+                    _log.warning("Suscriptor lento %s de %s: %.1f ms (presupuesto %.1f ms)",
+                                 sub.name, self.name, elapsed * 1000, self.budget_ms)
+        if dead:
+            self._subs = [s for s in self._subs if s.target() is not None]
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Métricas de cada suscriptor, en orden de conexión."""
+        return [s.stats() for s in self._subs]
+
+class ChangeSet:
+    """Ráfaga de entry_changed agrupada: ids y acciones afectados."""
+    def __init__(self):
+        self.ids: Set[int] = set()
+        self.actions: Set[str] = set()
+        self.count = 0
+        self.message: Optional[str] = None   # el último recibido
+
+    def add(self, action: str, entry_id: Optional[int] = None, message: Optional[str] = None) -> None:
+        self.actions.add(action)
+        if entry_id is not None:
+            self.ids.add(entry_id)
+        if message:
+            self.message = message
+        self.count += 1
+
+    def __repr__(self) -> str:
+        return f"ChangeSet(count={self.count}, actions={sorted(self.actions)}, ids={len(self.ids)})"
 
 class VaultEvents:
-    """Colección de señales del dominio."""
+    """
+    Colección de señales del dominio.
+    - entry_changed: un aviso por cambio (action, entry_id, message)
+    - entries_changed: un ChangeSet por ráfaga. Los entry_changed emitidos dentro
+      de batch() o en el mismo tick del bucle de UI (ver set_scheduler) llegan
+      juntos, así los suscriptores hacen un solo trabajo por ráfaga.
+    """
     def __init__(self):
-        self.entry_changed = Signal()   # add, edit, delete, import
+        self.entry_changed = Signal("entry_changed")       # add, edit, delete, import
+        self.entries_changed = Signal("entries_changed")   # ChangeSet agrupado
+        self._lock = threading.Lock()
+        self._pending: Optional[ChangeSet] = None
+        self._depth = 0
+        self._scheduled = False
+        self._scheduler: Optional[Callable[[Callable[[], None]], Any]] = None
+        self.entry_changed.connect(self._collect)
+
+    def _signals(self) -> Dict[str, Signal]:
+        return {k: v for k, v in vars(self).items() if isinstance(v, Signal)}
+
+    def set_budget(self, budget_ms: Optional[float]) -> None:
+        """Registra en el log los handlers que tarden más de 'budget_ms' (None = nunca)."""
+        for sig in self._signals().values():
+            sig.budget_ms = budget_ms
+
+    def stats(self) -> Dict[str, List[Dict[str, Any]]]:
+        """{señal: [métricas por suscriptor]} (ver Signal.stats)."""
+        return {name: sig.stats() for name, sig in self._signals().items()}
+
+    def set_scheduler(self, scheduler: Optional[Callable[[Callable[[], None]], Any]]) -> None:
+        """
+        'scheduler(cb)' debe ejecutar cb más tarde en el hilo de la UI
+        (p. ej. lambda cb: root.after(0, cb)). Sin scheduler, cada aviso fuera
+        de batch() se entrega al momento.
+        """
+        self._scheduler = scheduler
+
+    @contextmanager
+    def batch(self):
+        """Agrupa todos los entry_changed del bloque en un único entries_changed (anidable)."""
+        with self._lock:
+            self._depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._depth -= 1
+                outer = self._depth == 0
+            if outer:
+                self._request_flush()
+
+    def _collect(self, action: str, entry_id: Optional[int] = None,
+                 message: Optional[str] = None, **_ignored) -> None:
+        with self._lock:
+            if self._pending is None:
+                self._pending = ChangeSet()
+            self._pending.add(action, entry_id, message)
+            in_batch = self._depth > 0
+        if not in_batch:
+            self._request_flush()
+
+    def _request_flush(self) -> None:
+        if self._scheduler is None:
+            self.flush()
+            return
+        with self._lock:
+            if self._scheduled or self._pending is None:
+                return
+            self._scheduled = True
+        self._scheduler(self.flush)
+
+    def flush(self) -> None:
+        """Entrega ya lo acumulado (si no hay un batch() abierto)."""
+        with self._lock:
+            self._scheduled = False
+            if self._depth > 0 or self._pending is None:
+                return
+            changes, self._pending = self._pending, None
+        self.entries_changed.emit(changes)
 
 vault_events = VaultEvents()
+# PV_EVENT_BUDGET_MS=50 registra en el log los handlers que tarden más de 50 ms
+if os.environ.get("PV_EVENT_BUDGET_MS"):
+    vault_events.set_budget(float(os.environ["PV_EVENT_BUDGET_MS"]))
@@ -1,14 +1,34 @@
 # password_vault/export_import.py
 # Exporta/Importa entradas del vault a un blob binario (zlib+json)
 # Compatible con tu flujo actual: export_vault_to_blob(SessionLocal, key) / import_vault_from_blob(SessionLocal, key, blob)
+#
+# Formato v2 (streaming): un único stream zlib con JSON por líneas (NDJSON):
+#   {"kind": "passwordvault-entries", "version": 2, ...}   <- cabecera
+#   {"title": ..., "password_encrypted": ...}              <- una línea por entrada
+#   {"kind": "end", "count": N}                            <- cierre
+# En exportaciones diferenciales las entradas eliminadas para siempre van como
+#   {"op": "purge", "uid": ..., "purged_at": ...}
+# El formato v1 (un único documento JSON) se sigue pudiendo leer.
 
+import io
 import json
+import uuid
 import base64
 import zlib
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
-from password_vault.db import SessionLocal, Entry  # absoluto
+from sqlalchemy import bindparam, delete, insert, select, update
+
+from password_vault.db import SessionLocal, Entry, EntryTombstone, record_tombstones  # absoluto
+from password_vault.domains import with_domains
+from password_vault import sealed
+
+PAYLOAD_KIND = "passwordvault-entries"
+PAYLOAD_VERSION = 2
+DEFAULT_CHUNK_SIZE = 500          # filas por lote al leer de la BD (yield_per)
+DEFAULT_BATCH_SIZE = 1000         # filas por INSERT/commit al importar
+_READ_SIZE = 64 * 1024            # bytes por lectura al descomprimir
 
 def _has_col(name: str) -> bool:
     return name in Entry.__table__.c.keys()
@@ -19,106 +39,450 @@ def _b64e(b: bytes) -> str:
 def _b64d(s: str) -> bytes:
     return base64.b64decode(s.encode("ascii"))
 
+def _entry_to_record(e) -> Dict[str, Any]:
+    """Convierte una fila Entry al dict serializable del payload."""
+    d: Dict[str, Any] = {
+        "title": e.title,
+        "username": e.username,
+        "url": e.url,
+        "notes": e.notes,
+        "password_encrypted": _b64e(e.password_encrypted),
+    }
+    if _has_col("email"):
+        d["email"] = getattr(e, "email", None)
+    if _has_col("created_at"):
+        ca = getattr(e, "created_at", None)
+        d["created_at"] = ca.isoformat() if ca else None
+    if _has_col("updated_at"):
+        ua = getattr(e, "updated_at", None)
+        d["updated_at"] = ua.isoformat() if ua else None
+    if _has_col("is_favorite"):
+        d["is_favorite"] = bool(getattr(e, "is_favorite", False))
+    if _has_col("deleted_at"):
+        da = getattr(e, "deleted_at", None)
+        d["deleted_at"] = da.isoformat() if da else None
+    if _has_col("uid"):
+        d["uid"] = getattr(e, "uid", None)
+    # Vault con metadatos cifrados: los campos de arriba van vacíos (ver sealed.py)
+    meta = getattr(e, "meta_encrypted", None)
+    if meta is not None:
+        d["meta_encrypted"] = _b64e(meta)
+    return d
+
+def _dumps_line(obj: Dict[str, Any]) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+class PayloadStreamWriter:
+    """
+    Escribe el payload v2 directamente en un stream binario (archivo, miembro zip...).
+    Cada registro pasa por un zlib.compressobj, así que la memoria no depende
+    del tamaño del vault. Con level=None se escribe NDJSON sin comprimir (útil
+    cuando el contenedor ya comprime el miembro).
+    Con 'block_records' el payload se parte en bloques independientes (cada uno es
+    un stream zlib completo) de hasta ese nº de registros: la cabecera va sola en
+    el bloque 0 y el cierre en el último. 'blocks' guarda (offset, longitud, nº de
+    registros) de cada bloque y 'last_block' el bloque del último registro escrito,
+    de modo que se puede leer un registro concreto sin descomprimir el resto.
+    """
+    def __init__(self, fh, level: Optional[int] = zlib.Z_DEFAULT_COMPRESSION,
+                 block_records: Optional[int] = None):
+        self._fh = fh
+        self._level = level
+        self._z = zlib.compressobj(level) if level is not None else None
+        self._block_records = block_records
+        self.blocks: List[tuple] = []
+        self.last_block: Optional[int] = None
+        self._offset = 0
+        self._block_start = 0
+        self._block_count = 0
+        self.count = 0
+        self._closed = False
+        self._write({
+            "kind": PAYLOAD_KIND,
+            "version": PAYLOAD_VERSION,
+            "format": "ndjson",
+            "blocks": bool(block_records),
+            "exported": datetime.utcnow().isoformat() + "Z",
+        })
+        if block_records:
+            self._end_block()
+
+    def _emit(self, chunk: bytes) -> None:
+        if chunk:
+            self._fh.write(chunk)
+            self._offset += len(chunk)
+
+    def _write(self, obj: Dict[str, Any]) -> None:
+        line = _dumps_line(obj)
+        self._emit(self._z.compress(line) if self._z else line)
+
+    def _end_block(self) -> None:
+        """Cierra el bloque actual (stream zlib completo) y empieza otro."""
+        if self._z:
+            self._emit(self._z.flush())
+            self._z = zlib.compressobj(self._level)
+        self.blocks.append((self._block_start, self._offset - self._block_start, self._block_count))
+        self._block_start = self._offset
+        self._block_count = 0
+
+    def write_entry(self, e) -> None:
+        self.write_record(_entry_to_record(e))
+
+    def write_record(self, d: Dict[str, Any]) -> None:
+        if self._block_records and self._block_count >= self._block_records:
+            self._end_block()
+        self._write(d)
+        self.count += 1
+        self._block_count += 1
+        self.last_block = len(self.blocks)
+
+    def write_purge(self, uid: str, purged_at: Optional[datetime]) -> None:
+        """Marca de borrado definitivo (solo en exportaciones diferenciales)."""
+        self.write_record({
+            "op": "purge",
+            "uid": uid,
+            "purged_at": purged_at.isoformat() if purged_at else None,
+        })
+
+    def close(self) -> int:
+        """Escribe el cierre y vacía el compresor. Devuelve el nº de registros."""
+        if not self._closed:
+            if self._block_records and self._block_count:
+                self._end_block()
+            self._write({"kind": "end", "count": self.count})
+            if self._block_records:
+                self._end_block()
+            elif self._z:
+                self._emit(self._z.flush())
+            self._closed = True
+        return self.count
+
+def iter_entries_chunked(session_factory, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         since: Optional[datetime] = None):
+    """
+    Recorre 'entries' por lotes (yield_per) sin cargar toda la tabla.
+    Con 'since' solo las escritas en este vault después de esa fecha (changed_at: incluye
+    las importadas, que conservan su updated_at original).
+    """
+    with session_factory() as s:
+        stmt = select(Entry).order_by(Entry.id).execution_options(yield_per=chunk_size)
+        if since is not None:
+            stmt = stmt.where(Entry.changed_at > since)
+        for e in s.execute(stmt).scalars():
+            yield e
+
+def iter_tombstones(session_factory, since: Optional[datetime] = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Entradas eliminadas para siempre (después de 'since' si se indica)."""
+    with session_factory() as s:
+        stmt = (select(EntryTombstone).order_by(EntryTombstone.id)
+                .execution_options(yield_per=chunk_size))
+        if since is not None:
+            stmt = stmt.where(EntryTombstone.purged_at > since)
+        for t in s.execute(stmt).scalars():
+            yield t
+
+def export_vault_to_stream(session_factory, key: bytes, fh, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Exporta todas las filas de 'entries' en formato v2 directamente a 'fh'.
+    No re-cifra nada adicional (las contraseñas ya están en password_encrypted).
+    Devuelve la cantidad de entradas escritas.
+    """
+    writer = PayloadStreamWriter(fh)
+    for e in iter_entries_chunked(session_factory, chunk_size):
+        writer.write_entry(e)
+    return writer.close()
+
 def export_vault_to_blob(session_factory, key: bytes) -> bytes:
     """
     Exporta todas las filas de 'entries' a un blob comprimido (zlib) en JSON.
-    No re-cifra nada adicional (las contraseñas ya están en password_encrypted).
+    Usa el mismo writer en streaming; se mantiene por compatibilidad.
     """
-    with session_factory() as s:
-        rows = s.query(Entry).all()
-
-    has_email   = _has_col("email")
-    has_created = _has_col("created_at")
-    has_updated = _has_col("updated_at")
-    has_fav     = _has_col("is_favorite")
-    has_deleted = _has_col("deleted_at")
-
-    out: List[Dict[str, Any]] = []
-    for e in rows:
-        d: Dict[str, Any] = {
-            "title": e.title,
-            "username": e.username,
-            "url": e.url,
-            "notes": e.notes,
-            "password_encrypted": _b64e(e.password_encrypted),
-        }
-        if has_email:
-            d["email"] = getattr(e, "email", None)
-        if has_created:
-            ca = getattr(e, "created_at", None)
-            d["created_at"] = ca.isoformat() if ca else None
-        if has_updated:
-            ua = getattr(e, "updated_at", None)
-            d["updated_at"] = ua.isoformat() if ua else None
-        if has_fav:
-            d["is_favorite"] = bool(getattr(e, "is_favorite", False))
-        if has_deleted:
-            da = getattr(e, "deleted_at", None)
-            d["deleted_at"] = da.isoformat() if da else None
-        out.append(d)
-
-    pkg = {
-        "kind": "passwordvault-entries",
-        "version": 1,
-        "exported": datetime.utcnow().isoformat() + "Z",
-        "entries": out,
-    }
-    data = json.dumps(pkg, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
-    return zlib.compress(data)
+    buf = io.BytesIO()
+    export_vault_to_stream(session_factory, key, buf)
+    return buf.getvalue()
 
-def import_vault_from_blob(session_factory, key: bytes, blob: bytes) -> int:
+def _iter_lines(fh, read_size: int = _READ_SIZE) -> Iterator[bytes]:
+    """Descomprime 'fh' de forma incremental y devuelve línea a línea."""
+    first = fh.read(read_size)
+    if not first:
+        return
+    # Fallback sin compresión (JSON plano)
+    z = None if first.lstrip()[:1] == b"{" else zlib.decompressobj()
+    # Solo se busca "\n" en los bytes nuevos: una línea enorme (payload v1, un único
+    # documento JSON) no se vuelve a recorrer en cada lectura
+    pending = bytearray()
+    chunk = first
+    while chunk:
+        if z is None:
+            data, chunk = chunk, b""
+        else:
+            data = z.decompress(chunk)
+            # Payload por bloques: varios streams zlib seguidos
+            if z.eof:
+                chunk = z.unused_data
+                z = zlib.decompressobj()
+            else:
+                chunk = b""
+        if data:
+            scan = len(pending)
+            pending += data
+            start = 0
+            nl = pending.find(b"\n", scan)
+            while nl >= 0:
+                ln = bytes(pending[start:nl])
+                if ln.strip():
+                    yield ln
+                start = nl + 1
+                nl = pending.find(b"\n", start)
+            if start:
+                del pending[:start]
+        if not chunk:
+            chunk = fh.read(read_size)
+    if z:
+        pending += z.flush()
+    if pending.strip():
+        yield bytes(pending)
+
+def iter_payload_records(fh, read_size: int = _READ_SIZE) -> Iterator[Dict[str, Any]]:
     """
-    Importa un blob (zlib+json) y crea nuevas filas en 'entries'.
-    Devuelve la cantidad de entradas insertadas.
+    Lector en streaming del payload: devuelve cada entrada como dict.
+    Acepta el formato v2 (NDJSON) y el v1 (documento JSON único).
     """
-    # zlib → json (fallback sin compresión)
+    lines = _iter_lines(fh, read_size)
+    head_raw = next(lines, None)
+    if head_raw is None:
+        return
+    head = json.loads(head_raw.decode("utf-8", errors="replace"))
+    if head.get("kind") != PAYLOAD_KIND:
+        raise ValueError("Payload no reconocido")
+
+    # v1: todo el vault en un único documento
+    if "entries" in head:
+        for d in head.get("entries", []):
+            yield d
+        return
+
+    seen = 0
+    for raw in lines:
+        d = json.loads(raw.decode("utf-8", errors="replace"))
+        if d.get("kind") == "end":
+            if d.get("count") != seen:
+                raise ValueError(f"Payload incompleto: {seen} de {d.get('count')} entradas")
+            return
+        seen += 1
+        yield d
+    raise ValueError("Payload truncado (falta el cierre)")
+
+def iter_block_records(data: bytes) -> Iterator[Dict[str, Any]]:
+    """Registros de un bloque suelto del payload (stream zlib o NDJSON plano)."""
+    if data.lstrip()[:1] != b"{":
+        data = zlib.decompress(data)
+    for ln in data.split(b"\n"):
+        if ln.strip():
+            yield json.loads(ln.decode("utf-8", errors="replace"))
+
+def _parse_dt(v) -> Optional[datetime]:
+    if not v:
+        return None
     try:
-        data = zlib.decompress(blob)
+        return datetime.fromisoformat(str(v).replace("Z", ""))
     except Exception:
-        data = blob
+        return None
 
-    pkg = json.loads(data.decode("utf-8", errors="replace"))
-    items = pkg.get("entries", [])
+def _merge_notes_with_email(notes: Optional[str], email: Optional[str]) -> str:
+    notes = (notes or "").strip()
+    if email and "email:" not in notes.lower():
+        extra = f"\nEmail: {email}" if notes else f"Email: {email}"
+        return (notes + extra).strip()
+    return notes
+
+def _record_to_row(d: Dict[str, Any], now: datetime, keep_uid: bool = False) -> Dict[str, Any]:
+    """
+    Convierte un registro del payload en parámetros para un INSERT de Core.
+    Todas las filas llevan las mismas claves (requisito de executemany).
+    Sin 'keep_uid' cada fila importada recibe un uid nuevo (la importación añade copias).
+    """
+    row: Dict[str, Any] = {
+        "title": d.get("title"),
+        "username": d.get("username"),
+        "url": d.get("url"),
+        "notes": d.get("notes"),
+        "password_encrypted": _b64d(d["password_encrypted"]),
+    }
+    # Email: columna si existe, o se añade a notas
+    if _has_col("email"):
+        row["email"] = d.get("email")
+    else:
+        row["notes"] = _merge_notes_with_email(row["notes"], d.get("email"))
 
-    has_email   = _has_col("email")
-    has_fav     = _has_col("is_favorite")
-    has_deleted = _has_col("deleted_at")
+    if _has_col("is_favorite"):
+        row["is_favorite"] = bool(d.get("is_favorite", False))
+    if _has_col("deleted_at"):
+        row["deleted_at"] = _parse_dt(d.get("deleted_at"))
+    # Se conservan las fechas originales si vienen en el payload
+    if _has_col("created_at"):
+        row["created_at"] = _parse_dt(d.get("created_at")) or now
+    if _has_col("updated_at"):
+        row["updated_at"] = _parse_dt(d.get("updated_at")) or now
+    if _has_col("uid"):
+        row["uid"] = (keep_uid and d.get("uid")) or str(uuid.uuid4())
+    if _has_col("meta_encrypted"):
+        row["meta_encrypted"] = _b64d(d["meta_encrypted"]) if d.get("meta_encrypted") else None
+    return row
 
-    def _merge_notes_with_email(notes: Optional[str], email: Optional[str]) -> str:
-        notes = (notes or "").strip()
-        if email and "email:" not in notes.lower():
-            extra = f"\nEmail: {email}" if notes else f"Email: {email}"
-            return (notes + extra).strip()
-        return notes
+def insert_batch(s, rows: List[Dict[str, Any]], seal_key: Optional[bytes] = None) -> None:
+    """INSERT de Core de un lote; con 'seal_key' se sella antes de escribir (ver sealed.seal_rows)."""
+    if seal_key is None:
+        s.execute(insert(Entry.__table__), rows)
+        return
+    rows, metas = sealed.seal_rows(seal_key, rows)
+    s.execute(insert(Entry.__table__), rows)
+    sealed.index_rows(s.connection(), seal_key, metas)
 
+def insert_rows_chunked(session_factory, rows, batch_size: int = DEFAULT_BATCH_SIZE,
+                        progress: Optional[Callable[[int], None]] = None,
+                        seal_key: Optional[bytes] = None) -> int:
+    """
+    Inserta filas (dicts de columnas) en lotes con executemany de Core,
+    haciendo commit por lote. Devuelve la cantidad insertada.
+    Con 'seal_key' (vault con metadatos cifrados) cada lote se sella antes del INSERT.
+    """
     inserted = 0
+    batch: List[Dict[str, Any]] = []
     with session_factory() as s:
-        for d in items:
-            e = Entry(
-                title=d.get("title"),
-                username=d.get("username"),
-                url=d.get("url"),
-                notes=d.get("notes"),
-                password_encrypted=_b64d(d["password_encrypted"]),
-            )
-            # Email: columna si existe, o se añade a notas
-            email_val = d.get("email")
-            if has_email:
-                setattr(e, "email", email_val)
-            else:
-                e.notes = _merge_notes_with_email(e.notes, email_val)
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                insert_batch(s, batch, seal_key)
+                s.commit()
+                inserted += len(batch)
+                batch = []
+                if progress:
+                    progress(inserted)
+        if batch:
+            insert_batch(s, batch, seal_key)
+            s.commit()
+            inserted += len(batch)
+            if progress:
+                progress(inserted)
+    return inserted
 
-            # Flags extra
-            if has_fav and "is_favorite" in d:
-                setattr(e, "is_favorite", bool(d.get("is_favorite")))
-            if has_deleted and d.get("deleted_at"):
-                try:
-                    setattr(e, "deleted_at", datetime.fromisoformat(d["deleted_at"].replace("Z", "")))
-                except Exception:
-                    pass
+def _apply_upsert_batch(s, records: List[Dict[str, Any]], now: datetime,
+                        seal_key: Optional[bytes] = None) -> None:
+    """Aplica un lote por uid: inserta las nuevas, actualiza las existentes y purga."""
+    purged = [d["uid"] for d in records if d.get("op") == "purge" and d.get("uid")]
+    rows = [_record_to_row(d, now, keep_uid=True) for d in records if d.get("op") != "purge"]
+    apply_upsert_rows(s, rows, purged, now, seal_key)
 
-            s.add(e)
-            inserted += 1
+def apply_upsert_rows(s, rows: List[Dict[str, Any]], purged: List[str], now: datetime,
+                      seal_key: Optional[bytes] = None) -> None:
+    """
+    Como _apply_upsert_batch pero con filas ya convertidas (ver _record_to_row).
+    Con 'seal_key' las filas se sellan antes del INSERT/UPDATE y sus tokens se rehacen.
+    """
+    table = Entry.__table__
+    metas = None
+    if seal_key is not None and rows:
+        rows, metas = sealed.seal_rows(seal_key, rows)
+    uids = [r["uid"] for r in rows]
+    existing = dict(s.execute(select(table.c.uid, table.c.id).where(table.c.uid.in_(uids))).all()) if uids else {}
+    inserts = [r for r in rows if r["uid"] not in existing]
+    updates = [r for r in rows if r["uid"] in existing]
 
-        s.commit()
-    return inserted
+    if inserts:
+        s.execute(insert(table), inserts)
+    if updates:
+        # updated_at viaja explícito en SET, así que onupdate no lo pisa; url_host/url_domain
+        # no tienen onupdate y se recalculan aquí
+        updates = [with_domains(dict(r)) for r in updates]
+        cols = [c for c in updates[0] if c != "uid"]
+        stmt = (update(table).where(table.c.id == bindparam("_id"))
+                .values({c: bindparam("v_" + c) for c in cols}))
+        s.execute(stmt, [{"_id": existing[r["uid"]], **{"v_" + c: r[c] for c in cols}} for r in updates])
+    if metas:
+        sealed.index_rows(s.connection(), seal_key, metas)
+    if purged:
+        s.execute(delete(table).where(table.c.uid.in_(purged)))
+        record_tombstones(s.connection(), purged, now)
+
+def apply_records_upsert(session_factory, records, batch_size: int = DEFAULT_BATCH_SIZE,
+                         progress: Optional[Callable[[int], None]] = None,
+                         seal_key: Optional[bytes] = None) -> int:
+    """
+    Aplica registros de un payload (completo o diferencial) emparejando por uid,
+    en lotes con commit por lote. Devuelve el nº de registros aplicados.
+    """
+    now = datetime.utcnow()
+    applied = 0
+    batch: List[Dict[str, Any]] = []
+    with session_factory() as s:
+        for d in records:
+            batch.append(d)
+            if len(batch) >= batch_size:
+                _apply_upsert_batch(s, batch, now, seal_key)
+                s.commit()
+                applied += len(batch)
+                batch = []
+                if progress:
+                    progress(applied)
+        if batch:
+            _apply_upsert_batch(s, batch, now, seal_key)
+            s.commit()
+            applied += len(batch)
+            if progress:
+                progress(applied)
+    return applied
+
+def import_records(session_factory, records, batch_size: int = DEFAULT_BATCH_SIZE,
+                   progress: Optional[Callable[[int], None]] = None, mode: str = "append",
+                   uid_map: Optional[Dict[str, str]] = None, seal_key: Optional[bytes] = None) -> int:
+    """
+    Importa registros de payload ya parseados (ver import_vault_from_stream).
+    mode="append" añade todas las entradas como nuevas; mode="upsert" empareja por
+    uid (actualiza/inserta/purga) y es el que se usa al aplicar cadenas de deltas.
+    En append, 'uid_map' (si se pasa) recibe uid original -> uid nuevo (para los adjuntos).
+    'seal_key' (ver sealed.seal_key_for): las filas se escriben ya selladas.
+    """
+    if mode == "upsert":
+        return apply_records_upsert(session_factory, records, batch_size, progress, seal_key)
+    if mode != "append":
+        raise ValueError(f"Modo de importación desconocido: {mode}")
+    now = datetime.utcnow()
+    rows = (_record_to_row(d, now) for d in records if d.get("op") != "purge")
+    if uid_map is not None:
+        rows = _mapping_uids(records, now, uid_map)
+    return insert_rows_chunked(session_factory, rows, batch_size, progress, seal_key)
+
+def _mapping_uids(records, now: datetime, uid_map: Dict[str, str]):
+    """Como las filas de append, anotando en 'uid_map' el uid original de cada una."""
+    for d in records:
+        if d.get("op") == "purge":
+            continue
+        row = _record_to_row(d, now)
+        if d.get("uid") and row.get("uid"):
+            uid_map[d["uid"]] = row["uid"]
+        yield row
+
+def import_vault_from_stream(session_factory, key: bytes, fh,
+                             batch_size: int = DEFAULT_BATCH_SIZE,
+                             progress: Optional[Callable[[int], None]] = None,
+                             mode: str = "append", uid_map: Optional[Dict[str, str]] = None) -> int:
+    """
+    Importa un payload leyendo 'fh' en streaming: descomprime y parsea registro a
+    registro e inserta en lotes de 'batch_size' (commit por lote).
+    'progress(n)' se llama tras cada lote con el total insertado hasta el momento.
+    Ver import_records() para 'mode' y 'uid_map'.
+    Devuelve la cantidad de entradas insertadas (o registros aplicados en upsert).
+    """
+    n = import_records(session_factory, iter_payload_records(fh), batch_size, progress, mode, uid_map,
+                       seal_key=sealed.seal_key_for(session_factory, key))
+    sealed.reconcile(session_factory, key)
+    return n
+
+def import_vault_from_blob(session_factory, key: bytes, blob: bytes) -> int:
+    """
+    Importa un blob (zlib+json) y crea nuevas filas en 'entries'.
+    Devuelve la cantidad de entradas insertadas.
+    """
+    return import_vault_from_stream(session_factory, key, io.BytesIO(blob))
@@ -1,83 +1,171 @@
 # password_vault/export_sql.py
+# Dump SQL en streaming (DDL + INSERTs multi-fila) para SQLite o MySQL.
+import io
 import base64
 from datetime import datetime
 from typing import Optional
-from .db import SessionLocal, Entry, Setting
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+from .db import SessionLocal, Entry, Setting, engine_of
+from .export_import import iter_entries_chunked
+from . import perf
 
-def _esc(val):
+DIALECTS = {"sqlite": sqlite.dialect(), "mysql": mysql.dialect()}
+DEFAULT_ROWS_PER_INSERT = 200      # filas por INSERT multi-fila
+DEFAULT_INSERTS_PER_TXN = 25       # INSERTs por transacción (BEGIN ... COMMIT)
+
+def _esc(val, dialect: str = "mysql"):
     if val is None:
         return "NULL"
+    if isinstance(val, bool):
+        return "1" if val else "0"
+    if isinstance(val, (int, float)):
+        return str(val)
     if isinstance(val, (bytes, bytearray)):
+        if dialect == "sqlite":
+            return f"X'{bytes(val).hex()}'"
         b64 = base64.b64encode(val).decode("ascii")
         return f"FROM_BASE64('{b64}')"
     if isinstance(val, datetime):
+        if dialect == "sqlite":
+            # mismo formato que guarda SQLAlchemy en SQLite (con microsegundos)
+            return f"'{val.strftime('%Y-%m-%d %H:%M:%S.%f')}'"
         return f"'{val.strftime('%Y-%m-%d %H:%M:%S')}'"
-    s = str(val).replace("\\", "\\\\").replace("'", "''")
+    s = str(val)
+    if dialect == "mysql":
+        s = s.replace("\\", "\\\\")   # en SQLite la barra invertida es literal
+    s = s.replace("'", "''")
     return f"'{s}'"
 
 def _col_exists(name: str) -> bool:
     return name in Entry.__table__.c.keys()
 
-def build_sql_dump_string(session_factory) -> str:
-    """Devuelve un dump SQL (DDL + INSERTs) como string."""
-    has_created = _col_exists("created_at")
-    has_updated = _col_exists("updated_at")
-    has_fav     = _col_exists("is_favorite")
-    has_deleted = _col_exists("deleted_at")
-    has_email   = _col_exists("email")  # si existiera en tu modelo
+def dialect_of(session_factory) -> str:
+    """'mysql' si el vault está en MySQL/MariaDB; 'sqlite' en cualquier otro caso."""
+    name = engine_of(session_factory).dialect.name
+    return "mysql" if name in ("mysql", "mariadb") else "sqlite"
+
+class SqlDumpWriter:
+    """
+    Escribe el dump SQL fila a fila en un stream (archivo, StringIO, miembro zip...).
+    Permite alimentar el dump desde un recorrido externo de 'entries'.
+    Agrupa filas en INSERTs multi-fila de 'rows_per_insert' y cada
+    'inserts_per_txn' INSERTs en una transacción explícita.
+    """
+    def __init__(self, fh, dialect: str = "sqlite",
+                 rows_per_insert: int = DEFAULT_ROWS_PER_INSERT,
+                 inserts_per_txn: int = DEFAULT_INSERTS_PER_TXN):
+        if dialect not in DIALECTS:
+            raise ValueError(f"Dialecto no soportado: {dialect}")
+        # Los miembros zip y archivos binarios se envuelven en un stream de texto
+        self._wrapper = None
+        if not isinstance(fh, io.TextIOBase):
+            fh = self._wrapper = io.TextIOWrapper(fh, encoding="utf-8", newline="\n")
+        self._fh = fh
+        self.dialect = dialect
+        self.rows_per_insert = max(1, rows_per_insert)
+        self.inserts_per_txn = max(1, inserts_per_txn)
+        self.count = 0
+        self.colnames = [c.name for c in Entry.__table__.columns]
+        self._rows: list[str] = []
+        self._inserts_in_txn = 0
+        self._in_txn = False
+
+    def _line(self, text: str = "") -> None:
+        self._fh.write(text + "\n")
+
+    def _begin(self) -> None:
+        if not self._in_txn:
+            self._line("BEGIN TRANSACTION;" if self.dialect == "sqlite" else "START TRANSACTION;")
+            self._in_txn = True
+
+    def _commit(self) -> None:
+        if self._in_txn:
+            self._line("COMMIT;")
+            self._in_txn = False
+            self._inserts_in_txn = 0
+
+    def _ddl(self, table) -> None:
+        """DDL generado por SQLAlchemy para el dialecto (incluye todas las columnas del modelo)."""
+        d = DIALECTS[self.dialect]
+        stmts = [CreateTable(table, if_not_exists=True)]
+        stmts += [CreateIndex(i, if_not_exists=True) for i in sorted(table.indexes, key=lambda i: i.name or "")]
+        for stmt in stmts:
+            text = str(stmt.compile(dialect=d)).strip()
+            self._line("\n".join(ln.rstrip() for ln in text.splitlines()) + ";")
+        self._line()
+
+    def write_header(self, settings) -> None:
+        """DDL + filas de 'settings'."""
+        self._line(f"-- PasswordVault SQL dump (pmvault bundle) - dialecto: {self.dialect}")
+        if self.dialect == "mysql":
+            self._line("SET NAMES utf8mb4;")
+        self._line()
+        self._ddl(Setting.__table__)
+        self._ddl(Entry.__table__)
 
+        cols = [c.name for c in Setting.__table__.columns]
+        if settings:
+            self._begin()
+            for st in settings:
+                vals = ", ".join(_esc(getattr(st, c, None), self.dialect) for c in cols)
+                self._line(f"INSERT INTO settings ({', '.join(cols)}) VALUES ({vals});")
+            self._commit()
+
+    def write_entry(self, e) -> None:
+        vals = ", ".join(_esc(getattr(e, c, None), self.dialect) for c in self.colnames)
+        self._rows.append(f"  ({vals})")
+        self.count += 1
+        if len(self._rows) >= self.rows_per_insert:
+            self._flush_rows()
+
+    def _flush_rows(self) -> None:
+        if not self._rows:
+            return
+        self._begin()
+        self._line(f"INSERT INTO entries ({', '.join(self.colnames)}) VALUES")
+        self._line(",\n".join(self._rows) + ";")
+        self._rows = []
+        self._inserts_in_txn += 1
+        if self._inserts_in_txn >= self.inserts_per_txn:
+            self._commit()
+
+    def close(self) -> int:
+        """Vacía las filas pendientes y cierra la transacción abierta. Devuelve el nº de filas."""
+        self._flush_rows()
+        self._commit()
+        self._fh.flush()
+        if self._wrapper is not None:
+            self._wrapper.detach()   # no cerrar el stream de destino
+            self._wrapper = None
+        return self.count
+
+def write_sql_dump(session_factory, fh, dialect: Optional[str] = None,
+                   rows_per_insert: int = DEFAULT_ROWS_PER_INSERT,
+                   inserts_per_txn: int = DEFAULT_INSERTS_PER_TXN) -> int:
+    """
+    Escribe el dump completo en 'fh' (texto o binario) recorriendo 'entries' por lotes.
+    Sin 'dialect' se usa el del propio vault. Devuelve el nº de entradas.
+    """
     with session_factory() as s:
         settings = s.query(Setting).all()
-        entries  = s.query(Entry).all()
-
-    lines: list[str] = []
-    lines.append("-- PasswordVault SQL dump (pmvault bundle)")
-    lines.append("")
-
-    lines += [
-        "CREATE TABLE IF NOT EXISTS settings (",
-        "  id INT PRIMARY KEY AUTO_INCREMENT,",
-        "  kdf_salt BLOB NOT NULL,",
-        "  verifier BLOB NOT NULL",
-        ");",
-        "",
-        "CREATE TABLE IF NOT EXISTS entries (",
-        "  id INT PRIMARY KEY AUTO_INCREMENT,",
-        "  title VARCHAR(255),",
-        "  username VARCHAR(255),",
-        "  url VARCHAR(512),",
-        "  notes TEXT,",
-        "  password_encrypted LONGBLOB NOT NULL," +
-        ("  created_at DATETIME," if has_created else "") +
-        ("  updated_at DATETIME," if has_updated else "") +
-        ("  email VARCHAR(255)," if has_email else "") +
-        ("  is_favorite TINYINT(1) NOT NULL DEFAULT 0," if has_fav else "") +
-        ("  deleted_at DATETIME," if has_deleted else ""),
-        "  dummy_padding INT NULL",
-        ");",
-        ""
-    ]
-
-    for st in settings:
-        lines.append(
-            "INSERT INTO settings (id, kdf_salt, verifier) VALUES "
-            f"({st.id}, {_esc(st.kdf_salt)}, {_esc(st.verifier)});"
-        )
-
-    colnames = ["id", "title", "username", "url", "notes", "password_encrypted"]
-    if has_created: colnames.append("created_at")
-    if has_updated: colnames.append("updated_at")
-    if has_email:   colnames.append("email")
-    if has_fav:     colnames.append("is_favorite")
-    if has_deleted: colnames.append("deleted_at")
-
-    for e in entries:
-        vals = [_esc(getattr(e, c, None)) for c in colnames]
-        lines.append(f"INSERT INTO entries ({', '.join(colnames)}) VALUES ({', '.join(vals)});")
-
-    return "\n".join(lines)
-
-def export_sql_dump(session_factory, outfile_path: str) -> None:
-    text = build_sql_dump_string(session_factory)
-    with open(outfile_path, "w", encoding="utf-8") as fh:
-        fh.write(text)
+    with perf.span("export.sql_dump") as sp:
+        writer = SqlDumpWriter(fh, dialect or dialect_of(session_factory), rows_per_insert, inserts_per_txn)
+        writer.write_header(settings)
+        for e in iter_entries_chunked(session_factory):
+            writer.write_entry(e)
+        count = writer.close()
+        sp.rows = count
+    return count
+
+def build_sql_dump_string(session_factory, dialect: Optional[str] = None,
+                          rows_per_insert: int = DEFAULT_ROWS_PER_INSERT) -> str:
+    """Devuelve un dump SQL (DDL + INSERTs) como string."""
+    buf = io.StringIO()
+    write_sql_dump(session_factory, buf, dialect, rows_per_insert)
+    return buf.getvalue().rstrip("\n")
+
+def export_sql_dump(session_factory, outfile_path: str, dialect: Optional[str] = None,
+                    rows_per_insert: int = DEFAULT_ROWS_PER_INSERT) -> None:
+    with open(outfile_path, "w", encoding="utf-8", newline="\n") as fh:
+        write_sql_dump(session_factory, fh, dialect, rows_per_insert)
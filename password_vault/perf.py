@@ -0,0 +1,121 @@
+# password_vault/perf.py
+# Spans de tiempo para los caminos calientes (consulta, hidratación ORM, Treeview,
+# scrypt, export/import...). Se activan con PV_PERF=1 o perf.enable().
+# Desactivado, span() devuelve siempre el mismo objeto nulo: el coste es una
+# llamada y un "with" vacío.
+#
+#   with perf.span("refresh.insert") as sp:
+#       ...
+#       sp.rows = len(entries)
+import os
+import json
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+RING_SIZE = 2000
+
+_enabled = os.environ.get("PV_PERF", "").lower() in ("1", "true", "yes")
+_ring: deque = deque(maxlen=RING_SIZE)
+_local = threading.local()
+
+class _NullSpan:
+    __slots__ = ()
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass   # sp.rows = n no hace nada con los spans desactivados
+
+_NULL = _NullSpan()
+
+class Span:
+    """Intervalo medido; al cerrarse se guarda en el ring buffer."""
+    __slots__ = ("name", "rows", "fields", "_t0", "_wall", "_parent")
+
+    def __init__(self, name: str, fields: Dict[str, Any]):
+        self.name = name
+        self.rows: Optional[int] = None
+        self.fields = fields
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self._parent = stack[-1].name if stack else None
+        stack.append(self)
+        self._wall = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        dur = time.perf_counter() - self._t0
+        _local.stack.pop()
+        rec = {"name": self.name, "ts": self._wall, "ms": round(dur * 1000, 3)}
+        if self._parent:
+            rec["parent"] = self._parent
+        if self.rows is not None:
+            rec["rows"] = self.rows
+        if exc_type is not None:
+            rec["error"] = exc_type.__name__
+        if self.fields:
+            rec.update(self.fields)
+        _ring.append(rec)
+        return False
+
+def span(name: str, **fields):
+    """Context manager que mide 'name' (no-op si perf está desactivado)."""
+    return Span(name, fields) if _enabled else _NULL
+
+def enable(flag: bool = True) -> None:
+    global _enabled
+    _enabled = flag
+
+def is_enabled() -> bool:
+    return _enabled
+
+def records() -> List[Dict[str, Any]]:
+    """Copia de los spans guardados (más antiguos primero)."""
+    return list(_ring)
+
+def clear() -> None:
+    _ring.clear()
+
+def last(name: str) -> Optional[Dict[str, Any]]:
+    """Último span cerrado con ese nombre."""
+    for rec in reversed(_ring):
+        if rec["name"] == name:
+            return rec
+    return None
+
+def children_of(rec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Spans hijos directos de 'rec' (cerrados dentro de su intervalo)."""
+    start, end = rec["ts"], rec["ts"] + rec["ms"] / 1000
+    return [r for r in _ring
+            if r.get("parent") == rec["name"] and start <= r["ts"] <= end]
+
+def summary() -> Dict[str, Dict[str, float]]:
+    """{nombre: {"count", "total_ms", "max_ms", "avg_ms"}} sobre el ring buffer."""
+    out: Dict[str, Dict[str, float]] = {}
+    for rec in _ring:
+        s = out.setdefault(rec["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        s["count"] += 1
+        s["total_ms"] += rec["ms"]
+        s["max_ms"] = max(s["max_ms"], rec["ms"])
+    for s in out.values():
+        s["avg_ms"] = s["total_ms"] / s["count"]
+    return out
+
+def export_jsonl(path: str) -> int:
+    """Escribe los spans como JSON lines. Devuelve cuántos se escribieron."""
+    recs = records()
+    with open(path, "w", encoding="utf-8") as fh:
+        for rec in recs:
+            fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    return len(recs)
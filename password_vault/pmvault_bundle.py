@@ -1,6 +1,8 @@
 # password_vault/pmvault_bundle.py
-import os, json, zipfile
-from datetime import datetime
+import os, json, base64, shutil, struct, tempfile, zipfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional, Union
 from pathlib import Path
 import importlib.util
 
@@ -17,59 +19,520 @@ def _load_module_from_sibling(py_filename: str, module_name: str):
 
 # ===== export_import =====
 try:
-    from password_vault.export_import import export_vault_to_blob, import_vault_from_blob  # absoluto
+    from password_vault.export_import import (  # absoluto
+        export_vault_to_blob, export_vault_to_stream, PayloadStreamWriter, iter_entries_chunked,
+        iter_tombstones, import_vault_from_blob, import_vault_from_stream, DEFAULT_BATCH_SIZE,
+        iter_block_records, import_records,
+    )
 except Exception:
     _mod = _load_module_from_sibling("export_import.py", "pv_export_import")
     export_vault_to_blob = _mod.export_vault_to_blob
+    export_vault_to_stream = _mod.export_vault_to_stream
+    PayloadStreamWriter = _mod.PayloadStreamWriter
+    iter_entries_chunked = _mod.iter_entries_chunked
+    iter_tombstones = _mod.iter_tombstones
     import_vault_from_blob = _mod.import_vault_from_blob
+    import_vault_from_stream = _mod.import_vault_from_stream
+    DEFAULT_BATCH_SIZE = _mod.DEFAULT_BATCH_SIZE
+    iter_block_records = _mod.iter_block_records
+    import_records = _mod.import_records
 
 # ===== export_sql =====
 try:
-    from password_vault.export_sql import build_sql_dump_string  # absoluto
+    from password_vault.export_sql import build_sql_dump_string, SqlDumpWriter, dialect_of  # absoluto
 except Exception:
     _mod2 = _load_module_from_sibling("export_sql.py", "pv_export_sql")
     build_sql_dump_string = _mod2.build_sql_dump_string
+    SqlDumpWriter = _mod2.SqlDumpWriter
+    dialect_of = _mod2.dialect_of
+
+from password_vault.db import Setting, engine_of
+from password_vault import perf
+from password_vault import sealed
+from password_vault import attachments
+from password_vault.sqlite_snapshot import sqlite_path_of, snapshot_to_file, restore_merge, restore_replace
+from password_vault.bundle_crypto import EncryptingWriter, EncryptedBundleReader, is_encrypted_bundle
 
 BUNDLE_META = {"kind": "pmvault-bundle", "version": 1}
+_SQL_SPOOL_MAX = 8 * 1024 * 1024   # los índices pasan a disco a partir de 8 MiB
+# Margen de la marca de agua: cubre transacciones que fijaron changed_at justo antes
+# de empezar la exportación pero hicieron commit después (reaplicar es idempotente).
+_WATERMARK_SKEW = timedelta(seconds=5)
+# payload.bin se escribe en bloques independientes de este nº de registros y
+# payload.idx apunta a ellos (consulta/restauración selectiva sin leer todo).
+PAYLOAD_BLOCK_RECORDS = 256
+INDEX_META = {"kind": "pmvault-index", "version": 1, "member": "payload.bin"}
+
+# ===== Codecs por miembro =====
+# Nombre -> método de compresión del zip (todos de la stdlib).
+MEMBER_CODECS = {
+    "stored": zipfile.ZIP_STORED,
+    "deflate": zipfile.ZIP_DEFLATED,
+    "bz2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+}
+
+# Presets velocidad/tamaño. "payload_zlib" es el nivel zlib interno de payload.bin
+# (None = NDJSON sin comprimir). Si payload.bin ya va comprimido con zlib, el
+# miembro se guarda "stored" para no comprimir dos veces; las contraseñas son
+# ciphertext Fernet (base64) y apenas se comprimen. attachments.bin sí se comprime:
+# los trozos son tokens Fernet en base64 y recuperan ~1/4 del tamaño.
+CODEC_PRESETS = {
+    "fast": {
+        "payload_zlib": 1,
+        "payload.bin": ("stored", None),
+        "vault.sql": ("deflate", 1),
+        "vault.sqlite": ("deflate", 1),
+        "payload.idx": ("deflate", 1),
+        "attachments.idx": ("deflate", 1),
+        "attachments.bin": ("deflate", 1),
+    },
+    "balanced": {
+        "payload_zlib": 6,
+        "payload.bin": ("stored", None),
+        "vault.sql": ("deflate", 6),
+        "vault.sqlite": ("deflate", 6),
+        "payload.idx": ("deflate", 6),
+        "attachments.idx": ("deflate", 6),
+        "attachments.bin": ("deflate", 6),
+    },
+    "small": {
+        "payload_zlib": None,
+        "payload.bin": ("lzma", None),
+        "vault.sql": ("lzma", None),
+        "vault.sqlite": ("lzma", None),
+        "payload.idx": ("lzma", None),
+        "attachments.idx": ("lzma", None),
+        "attachments.bin": ("lzma", None),
+    },
+}
+DEFAULT_PRESET = "balanced"
 
-def export_unified_pmvault(SessionLocal, key: bytes, outfile_path: str) -> None:
+def _member_info(name: str, codec: str, level=None) -> zipfile.ZipInfo:
+    """ZipInfo con el método de compresión (y nivel) de un miembro concreto."""
+    if codec not in MEMBER_CODECS:
+        raise ValueError(f"Codec desconocido: {codec}")
+    zi = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+    zi.compress_type = MEMBER_CODECS[codec]
+    # zipfile no expone el nivel por miembro en open(..., "w"): se fija en el ZipInfo
+    try:
+        zi.compress_level = level      # Python >= 3.13
+    except AttributeError:
+        zi._compresslevel = level      # Python < 3.13
+    zi.external_attr = 0o600 << 16
+    return zi
+
+def _resolve_codecs(preset: str, codecs=None) -> dict:
+    """Combina un preset con overrides {miembro: codec} o {miembro: (codec, nivel)}."""
+    if preset not in CODEC_PRESETS:
+        raise ValueError(f"Preset desconocido: {preset}")
+    plan = dict(CODEC_PRESETS[preset])
+    for member, choice in (codecs or {}).items():
+        plan[member] = choice if isinstance(choice, tuple) else (choice, None)
+    return plan
+
+def export_unified_pmvault(SessionLocal, key: bytes, outfile_path: str,
+                           preset: str = DEFAULT_PRESET, codecs=None,
+                           encrypt: bool = False, workers: Optional[int] = None,
+                           sql_dialect: Optional[str] = None, snapshot: bool = False,
+                           since: Union[datetime, str, None] = None) -> None:
     """
     Crea un solo archivo .pmvault (zip) con:
       - payload.bin (blob cifrado para importación nativa)
       - vault.sql   (dump SQL)
-      - meta.json   (metadatos)
+      - payload.idx (índice uid/título/URL -> bloque de payload.bin, ver browse_pmvault)
+      - attachments.idx + attachments.bin (adjuntos, si hay; ver attachments.export_attachments)
+      - meta.json   (metadatos, al final y con los conteos y codecs usados)
+    Recorre 'entries' una sola vez alimentando ambos miembros a la vez.
+    ZipFile solo admite un handle de escritura abierto, así que el dump SQL se
+    acumula en un archivo temporal y se copia al terminar.
+    'preset' elige codecs por miembro (ver CODEC_PRESETS); 'codecs' los sobreescribe.
+    Con encrypt=True el zip completo se sella por bloques con AEAD bajo una clave
+    derivada de 'key' (ver bundle_crypto); con workers > 1 se cifra en paralelo en
+    ese nº de procesos (por defecto, en el propio proceso).
+    'sql_dialect' ("sqlite" | "mysql") fija el dialecto de vault.sql; por defecto el del vault.
+    Con snapshot=True (solo vaults SQLite) se añade vault.sqlite: copia de páginas
+    hecha con la API de backup online, restaurable sin trabajo por fila.
+    Con 'since' (la "watermark" del meta.json de la exportación anterior) se genera
+    un delta: solo entradas creadas/modificadas/enviadas a papelera después de esa
+    marca, más las eliminadas para siempre (y los adjuntos añadidos desde entonces).
+    Se aplica con apply_pmvault_chain().
+    Se escribe en un temporal junto a 'outfile_path' que se renombra al terminar: si
+    algo falla no queda un archivo a medias (ni se pisa el anterior).
     """
-    blob = export_vault_to_blob(SessionLocal, key)
-    sql_text = build_sql_dump_string(SessionLocal)
-    meta = {**BUNDLE_META, "created": datetime.utcnow().isoformat() + "Z"}
+    if isinstance(since, str):
+        since = datetime.fromisoformat(since.replace("Z", ""))
+    if since is not None and snapshot:
+        raise ValueError("El snapshot SQLite solo está disponible en exportaciones completas")
+    plan = _resolve_codecs(preset, codecs)
+    out_dir, out_name = os.path.split(os.path.abspath(outfile_path))
+    fd, tmp = tempfile.mkstemp(prefix=f".{out_name}.", suffix=".tmp", dir=out_dir)
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            sink = EncryptingWriter(raw, key, workers=workers) if encrypt else raw
+            try:
+                with perf.span("export.bundle", preset=preset, encrypted=encrypt) as sp:
+                    sp.rows = _write_bundle(SessionLocal, sink, plan, preset, encrypted=encrypt,
+                                            sql_dialect=sql_dialect or dialect_of(SessionLocal),
+                                            snapshot=snapshot, since=since)
+            finally:
+                if encrypt:
+                    sink.close()
+        os.replace(tmp, outfile_path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+def _write_bundle(SessionLocal, sink, plan: dict, preset: str, encrypted: bool, sql_dialect: str,
+                  snapshot: bool = False, since: Optional[datetime] = None) -> int:
+    started = datetime.utcnow()
+    created = started.isoformat() + "Z"
+    watermark = started - _WATERMARK_SKEW
+    with SessionLocal() as s:
+        settings = s.query(Setting).all()
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as z, \
+            tempfile.TemporaryFile(mode="w+b") as sql_spool, \
+            tempfile.SpooledTemporaryFile(max_size=_SQL_SPOOL_MAX, mode="w+b") as idx_spool:
+        # Archivo temporal real: en Python 3.10 SpooledTemporaryFile no implementa
+        # readable()/writable() y TextIOWrapper (dentro de SqlDumpWriter) lo rechaza
+        sql_writer = SqlDumpWriter(sql_spool, sql_dialect)
+        sql_writer.write_header(settings)
+        idx_spool.write(_index_line(INDEX_META))
+
+        with z.open(_member_info("payload.bin", *plan["payload.bin"]), "w", force_zip64=True) as fh, \
+                perf.span("export.entries") as sp:
+            payload_writer = PayloadStreamWriter(fh, level=plan["payload_zlib"],
+                                                 block_records=PAYLOAD_BLOCK_RECORDS)
+            for e in iter_entries_chunked(SessionLocal, since=since):
+                payload_writer.write_entry(e)
+                sql_writer.write_entry(e)
+                line = {
+                    "b": payload_writer.last_block, "uid": getattr(e, "uid", None), "id": e.id,
+                    "title": e.title, "username": e.username, "url": e.url,
+                }
+                if e.meta_encrypted is not None:
+                    line["meta"] = base64.b64encode(e.meta_encrypted).decode("ascii")
+                idx_spool.write(_index_line(line))
+            purged_count = 0
+            if since is not None:
+                for t in iter_tombstones(SessionLocal, since):
+                    payload_writer.write_purge(t.uid, t.purged_at)
+                    purged_count += 1
+            payload_writer.close()
+            entries_count = sp.rows = sql_writer.count
+
+        sql_writer.close()
+        sql_spool.seek(0)
+        with z.open(_member_info("vault.sql", *plan["vault.sql"]), "w", force_zip64=True) as fh, \
+                perf.span("export.sql_member"):
+            shutil.copyfileobj(sql_spool, fh)
+
+        # Los offsets de los bloques solo se conocen al final: van en la última línea
+        idx_spool.write(_index_line({"kind": "blocks", "blocks": payload_writer.blocks}))
+        idx_spool.seek(0)
+        with z.open(_member_info("payload.idx", *plan["payload.idx"]), "w", force_zip64=True) as fh, \
+                perf.span("export.index_member"):
+            shutil.copyfileobj(idx_spool, fh)
+
+        with perf.span("export.attachments") as sp:
+            attachments_count = sp.rows = _write_attachment_members(SessionLocal, z, plan, since)
 
-    with zipfile.ZipFile(outfile_path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        with perf.span("export.snapshot"):
+            has_snapshot = snapshot and _write_snapshot_member(SessionLocal, z, plan)
+
+        meta = {
+            **BUNDLE_META,
+            "created": created,
+            "mode": "delta" if since is not None else "full",
+            "since": since.isoformat() + "Z" if since is not None else None,
+            "watermark": watermark.isoformat() + "Z",
+            "counts": {"entries": entries_count, "purged": purged_count, "settings": len(settings),
+                       "attachments": attachments_count},
+            "preset": preset,
+            "codecs": {
+                "payload.bin": {
+                    "zip": plan["payload.bin"][0],
+                    "level": plan["payload.bin"][1],
+                    "inner": "zlib" if plan["payload_zlib"] is not None else "none",
+                },
+                "vault.sql": {"zip": plan["vault.sql"][0], "level": plan["vault.sql"][1]},
+                "vault.sqlite": {"zip": plan["vault.sqlite"][0], "level": plan["vault.sqlite"][1]},
+                "payload.idx": {"zip": plan["payload.idx"][0], "level": plan["payload.idx"][1]},
+                "attachments.bin": {"zip": plan["attachments.bin"][0], "level": plan["attachments.bin"][1]},
+            },
+            "index": "payload.idx",
+            "snapshot": "vault.sqlite" if has_snapshot else None,
+            "encrypted": encrypted,
+            "sql_dialect": sql_dialect,
+        }
         z.writestr("meta.json", json.dumps(meta, ensure_ascii=False, indent=2))
-        z.writestr("payload.bin", blob)      # bytes
-        z.writestr("vault.sql", sql_text)    # str
+    return entries_count
+
+def _index_line(obj: dict) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+def _write_attachment_members(SessionLocal, z, plan: dict, since: Optional[datetime]) -> int:
+    """
+    attachments.bin se escribe en streaming dentro del zip y el índice va a un spool
+    (un solo handle de escritura abierto). Sin adjuntos no se añade ningún miembro.
+    """
+    if not attachments.has_attachments(SessionLocal, since):
+        return 0
+    with tempfile.SpooledTemporaryFile(max_size=_SQL_SPOOL_MAX, mode="w+b") as idx_spool:
+        with z.open(_member_info("attachments.bin", *plan["attachments.bin"]), "w", force_zip64=True) as fh:
+            n = attachments.export_attachments(SessionLocal, idx_spool, fh, since)
+        idx_spool.seek(0)
+        with z.open(_member_info("attachments.idx", *plan["attachments.idx"]), "w", force_zip64=True) as fh:
+            shutil.copyfileobj(idx_spool, fh)
+    return n
+
+def import_attachment_members(SessionLocal, z, uids=None, uid_map=None) -> int:
+    """Adjuntos del bundle (los de 'uids' si se pasa) para las entradas ya importadas."""
+    if "attachments.idx" not in z.namelist():
+        return 0
+    with z.open("attachments.idx") as fh:
+        index = attachments.read_attachment_index(fh)
+    if uids is not None:
+        wanted = set(uids)
+        index = [d for d in index if d["entry_uid"] in wanted]
+    with z.open("attachments.bin") as fh:
+        return attachments.import_attachments(SessionLocal, index, fh, uid_map)
+
+def _write_snapshot_member(SessionLocal, z, plan: dict) -> bool:
+    """Añade vault.sqlite si el vault es un archivo SQLite. Devuelve si se escribió."""
+    src = sqlite_path_of(SessionLocal)
+    if not src:
+        return False
+    fd, tmp = tempfile.mkstemp(suffix=".sqlite")
+    os.close(fd)
+    try:
+        snapshot_to_file(src, tmp)
+        with open(tmp, "rb") as src_fh, \
+                z.open(_member_info("vault.sqlite", *plan["vault.sqlite"]), "w", force_zip64=True) as fh:
+            shutil.copyfileobj(src_fh, fh, 1024 * 1024)
+    finally:
+        os.remove(tmp)
+    return True
+
+@contextmanager
+def open_bundle_zip(infile_path: str, key: bytes, workers: Optional[int] = 1):
+    """
+    Abre un .pmvault como ZipFile, descifrando por bloques bajo demanda si está
+    cifrado. Devuelve None si no es un bundle zip (formato legacy).
+    """
+    if is_encrypted_bundle(infile_path):
+        reader = EncryptedBundleReader(infile_path, key, workers)
+        try:
+            with zipfile.ZipFile(reader, "r") as z:
+                yield z
+        finally:
+            reader.close()
+    elif zipfile.is_zipfile(infile_path):
+        with zipfile.ZipFile(infile_path, "r") as z:
+            yield z
+    else:
+        yield None
 
-def import_unified_pmvault(SessionLocal, key: bytes, infile_path: str, write_sql_alongside: bool = False):
+def read_bundle_meta(infile_path: str, key: bytes) -> dict:
+    """meta.json de un .pmvault (cifrado o no); {} si es legacy o no lo tiene."""
+    with open_bundle_zip(infile_path, key) as z:
+        if z is None or "meta.json" not in z.namelist():
+            return {}
+        return json.loads(z.read("meta.json").decode("utf-8"))
+
+def import_unified_pmvault(SessionLocal, key: bytes, infile_path: str, write_sql_alongside: bool = False,
+                           batch_size: int = DEFAULT_BATCH_SIZE, progress=None,
+                           workers: Optional[int] = None, from_snapshot: Optional[str] = None,
+                           mode: str = "append"):
     """
     Importa un .pmvault:
-      - Si es bundle (zip): usa payload.bin para restaurar; opcionalmente escribe vault.sql al lado.
+      - Si es bundle (zip, cifrado o no): usa payload.bin para restaurar; opcionalmente escribe vault.sql al lado.
       - Si es legacy (blob crudo): lo importa igual.
+    El payload se lee en streaming y se inserta en lotes de 'batch_size'
+    ('progress(n)' recibe el total insertado tras cada lote).
+    'from_snapshot' usa vault.sqlite en vez del payload (solo vaults SQLite):
+      - "merge":   ATTACH + INSERT ... SELECT de las entradas (se añaden)
+      - "replace": copia de páginas sobre el vault actual (restauración completa)
+    mode="upsert" empareja por uid en vez de añadir copias (ver apply_pmvault_chain).
+    Los adjuntos se restauran tras las entradas (salvo con snapshot "merge", que solo
+    copia entradas; "replace" ya los trae en el propio archivo).
     Devuelve (inserted_count, sql_path or None).
     """
-    if zipfile.is_zipfile(infile_path):
-        with zipfile.ZipFile(infile_path, "r") as z:
-            if "payload.bin" in z.namelist():
-                payload = z.read("payload.bin")
-                inserted = import_vault_from_blob(SessionLocal, key, payload)
-                sql_out = None
-                if write_sql_alongside and "vault.sql" in z.namelist():
-                    base, _ = os.path.splitext(infile_path)
-                    sql_out = base + ".sql"
-                    with open(sql_out, "wb") as fh:
-                        fh.write(z.read("vault.sql"))
-                return inserted, sql_out
+    with open_bundle_zip(infile_path, key, workers) as z:
+        if z is not None and from_snapshot:
+            restored = _restore_from_snapshot(SessionLocal, z, from_snapshot)
+            sealed.reconcile(SessionLocal, key)
+            return restored, None
+        if z is not None and "payload.bin" in z.namelist():
+            uid_map = {} if mode == "append" else None
+            with z.open("payload.bin") as fh, perf.span("import.bundle", mode=mode) as sp:
+                inserted = sp.rows = import_vault_from_stream(SessionLocal, key, fh, batch_size, progress, mode,
+                                                              uid_map)
+            with perf.span("import.attachments") as sp:
+                sp.rows = import_attachment_members(SessionLocal, z, uid_map=uid_map)
+            sql_out = None
+            if write_sql_alongside and "vault.sql" in z.namelist():
+                base, _ = os.path.splitext(infile_path)
+                sql_out = base + ".sql"
+                with z.open("vault.sql") as src, open(sql_out, "wb") as fh:
+                    shutil.copyfileobj(src, fh)
+            return inserted, sql_out
 
     # Legacy: archivo no-zip o zip sin payload.bin
     with open(infile_path, "rb") as fh:
-        blob = fh.read()
-    inserted = import_vault_from_blob(SessionLocal, key, blob)
+        inserted = import_vault_from_stream(SessionLocal, key, fh, batch_size, progress, mode)
     return inserted, None
+
+def _parse_meta_dt(v) -> Optional[datetime]:
+    return datetime.fromisoformat(v.replace("Z", "")) if v else None
+
+def apply_pmvault_chain(SessionLocal, key: bytes, paths, batch_size: int = DEFAULT_BATCH_SIZE,
+                        progress=None, workers: Optional[int] = None) -> list:
+    """
+    Aplica en orden una exportación base más una cadena de deltas, emparejando por uid.
+    Cada delta debe empezar ('since') antes o en la 'watermark' del anterior; si hay
+    un hueco se lanza ValueError antes de tocar la BD.
+    Devuelve [{"path", "mode", "applied"}, ...].
+    """
+    metas = [read_bundle_meta(p, key) for p in paths]
+    for i in range(1, len(metas)):
+        prev_wm = _parse_meta_dt(metas[i - 1].get("watermark"))
+        since = _parse_meta_dt(metas[i].get("since"))
+        if metas[i].get("mode") != "delta" or since is None or prev_wm is None or since > prev_wm:
+            raise ValueError(f"Cadena de deltas rota en {os.path.basename(paths[i])}")
+
+    results = []
+    for path, meta in zip(paths, metas):
+        applied, _ = import_unified_pmvault(SessionLocal, key, path, batch_size=batch_size,
+                                            progress=progress, workers=workers, mode="upsert")
+        results.append({"path": path, "mode": meta.get("mode", "full"), "applied": applied})
+    return results
+
+def _restore_from_snapshot(SessionLocal, z, mode: str) -> int:
+    if mode not in ("merge", "replace"):
+        raise ValueError(f"Modo de snapshot desconocido: {mode}")
+    if "vault.sqlite" not in z.namelist():
+        raise ValueError("El .pmvault no contiene snapshot SQLite (vault.sqlite)")
+    live = sqlite_path_of(SessionLocal)
+    if not live:
+        raise ValueError("La restauración desde snapshot requiere un vault SQLite en archivo")
+
+    fd, tmp = tempfile.mkstemp(suffix=".sqlite")
+    os.close(fd)
+    try:
+        with z.open("vault.sqlite") as src, open(tmp, "wb") as fh:
+            shutil.copyfileobj(src, fh, 1024 * 1024)
+        if mode == "merge":
+            return restore_merge(tmp, live)
+        # Las conexiones del pool no deben conservar estado del archivo anterior
+        engine_of(SessionLocal).dispose()
+        return restore_replace(tmp, live)
+    finally:
+        os.remove(tmp)
+
+# ===== Índice: consulta y restauración selectiva =====
+
+def _read_index(z):
+    """(entradas del índice, bloques) de payload.idx; ValueError si el bundle no lo tiene."""
+    if "payload.idx" not in z.namelist():
+        raise ValueError("El .pmvault no tiene índice (payload.idx): se creó con una versión anterior")
+    entries, blocks = [], []
+    with z.open("payload.idx") as fh:
+        head = json.loads(fh.readline().decode("utf-8"))
+        if head.get("kind") != INDEX_META["kind"]:
+            raise ValueError("Índice no reconocido")
+        for line in fh:
+            d = json.loads(line.decode("utf-8"))
+            if d.get("kind") == "blocks":
+                blocks = d["blocks"]
+            else:
+                entries.append(d)
+    return entries, blocks
+
+def _member_data_offset(z, zi: zipfile.ZipInfo) -> int:
+    """Posición de los datos del miembro en el archivo (tras su cabecera local)."""
+    z.fp.seek(zi.header_offset)
+    header = z.fp.read(zipfile.sizeFileHeader)
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    return zi.header_offset + zipfile.sizeFileHeader + name_len + extra_len
+
+def _read_payload_blocks(z, blocks, wanted) -> dict:
+    """
+    {bloque: bytes} de los bloques pedidos. Si payload.bin va "stored" se lee
+    directamente del archivo (en un bundle cifrado solo se descifran los bloques
+    AEAD que los contienen); si no, se hace seek dentro del miembro comprimido.
+    """
+    zi = z.getinfo("payload.bin")
+    out = {}
+    if zi.compress_type == zipfile.ZIP_STORED:
+        base = _member_data_offset(z, zi)
+        for b in sorted(wanted):
+            offset, length, _ = blocks[b]
+            z.fp.seek(base + offset)
+            out[b] = z.fp.read(length)
+        return out
+    with z.open(zi) as fh:
+        for b in sorted(wanted):
+            offset, length, _ = blocks[b]
+            fh.seek(offset)
+            out[b] = fh.read(length)
+    return out
+
+def browse_pmvault(infile_path: str, key: bytes, query: Optional[str] = None) -> list:
+    """
+    Lista las entradas de un .pmvault leyendo solo su índice (sin contraseñas):
+    [{"uid", "id", "title", "username", "url", "b"}, ...] donde "b" es el bloque.
+    'query' filtra por subcadena en título, usuario o URL (sin distinguir mayúsculas).
+    """
+    with open_bundle_zip(infile_path, key) as z:
+        if z is None:
+            raise ValueError("Formato legacy: no se puede explorar sin importar")
+        entries, _ = _read_index(z)
+    for d in entries:
+        # Copia de un vault con metadatos cifrados: se descifran con la clave (si es la suya)
+        meta = d.pop("meta", None)
+        if meta:
+            try:
+                d.update({f: v for f, v in sealed.open_meta(key, base64.b64decode(meta)).items()
+                          if f in ("title", "username", "url")})
+            except Exception:
+                pass
+    if query:
+        q = query.lower()
+        entries = [d for d in entries
+                   if any(q in (d.get(f) or "").lower() for f in ("title", "username", "url"))]
+    return entries
+
+def read_pmvault_entries(infile_path: str, key: bytes, uids) -> list:
+    """Registros completos del payload para los uid pedidos (solo lee sus bloques)."""
+    wanted_uids = set(uids)
+    with open_bundle_zip(infile_path, key) as z:
+        if z is None:
+            raise ValueError("Formato legacy: no se puede explorar sin importar")
+        entries, blocks = _read_index(z)
+        wanted = {d["b"] for d in entries if d.get("uid") in wanted_uids}
+        data = _read_payload_blocks(z, blocks, wanted)
+    records = []
+    for b in sorted(data):
+        records.extend(d for d in iter_block_records(data[b])
+                       if d.get("op") != "purge" and d.get("uid") in wanted_uids)
+    return records
+
+def restore_selected(SessionLocal, key: bytes, infile_path: str, uids, mode: str = "append") -> int:
+    """
+    Restaura solo las entradas 'uids' de un .pmvault (ver browse_pmvault).
+    mode="append" las añade como copias; mode="upsert" sobreescribe las que
+    tengan el mismo uid. Sus adjuntos se restauran con ellas. Devuelve el nº de entradas restauradas.
+    """
+    uids = list(uids)
+    uid_map = {} if mode == "append" else None
+    restored = import_records(SessionLocal, read_pmvault_entries(infile_path, key, uids), mode=mode,
+                              uid_map=uid_map, seal_key=sealed.seal_key_for(SessionLocal, key))
+    sealed.reconcile(SessionLocal, key)
+    with open_bundle_zip(infile_path, key) as z:
+        import_attachment_members(SessionLocal, z, uids, uid_map)
+    return restored
@@ -0,0 +1,102 @@
+# password_vault/profiling.py
+# Captura con cProfile de las próximas N acciones de la UI (búsqueda, importación,
+# cambio de tema...). Se arma con PV_PROFILE=N al arrancar o con Ctrl+F12 en la app.
+# Cada captura se guarda como .pstats (abrible con pstats, snakeviz, tuna...) con
+# la acción y el tamaño del vault en el nombre:
+#   <config>/profiles/20250101-120000-search-10000e.pstats
+import os
+import re
+import cProfile
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+DEFAULT_ACTIONS = 5
+
+def _env_armed() -> int:
+    try:
+        return max(0, int(os.environ.get("PV_PROFILE", "0")))
+    except ValueError:
+        return 0
+
+class ActionProfiler:
+    """
+    Perfila las próximas 'armed' acciones. 'vault_size()' da el nº de entradas
+    para la etiqueta; 'on_saved(path, remaining)' se llama tras cada captura.
+    """
+    def __init__(self, out_dir: Union[str, Path], vault_size: Optional[Callable[[], int]] = None,
+                 on_saved: Optional[Callable[[str, int], None]] = None):
+        self.out_dir = Path(out_dir)
+        self.armed = _env_armed()
+        self._vault_size = vault_size
+        self._on_saved = on_saved
+        self._active = False
+        self._prof: Optional[cProfile.Profile] = None
+
+    def arm(self, n: int = DEFAULT_ACTIONS) -> None:
+        self.armed = max(0, n)
+
+    def _path_for(self, action: str) -> Path:
+        size = ""
+        if self._vault_size:
+            try:
+                size = f"-{self._vault_size()}e"
+            except Exception:
+                pass
+        label = re.sub(r"[^A-Za-z0-9_.-]+", "_", action)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3]
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        return self.out_dir / f"{stamp}-{label}{size}.pstats"
+
+    @contextmanager
+    def capture(self, action: str):
+        """Perfila el bloque si quedan capturas (las acciones anidadas no se perfilan aparte)."""
+        if self.armed <= 0 or self._active:
+            yield
+            return
+        self._active = True
+        prof = self._prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            self._active = False
+            self._prof = None
+            self.armed -= 1
+            path = self._path_for(action)
+            prof.dump_stats(str(path))
+            if self._on_saved:
+                self._on_saved(str(path), self.armed)
+
+    @contextmanager
+    def suspend(self):
+        """Deja fuera de la captura en curso un bloque (p. ej. un diálogo modal)."""
+        prof = self._prof
+        if prof is None:
+            yield
+            return
+        prof.disable()
+        try:
+            yield
+        finally:
+            prof.enable()
+
+def profiled(action: Union[str, Callable[..., str]]):
+    """
+    Decorador para métodos de la app: si self.profiler está armado, la llamada
+    se captura como 'action' (o action(self) si es callable).
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            prof = getattr(self, "profiler", None)
+            if prof is None or prof.armed <= 0:
+                return fn(self, *args, **kwargs)
+            name = action(self) if callable(action) else action
+            with prof.capture(name):
+                return fn(self, *args, **kwargs)
+        return wrapper
+    return deco
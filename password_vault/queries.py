@@ -0,0 +1,118 @@
+# password_vault/queries.py
+# Consultas de entradas con el filtrado hecho en SQL (vista + texto), para
+# recorrer vaults grandes por lotes sin cargar la tabla entera.
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import case, func, or_, select
+
+from .db import Entry
+from .domains import host_of, parent_domains, registrable_domain
+from . import sealed
+
+VIEWS = ("vault", "favoritos", "papelera", "all")
+
+def entries_stmt(view: str = "vault", text: Optional[str] = None, ikey: Optional[bytes] = None):
+    """
+    SELECT de Entry para una vista de la app:
+      - vault:     no borradas
+      - favoritos: favoritas no borradas
+      - papelera:  en papelera
+      - all:       todas
+    'text' busca (sin distinguir mayúsculas) en título, usuario, correo, URL y notas,
+    igual que el buscador de la app (el correo guardado en notas también cuenta).
+    Con 'ikey' (vault con metadatos cifrados) 'text' se busca en el índice ciego:
+    cada palabra debe coincidir con el principio de una palabra de la entrada.
+    """
+    if view not in VIEWS:
+        raise ValueError(f"Vista desconocida: {view}")
+    stmt = select(Entry).order_by(Entry.updated_at.desc(), Entry.id.desc())
+    if view == "vault":
+        stmt = stmt.where(Entry.deleted_at.is_(None))
+    elif view == "favoritos":
+        stmt = stmt.where(Entry.is_favorite.is_(True), Entry.deleted_at.is_(None))
+    elif view == "papelera":
+        stmt = stmt.where(Entry.deleted_at.is_not(None))
+    if text and ikey is not None:
+        cond = sealed.token_filter(ikey, text)
+        if cond is not None:
+            stmt = stmt.where(cond)
+    elif text:
+        pattern = f"%{text.strip()}%"
+        stmt = stmt.where(or_(
+            Entry.title.ilike(pattern), Entry.username.ilike(pattern), Entry.email.ilike(pattern),
+            Entry.url.ilike(pattern), Entry.notes.ilike(pattern),
+        ))
+    return stmt
+
+def iter_entries(session_factory, view: str = "vault", text: Optional[str] = None,
+                 chunk_size: int = 1000, key: Optional[bytes] = None) -> Iterator[Entry]:
+    """
+    Recorre las entradas de una vista por lotes (yield_per): memoria acotada.
+    Con 'key' las entradas selladas salen descifradas (ver sealed.opened).
+    """
+    ikey = sealed.index_key(key) if key is not None and sealed.is_enabled(session_factory) else None
+    stmt = entries_stmt(view, text, ikey).execution_options(yield_per=chunk_size)
+    with session_factory() as s:
+        for e in s.execute(stmt).scalars():
+            yield sealed.opened(key, e)
+
+def entries_page(session_factory, key: bytes, view: str = "vault", text: Optional[str] = None,
+                 offset: int = 0, limit: int = 200) -> Tuple[int, list]:
+    """(total, entradas de la página): solo se descifran las 'limit' filas de la página."""
+    ikey = sealed.index_key(key) if sealed.is_enabled(session_factory) else None
+    stmt = entries_stmt(view, text, ikey)
+    with session_factory() as s:
+        total = s.execute(select(func.count()).select_from(stmt.order_by(None).subquery())).scalar() or 0
+        rows = s.execute(stmt.offset(offset).limit(limit)).scalars().all()
+    return total, [sealed.opened(key, e) for e in rows]
+
+def get_entry(session_factory, ref: str) -> Optional[Entry]:
+    """Entrada por id numérico o por uid."""
+    with session_factory() as s:
+        if ref.isdigit():
+            return s.get(Entry, int(ref))
+        return s.execute(select(Entry).where(Entry.uid == ref)).scalars().first()
+
+def lookup_stmt(url: str):
+    """
+    Entradas no borradas del mismo sitio que 'url', por índice (url_domain):
+      1. mismo host ('accounts.google.com')
+      2. dominios padre ('google.com' para 'accounts.google.com')
+      3. otros subdominios del mismo dominio registrable ('mail.google.com')
+    y dentro de cada grupo, las más recientes primero.
+    """
+    host = host_of(url)
+    if not host:
+        raise ValueError(f"URL no válida: {url!r}")
+    parents = parent_domains(host)
+    rank = case((Entry.url_host == host, 0),
+                *([(Entry.url_host.in_(parents), 1)] if parents else []),
+                else_=2)
+    return (select(Entry).where(Entry.deleted_at.is_(None), Entry.url_domain == registrable_domain(host))
+            .order_by(rank, Entry.updated_at.desc(), Entry.id.desc()))
+
+def _lookup_sealed(session_factory, key: bytes, host: str, limit: Optional[int]) -> list:
+    """Como lookup_stmt con metadatos cifrados: candidatos por el token del dominio y orden tras descifrar."""
+    stmt = (select(Entry).where(Entry.deleted_at.is_(None), sealed.domain_filter(sealed.index_key(key), host))
+            .order_by(Entry.updated_at.desc(), Entry.id.desc()))
+    with session_factory() as s:
+        entries = [sealed.opened(key, e) for e in s.execute(stmt).scalars()]
+    parents = set(parent_domains(host))
+    entries.sort(key=lambda e: 0 if e.url_host == host else (1 if e.url_host in parents else 2))
+    return entries[:limit] if limit else entries
+
+def lookup_by_url(session_factory, url: str, limit: Optional[int] = None, key: Optional[bytes] = None) -> list:
+    """
+    Entradas para 'url' ordenadas como lookup_stmt ([] si la URL no tiene host).
+    Con 'key' también funciona en vaults con metadatos cifrados (y las devuelve descifradas).
+    """
+    try:
+        stmt = lookup_stmt(url)
+    except ValueError:
+        return []
+    if key is not None and sealed.is_enabled(session_factory):
+        return _lookup_sealed(session_factory, key, host_of(url), limit)
+    if limit:
+        stmt = stmt.limit(limit)
+    with session_factory() as s:
+        return list(s.execute(stmt).scalars())
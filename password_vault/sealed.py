@@ -0,0 +1,306 @@
+# password_vault/sealed.py
+# Cifrado opcional de los metadatos (título, usuario, correo, URL y notas) con índices
+# ciegos para seguir buscando sin descifrar la tabla:
+#   - Entry.meta_encrypted = Fernet(JSON de los metadatos); las columnas en claro quedan
+#     vacías (también url_host/url_domain, que delatarían los sitios)
+#   - entry_tokens: HMAC (clave HKDF propia, no la de Fernet) de cada palabra normalizada
+#     ("w"), de sus prefijos de 2 a MAX_PREFIX letras ("p"; no en las notas, que solo se
+#     buscan por palabra completa) y del host/dominio ("h"/"d")
+# Una búsqueda se resuelve con el índice (token, entry_id) y solo se descifran las filas
+# que se van a mostrar (ver queries.entries_page).
+# Se activa por vault con Setting.meta_encryption (enable/disable migran por lotes).
+# Las importaciones sellan cada lote antes del INSERT/UPDATE (seal_rows + index_rows) si el
+# vault cifra metadatos, para que el texto en claro no llegue al archivo ni al WAL, y
+# llaman a reconcile() al terminar (descifra lo que llegó sellado a un vault sin cifrado).
+import re
+import json
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, delete, insert, select, update
+
+from .db import Entry, EntryToken, Setting, engine_of
+from .crypto import decrypt_text, encrypt_text, hmac_sha256, subkey
+from .domains import host_of, parent_domains, registrable_domain
+
+META_FIELDS = ("title", "username", "email", "url", "notes")
+MIN_PREFIX = 2
+MAX_PREFIX = 8           # palabras más largas: prefijos hasta 8 letras + la palabra entera
+MAX_NOTE_WORDS = 64      # las notas largas no inflan el índice sin límite
+SEAL_BATCH = 500
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Valores de las columnas en claro de una fila sellada
+_BLANK = {"title": "", "username": "", "email": None, "url": "", "notes": "", "url_host": "", "url_domain": ""}
+
+def index_key(key: bytes) -> bytes:
+    return subkey(key, b"blind-index")
+
+# ===== Normalización y tokens =====
+
+def _fold(text: str) -> str:
+    """Minúsculas y sin tildes ('Año' -> 'ano')."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def words(text: Optional[str]) -> List[str]:
+    """Palabras normalizadas (2+ caracteres, sin repetir, en orden)."""
+    seen = {}
+    for w in _WORD_RE.findall(_fold(text or "")):
+        if len(w) >= MIN_PREFIX:
+            seen.setdefault(w, None)
+    return list(seen)
+
+def _token(ikey: bytes, kind: str, value: str) -> str:
+    return hmac_sha256(ikey, f"{kind}\0{value}".encode("utf-8")).hex()[:32]
+
+def tokens_for(ikey: bytes, meta: Dict[str, Optional[str]]) -> set:
+    host = host_of(meta.get("url"))
+    ws = []
+    for f in ("title", "username", "email"):
+        ws += words(meta.get(f))
+    ws += words(host)           # de la URL solo el host: 'https', 'login'... no aportan
+    prefixes = set()
+    for w in ws:
+        prefixes.update(w[:n] for n in range(MIN_PREFIX, min(len(w), MAX_PREFIX) + 1))
+    out = {_token(ikey, "p", p) for p in prefixes}
+    out.update(_token(ikey, "w", w) for w in set(ws + words(meta.get("notes"))[:MAX_NOTE_WORDS]))
+    if host:
+        for h in [host] + parent_domains(host):
+            out.add(_token(ikey, "h", h))
+        out.add(_token(ikey, "d", registrable_domain(host)))
+    return out
+
+def query_tokens(ikey: bytes, text: Optional[str]) -> List[List[str]]:
+    """
+    Tokens alternativos por palabra de la búsqueda: la palabra exacta (en cualquier campo)
+    o, si cabe en MAX_PREFIX, como comienzo de una palabra del título, usuario, correo o host.
+    """
+    out = []
+    for w in words(text):
+        alts = [_token(ikey, "w", w)]
+        if len(w) <= MAX_PREFIX:
+            alts.append(_token(ikey, "p", w))
+        out.append(alts)
+    return out
+
+def token_filter(ikey: bytes, text: Optional[str]):
+    """Condición con todas las palabras de 'text' (una subconsulta por índice cada una), o None."""
+    groups = query_tokens(ikey, text)
+    if not groups:
+        return None
+    t = EntryToken.__table__
+    return and_(*[Entry.id.in_(select(t.c.entry_id).where(t.c.token.in_(alts))) for alts in groups])
+
+def domain_filter(ikey: bytes, host: str):
+    t = EntryToken.__table__
+    return Entry.id.in_(select(t.c.entry_id).where(t.c.token == _token(ikey, "d", registrable_domain(host))))
+
+# ===== Lectura =====
+
+class EntryView:
+    """Entrada con los metadatos ya descifrados (solo lectura; mismos atributos que Entry)."""
+    __slots__ = ("id", "uid", "password_encrypted", "is_favorite", "created_at", "updated_at",
+                 "deleted_at", "meta_encrypted", "url_host", "url_domain") + META_FIELDS
+
+    def __init__(self, e, meta: Dict[str, Optional[str]]):
+        for name in self.__slots__:
+            setattr(self, name, meta[name] if name in meta else getattr(e, name, None))
+        self.url_host = host_of(self.url)
+        self.url_domain = registrable_domain(self.url_host)
+
+def seal_meta(key: bytes, meta: Dict[str, Optional[str]]) -> bytes:
+    return encrypt_text(key, json.dumps({f: meta.get(f) for f in META_FIELDS}, ensure_ascii=False))
+
+def open_meta(key: bytes, blob: bytes) -> Dict[str, Optional[str]]:
+    return json.loads(decrypt_text(key, blob))
+
+def meta_of(e) -> Dict[str, Optional[str]]:
+    return {f: getattr(e, f, None) for f in META_FIELDS}
+
+def opened(key: Optional[bytes], e):
+    """La propia entrada si está en claro; un EntryView descifrado si está sellada."""
+    if key is None or getattr(e, "meta_encrypted", None) is None:
+        return e
+    return EntryView(e, open_meta(key, e.meta_encrypted))
+
+def is_enabled(session_factory) -> bool:
+    with session_factory() as s:
+        return bool(s.execute(select(Setting.meta_encryption)).scalar())
+
+# ===== Escritura =====
+
+def replace_tokens(conn, ikey: bytes, metas: Dict[int, Dict[str, Optional[str]]]) -> None:
+    t = EntryToken.__table__
+    ids = list(metas)
+    if not ids:
+        return
+    conn.execute(delete(t).where(t.c.entry_id.in_(ids)))
+    rows = [{"entry_id": i, "token": tok} for i, meta in metas.items() for tok in tokens_for(ikey, meta)]
+    if rows:
+        conn.execute(insert(t), rows)
+
+def seal_entry(s, key: bytes, e) -> None:
+    """Cifra los metadatos de una entrada del ORM (nueva o editada) y reescribe sus tokens."""
+    meta = meta_of(e)
+    e.meta_encrypted = seal_meta(key, meta)
+    for f, v in _BLANK.items():
+        setattr(e, f, v)
+    s.flush()      # id de las nuevas
+    replace_tokens(s.connection(), index_key(key), {e.id: meta})
+
+def seal_key_for(session_factory, key: bytes) -> Optional[bytes]:
+    """La clave si las escrituras en este vault deben llegar ya selladas; None si no."""
+    return key if is_enabled(session_factory) else None
+
+def seal_rows(key: bytes, rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Dict]]:
+    """
+    Filas de Core (INSERT/UPDATE con uid) con los metadatos sellados y las columnas en
+    claro vacías, y {uid: metadatos} para index_rows(). Las que ya vienen selladas (de
+    un vault cifrado) se dejan como están; todas salen con las mismas claves (executemany).
+    """
+    out, metas = [], {}
+    for r in rows:
+        blob = r.get("meta_encrypted")
+        meta = open_meta(key, blob) if blob is not None else {f: r.get(f) for f in META_FIELDS}
+        out.append({**r, **_BLANK, "meta_encrypted": blob if blob is not None else seal_meta(key, meta)})
+        metas[r["uid"]] = meta
+    return out, metas
+
+def index_rows(conn, key: bytes, metas: Dict[str, Dict]) -> None:
+    """Tokens de las filas recién escritas con seal_rows (misma transacción)."""
+    t = Entry.__table__
+    uids = list(metas)
+    ids = dict(conn.execute(select(t.c.uid, t.c.id).where(t.c.uid.in_(uids))).all()) if uids else {}
+    replace_tokens(conn, index_key(key), {ids[u]: m for u, m in metas.items() if u in ids})
+
+def _batches(session_factory, where, batch: int):
+    """Lotes de filas que cumplen 'where', recorridos por id."""
+    t = Entry.__table__
+    last_id = 0
+    while True:
+        with session_factory() as s:
+            rows = s.execute(select(t).where(where, t.c.id > last_id).order_by(t.c.id).limit(batch)).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield rows
+
+def seal_pending(session_factory, key: bytes, batch: int = SEAL_BATCH,
+                 progress: Optional[Callable[[int], None]] = None) -> int:
+    """Sella las filas aún en claro (sin tocar updated_at). Devuelve cuántas."""
+    t = Entry.__table__
+    ikey = index_key(key)
+    stmt = (update(t).where(t.c.id == bindparam("_id"))
+            .values(meta_encrypted=bindparam("_meta"), updated_at=t.c.updated_at,
+                    **{f: bindparam("_" + f) for f in _BLANK}))
+    done = 0
+    for rows in _batches(session_factory, t.c.meta_encrypted.is_(None), batch):
+        metas = {r.id: meta_of(r) for r in rows}
+        with session_factory() as s:
+            s.execute(stmt, [{"_id": i, "_meta": seal_meta(key, m), **{"_" + f: v for f, v in _BLANK.items()}}
+                             for i, m in metas.items()])
+            replace_tokens(s.connection(), ikey, metas)
+            s.commit()
+        done += len(rows)
+        if progress:
+            progress(done)
+    return done
+
+def index_missing(session_factory, key: bytes, batch: int = SEAL_BATCH) -> int:
+    """
+    Crea los tokens de las filas que llegaron ya selladas (copia de un vault cifrado,
+    snapshot, restauración selectiva) y aún no tienen ninguno. Devuelve cuántas.
+    """
+    t, tok = Entry.__table__, EntryToken.__table__
+    ikey = index_key(key)
+    where = and_(t.c.meta_encrypted.is_not(None), t.c.id.not_in(select(tok.c.entry_id)))
+    done = 0
+    for rows in _batches(session_factory, where, batch):
+        with session_factory() as s:
+            replace_tokens(s.connection(), ikey, {r.id: open_meta(key, r.meta_encrypted) for r in rows})
+            s.commit()
+        done += len(rows)
+    return done
+
+def unseal_all(session_factory, key: bytes, batch: int = SEAL_BATCH,
+               progress: Optional[Callable[[int], None]] = None) -> int:
+    """Devuelve a claro las filas selladas y vacía el índice ciego. Devuelve cuántas."""
+    t = Entry.__table__
+    stmt = (update(t).where(t.c.id == bindparam("_id"))
+            .values(meta_encrypted=None, updated_at=t.c.updated_at,
+                    **{f: bindparam("_" + f) for f in _BLANK}))
+    done = 0
+    for rows in _batches(session_factory, t.c.meta_encrypted.is_not(None), batch):
+        params = []
+        for r in rows:
+            meta = open_meta(key, r.meta_encrypted)
+            host = host_of(meta.get("url"))
+            params.append({"_id": r.id, **{"_" + f: meta.get(f) for f in META_FIELDS},
+                           "_url_host": host, "_url_domain": registrable_domain(host)})
+        with session_factory() as s:
+            s.execute(stmt, params)
+            s.commit()
+        done += len(rows)
+        if progress:
+            progress(done)
+    with session_factory() as s:
+        s.execute(delete(EntryToken.__table__))
+        s.commit()
+    return done
+
+def _set_flag(session_factory, value: Optional[bool]) -> None:
+    with session_factory() as s:
+        st = s.query(Setting).first()
+        if st is None:
+            raise ValueError("El vault no está inicializado")
+        st.meta_encryption = value
+        s.commit()
+
+def _drop_orphan_tokens(session_factory) -> None:
+    t = EntryToken.__table__
+    with session_factory() as s:
+        s.execute(delete(t).where(t.c.entry_id.not_in(select(Entry.id))))
+        s.commit()
+
+def _vacuum(session_factory) -> None:
+    """SQLite: reescribe el archivo para que no queden los textos en claro en páginas libres."""
+    eng = engine_of(session_factory)
+    if eng.dialect.name == "sqlite":
+        with eng.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+
+def enable(session_factory, key: bytes, progress: Optional[Callable[[int], None]] = None) -> int:
+    """Activa el cifrado de metadatos y sella las filas existentes (por lotes)."""
+    _set_flag(session_factory, True)      # antes: lo que se escriba mientras tanto ya se sella
+    n = seal_pending(session_factory, key, progress=progress)
+    _drop_orphan_tokens(session_factory)
+    _vacuum(session_factory)
+    return n
+
+def disable(session_factory, key: bytes, progress: Optional[Callable[[int], None]] = None) -> int:
+    n = unseal_all(session_factory, key, progress=progress)
+    _set_flag(session_factory, None)
+    return n
+
+def reconcile(session_factory, key: bytes) -> int:
+    """
+    Tras una importación: sella lo que llegó en claro si el vault cifra metadatos (e
+    indexa lo que llegó ya sellado), o descifra lo que llegó sellado (de una copia de un
+    vault cifrado) si no.
+    """
+    if is_enabled(session_factory):
+        plain = seal_pending(session_factory, key)
+        n = plain + index_missing(session_factory, key)
+        _drop_orphan_tokens(session_factory)
+        if plain:
+            # Llegó texto en claro por una vía que no sella antes de escribir (merge de
+            # un snapshot SQLite): que no quede en páginas libres
+            _vacuum(session_factory)
+        return n
+    t = Entry.__table__
+    with session_factory() as s:
+        if s.execute(select(t.c.id).where(t.c.meta_encrypted.is_not(None)).limit(1)).first() is None:
+            return 0
+    return unseal_all(session_factory, key)
@@ -0,0 +1,107 @@
+# password_vault/sqlite_snapshot.py
+# Copia a nivel de páginas de un vault SQLite (API de backup online de sqlite3).
+# Exportar/restaurar escala con el tamaño del archivo, no con el trabajo por fila en Python.
+import os
+import uuid
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from .db import engine_of
+
+DEFAULT_PAGES_PER_STEP = 256     # páginas copiadas por paso (los escritores no quedan bloqueados)
+_STEP_SLEEP = 0.005              # pausa entre pasos si la BD está ocupada (segundos)
+
+def sqlite_uri(path: str, readonly: bool = False) -> str:
+    """URI file:/// (válida también con rutas de Windows); ?mode=ro para solo lectura."""
+    uri = Path(path).resolve().as_uri()
+    return uri + "?mode=ro" if readonly else uri
+
+def sqlite_path_of(session_factory) -> Optional[str]:
+    """Ruta del archivo SQLite del vault, o None si no es SQLite en archivo."""
+    url = engine_of(session_factory).url
+    if url.get_backend_name() != "sqlite":
+        return None
+    db = url.database
+    if not db or db == ":memory:" or db.startswith("file:"):
+        return None
+    return os.path.abspath(db)
+
+def snapshot_to_file(src_path: str, dst_path: str, pages: int = DEFAULT_PAGES_PER_STEP,
+                     progress: Optional[Callable[[int, int, int], None]] = None) -> None:
+    """
+    Copia consistente de 'src_path' en 'dst_path' en pasos de 'pages' páginas.
+    Si otra conexión escribe durante la copia, SQLite la reinicia sola.
+    'progress(status, remaining, total)' es el callback estándar de sqlite3.
+    """
+    src = sqlite3.connect(sqlite_uri(src_path, readonly=True), uri=True)
+    dst = sqlite3.connect(dst_path)
+    try:
+        src.backup(dst, pages=pages, progress=progress, sleep=_STEP_SLEEP)
+    finally:
+        dst.close()
+        src.close()
+
+def restore_replace(snapshot_path: str, live_path: str, pages: int = DEFAULT_PAGES_PER_STEP) -> int:
+    """
+    Sustituye el vault vivo por el snapshot copiando páginas (incluye 'settings':
+    la contraseña maestra pasa a ser la del vault exportado).
+    Devuelve el nº de entradas restauradas.
+    """
+    snap = sqlite3.connect(sqlite_uri(snapshot_path, readonly=True), uri=True)
+    live = sqlite3.connect(live_path)
+    try:
+        snap.backup(live, pages=pages, sleep=_STEP_SLEEP)
+        return live.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+    finally:
+        live.close()
+        snap.close()
+
+def _columns(conn, schema: str, table: str) -> list:
+    return [r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+def restore_merge(snapshot_path: str, live_path: str) -> int:
+    """
+    ATTACH del snapshot y INSERT ... SELECT de sus entradas en el vault vivo
+    (ids nuevos; solo las columnas que existen en ambos esquemas).
+    Las copias reciben uid nuevo (como una importación "append"), version 1,
+    changed_at = ahora y sync_hash vacío. Devuelve el nº de entradas añadidas.
+    """
+    # Abierta como URI para que el ATTACH acepte "file:...?mode=ro"
+    live = sqlite3.connect(sqlite_uri(live_path), uri=True, isolation_level=None)
+    live.create_function("pv_uuid4", 0, lambda: str(uuid.uuid4()), deterministic=False)
+    try:
+        live.execute("ATTACH DATABASE ? AS snap", (sqlite_uri(snapshot_path, readonly=True),))
+        try:
+            snap_cols = set(_columns(live, "snap", "entries"))
+            live_cols = _columns(live, "main", "entries")
+            # Columnas que no se copian sino que se generan para cada fila nueva
+            generated = {
+                "uid": "pv_uuid4()",
+                "version": "1",
+                # changed_at = ahora: deben entrar en la siguiente exportación diferencial
+                "changed_at": "?",
+                # El hash de sync del snapshot puede ser de otra clave: se recalcula
+                "sync_hash": "NULL",
+            }
+            cols = [c for c in live_cols if c in snap_cols and c != "id" and c not in generated]
+            extra = [c for c in generated if c in live_cols]
+            params = (datetime.utcnow().isoformat(sep=" "),) if "changed_at" in extra else ()
+            col_list = ", ".join(cols + extra)
+            select_list = ", ".join(cols + [generated[c] for c in extra])
+            live.execute("BEGIN")
+            try:
+                cur = live.execute(
+                    f"INSERT INTO main.entries ({col_list}) SELECT {select_list} FROM snap.entries ORDER BY id",
+                    params,
+                )
+                live.execute("COMMIT")
+            except Exception:
+                live.execute("ROLLBACK")     # si no, DETACH falla con la transacción abierta
+                raise
+            return cur.rowcount
+        finally:
+            live.execute("DETACH DATABASE snap")
+    finally:
+        live.close()
@@ -0,0 +1,306 @@
+# password_vault/sync.py
+# Sincronización entre dos vaults (p. ej. SQLite del portátil y MySQL) sin exportar
+# el vault entero: solo viajan las entradas que difieren.
+#   - Cada entrada se identifica por su uid (estable entre vaults) y su estado es un
+#     hash de su contenido (metadatos abiertos, contraseña, favorito, papelera); las
+#     eliminadas para siempre cuentan como "purgadas" por sus tombstones
+#   - Cada lado calcula un árbol de hashes por prefijo del uid (1, 2 y 3 caracteres
+#     hex: 16 / 256 / 4096 cubos); se baja por el árbol solo donde los hashes difieren
+#     y se comparan uid a uid únicamente los cubos distintos
+#   - Si el contenido difiere gana la última escritura (updated_at); una purga gana si
+#     es posterior a la última edición del otro lado
+# Las contraseñas se descifran con la clave de un vault y se cifran con la del otro
+# (cada vault tiene su propia sal); los metadatos sellados viajan en claro en memoria y
+# el destino los sella antes de escribirlos si cifra metadatos (ver sealed.seal_rows).
+# El hash de contenido es un HMAC con una clave derivada de las claves de ambos vaults:
+# comparable entre los dos y sin valor para quien no tenga ambas. Se guarda en
+# entries.sync_hash: cada escritura lo anula (onupdate) y aquí solo se descifran las
+# filas que lo tienen vacío; las hojas del árbol se calculan leyendo uid + hash.
+# Al sincronizar con otro vault (otra clave de hash) se recalculan todos una vez.
+# Los adjuntos no se sincronizan.
+import json
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, delete, or_, select, update
+
+from .db import Entry, EntryToken, EntryTombstone, Setting, record_tombstones
+from .crypto import decrypt_text, encrypt_text, hmac_sha256
+from .export_import import apply_upsert_rows
+from . import attachments
+from . import sealed
+
+LEVELS = 3              # caracteres del prefijo del uid en las hojas (16**3 cubos)
+FETCH_BATCH = 500       # uids por consulta al leer filas
+PREFIX_BATCH = 50       # cubos por consulta al leer estados
+
+# ("live" | "purged", updated_at o purged_at, en papelera, hash del contenido ('' si purgada))
+State = Tuple[str, Optional[datetime], bool, str]
+
+def content_key(key_a: bytes, key_b: bytes) -> bytes:
+    """Clave del hash de contenido: la misma desde ambos lados, no deducible con una sola clave."""
+    return hmac_sha256(b"".join(sorted((key_a, key_b))), b"pv-sync-content")
+
+def _key_id(ckey: bytes) -> str:
+    """Huella pública de la clave de hash (se guarda en settings.sync_hash_key)."""
+    return hashlib.sha256(hmac_sha256(ckey, b"pv-sync-key-id")).hexdigest()
+
+def _same(sa: State, sb: State) -> bool:
+    # La fecha no cuenta: solo desempata cuando el contenido difiere
+    return (sa[0], sa[2], sa[3]) == (sb[0], sb[2], sb[3])
+
+def _state_digest(uid: str, state: State) -> bytes:
+    kind, _, trashed, content = state
+    return hashlib.sha256(f"{uid}\0{kind}\0{int(trashed)}\0{content}".encode("utf-8")).digest()
+
+def _prefix_ranges(col, prefixes: List[str]):
+    """Condición 'col empieza por alguno de los prefijos' como rangos (usa el índice de uid)."""
+    return or_(*[and_(col >= p, col < p[:-1] + chr(ord(p[-1]) + 1)) for p in prefixes])
+
+class SyncSide:
+    """Un vault en la sincronización: su árbol de hashes, sus estados y sus filas."""
+    def __init__(self, session_factory, key: bytes, ckey: bytes):
+        self.sf = session_factory
+        self.key = key
+        self.ckey = ckey
+        self.seal_key = sealed.seal_key_for(session_factory, key)
+
+    # --- Hashes de contenido ---
+    def _content(self, r) -> str:
+        meta = sealed.open_meta(self.key, r.meta_encrypted) if r.meta_encrypted is not None \
+            else sealed.meta_of(r)
+        doc = json.dumps([meta.get(f) or "" for f in sealed.META_FIELDS]
+                         + [decrypt_text(self.key, r.password_encrypted), bool(r.is_favorite)],
+                         ensure_ascii=False)
+        return hmac_sha256(self.ckey, doc.encode("utf-8")).hex()
+
+    def _use_key(self) -> None:
+        """Si los hashes guardados son de otra clave (otro vault con el que se sincronizó), se anulan."""
+        kid = _key_id(self.ckey)
+        t = Entry.__table__
+        with self.sf() as s:
+            st = s.query(Setting).first()
+            if st is None or st.sync_hash_key == kid:
+                return
+            s.execute(update(t).where(t.c.sync_hash.is_not(None))
+                      .values(sync_hash=None, updated_at=t.c.updated_at, changed_at=t.c.changed_at,
+                              version=t.c.version))
+            st.sync_hash_key = kid
+            s.commit()
+
+    def refresh_hashes(self) -> int:
+        """Calcula sync_hash de las filas escritas desde la última sincronización. Devuelve cuántas."""
+        self._use_key()
+        t = Entry.__table__
+        cols = (t.c.id, t.c.version, t.c.is_favorite, t.c.password_encrypted, t.c.meta_encrypted,
+                *[t.c[f] for f in sealed.META_FIELDS])
+        # Solo si la fila sigue en la versión leída (una edición concurrente lo volvería a anular);
+        # ni updated_at, ni changed_at, ni version se mueven: no es una escritura de contenido
+        stmt = (update(t).where(t.c.id == bindparam("_id"), t.c.version == bindparam("_version"))
+                .values(sync_hash=bindparam("_hash"), updated_at=t.c.updated_at,
+                        changed_at=t.c.changed_at, version=t.c.version))
+        done, last = 0, 0
+        while True:
+            with self.sf() as s:
+                rows = s.execute(select(*cols)
+                                 .where(t.c.sync_hash.is_(None), t.c.uid.is_not(None), t.c.id > last)
+                                 .order_by(t.c.id).limit(FETCH_BATCH)).all()
+                if not rows:
+                    return done
+                s.execute(stmt, [{"_id": r.id, "_version": r.version, "_hash": self._content(r)}
+                                 for r in rows])
+                s.commit()
+            done += len(rows)
+            last = rows[-1].id
+
+    # --- Estados ---
+    def _live_states(self, where=None) -> Iterable[Tuple[str, State]]:
+        """Estados desde los hashes guardados (refresh_hashes() antes): no se descifra nada."""
+        t = Entry.__table__
+        stmt = (select(t.c.uid, t.c.updated_at, t.c.deleted_at, t.c.sync_hash)
+                .where(t.c.uid.is_not(None)))
+        if where is not None:
+            stmt = stmt.where(where)
+        with self.sf() as s:
+            for r in s.execute(stmt.execution_options(yield_per=FETCH_BATCH)):
+                yield r.uid, ("live", r.updated_at, r.deleted_at is not None, r.sync_hash or "")
+
+    def _purged_states(self, prefixes: Optional[List[str]] = None) -> Iterable[Tuple[str, State]]:
+        """Una por uid purgado que no haya vuelto a existir (la purga más reciente)."""
+        t = EntryTombstone.__table__
+        live = select(Entry.uid).where(Entry.uid.is_not(None))
+        stmt = select(t.c.uid, t.c.purged_at).where(t.c.uid.not_in(live))
+        if prefixes is not None:
+            stmt = stmt.where(_prefix_ranges(t.c.uid, prefixes))
+        latest: Dict[str, datetime] = {}
+        with self.sf() as s:
+            for uid, purged_at in s.execute(stmt):
+                if uid not in latest or purged_at > latest[uid]:
+                    latest[uid] = purged_at
+        for uid, purged_at in latest.items():
+            yield uid, ("purged", purged_at, False, "")
+
+    def leaf_digests(self) -> Dict[str, bytes]:
+        """Hash de cada cubo (XOR de los hashes de estado de sus uids: no hace falta ordenar)."""
+        leaves: Dict[str, int] = {}
+        for source in (self._live_states(), self._purged_states()):
+            for uid, state in source:
+                p = uid[:LEVELS]
+                leaves[p] = leaves.get(p, 0) ^ int.from_bytes(_state_digest(uid, state), "big")
+        return {p: v.to_bytes(32, "big") for p, v in leaves.items()}
+
+    def states_in(self, prefixes: List[str]) -> Dict[str, State]:
+        out: Dict[str, State] = {}
+        for i in range(0, len(prefixes), PREFIX_BATCH):
+            chunk = prefixes[i:i + PREFIX_BATCH]
+            out.update(self._live_states(_prefix_ranges(Entry.__table__.c.uid, chunk)))
+            out.update(self._purged_states(chunk))
+        return out
+
+    # --- Filas ---
+    def read_rows(self, uids: List[str]) -> List[Dict[str, Any]]:
+        """Filas en claro (contraseña descifrada, metadatos abiertos) de los uids pedidos."""
+        t = Entry.__table__
+        out = []
+        with self.sf() as s:
+            for i in range(0, len(uids), FETCH_BATCH):
+                for r in s.execute(select(t).where(t.c.uid.in_(uids[i:i + FETCH_BATCH]))).all():
+                    meta = sealed.open_meta(self.key, r.meta_encrypted) if r.meta_encrypted is not None \
+                        else sealed.meta_of(r)
+                    out.append({
+                        "uid": r.uid, **meta,
+                        "password": decrypt_text(self.key, r.password_encrypted),
+                        "is_favorite": bool(r.is_favorite), "deleted_at": r.deleted_at,
+                        "created_at": r.created_at, "updated_at": r.updated_at,
+                    })
+        return out
+
+    def write_rows(self, rows: List[Dict[str, Any]], hashes: Dict[str, str]) -> None:
+        """
+        Inserta o actualiza por uid conservando updated_at (no cuenta como edición local).
+        'hashes' son los sync_hash del origen (mismo contenido, misma clave): no hay que
+        recalcularlos en la siguiente sincronización.
+        """
+        now = datetime.utcnow()
+        converted = [{
+            "uid": d["uid"],
+            **{f: d.get(f) for f in sealed.META_FIELDS},
+            "password_encrypted": encrypt_text(self.key, d["password"]),
+            "is_favorite": d["is_favorite"], "deleted_at": d["deleted_at"],
+            "created_at": d["created_at"] or now, "updated_at": d["updated_at"] or now,
+            "meta_encrypted": None,
+            "sync_hash": hashes.get(d["uid"]) or None,
+        } for d in rows]
+        with self.sf() as s:
+            for i in range(0, len(converted), FETCH_BATCH):
+                apply_upsert_rows(s, converted[i:i + FETCH_BATCH], [], now, self.seal_key)
+                s.commit()
+
+    def purge(self, purges: Dict[str, datetime]) -> None:
+        """Elimina (o solo anota, si no existen) los uids purgados en el otro lado."""
+        t, tok = Entry.__table__, EntryToken.__table__
+        with self.sf() as s:
+            uids = list(purges)
+            for i in range(0, len(uids), FETCH_BATCH):
+                ids = select(t.c.id).where(t.c.uid.in_(uids[i:i + FETCH_BATCH]))
+                # DELETE de Core: el listener del ORM no limpia el índice ciego
+                s.execute(delete(tok).where(tok.c.entry_id.in_(ids)))
+                s.execute(delete(t).where(t.c.uid.in_(uids[i:i + FETCH_BATCH])))
+            conn = s.connection()
+            for uid, when in purges.items():
+                record_tombstones(conn, [uid], when)
+            s.commit()
+
+# ===== Árbol =====
+
+def build_tree(leaves: Dict[str, bytes]) -> List[Dict[str, bytes]]:
+    """Niveles del árbol: [{"": raíz}, {prefijos de 1}, ..., {prefijos de LEVELS: hojas}]."""
+    levels = [dict(leaves)]
+    for depth in range(LEVELS - 1, -1, -1):
+        children = levels[0]
+        parents: Dict[str, List[str]] = {}
+        for p in sorted(children):
+            parents.setdefault(p[:depth], []).append(p)
+        levels.insert(0, {q: hashlib.sha256(b"".join(p.encode("utf-8") + children[p] for p in ps)).digest()
+                          for q, ps in parents.items()})
+    return levels
+
+def diff_trees(a: List[Dict[str, bytes]], b: List[Dict[str, bytes]]) -> Tuple[List[str], int]:
+    """Hojas distintas bajando solo por los nodos distintos. Devuelve (hojas, nodos comparados)."""
+    if a[0].get("") == b[0].get(""):
+        return [], 1
+    frontier = [""]
+    compared = 1
+    for depth in range(1, LEVELS + 1):
+        wanted = set(frontier)
+        keys = {p for p in set(a[depth]) | set(b[depth]) if p[:depth - 1] in wanted}
+        compared += len(keys)
+        frontier = sorted(p for p in keys if a[depth].get(p) != b[depth].get(p))
+        if not frontier:
+            break
+    return frontier, compared
+
+# ===== Reconciliación =====
+
+def _decide(sa: Optional[State], sb: Optional[State]) -> Optional[str]:
+    """'a' si gana el estado de A (se copia a B), 'b' al revés, None si ya coinciden."""
+    if sb is None:
+        return "a" if sa is not None else None
+    if sa is None:
+        return "b"
+    if _same(sa, sb) or (sa[0] == "purged" and sb[0] == "purged"):
+        return None
+    # Empate de fecha: gana la purga o la papelera (borrar es lo más conservador) y, si
+    # no, el hash mayor (ambos lados eligen lo mismo)
+    ka = (sa[1] or datetime.min, sa[0] == "purged", sa[2], sa[3])
+    kb = (sb[1] or datetime.min, sb[0] == "purged", sb[2], sb[3])
+    return "a" if ka >= kb else "b"
+
+def _transfer(src: SyncSide, dst: SyncSide, uids: List[str], states: Dict[str, State]) -> Dict[str, int]:
+    live = [u for u in uids if states[u][0] == "live"]
+    purges = {u: states[u][1] for u in uids if states[u][0] == "purged"}
+    if live:
+        dst.write_rows(src.read_rows(live), {u: states[u][3] for u in live})
+    if purges:
+        dst.purge(purges)
+    return {"copied": len(live), "purged": len(purges)}
+
+def sync_vaults(sf_a, key_a: bytes, sf_b, key_b: bytes, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Sincroniza A y B en ambos sentidos. Devuelve un resumen:
+    {"buckets": cubos distintos, "compared": nodos comparados, "a_to_b": {...}, "b_to_a": {...}}.
+    Con dry_run no escribe entradas (los conteos son los que se aplicarían); sí pone al
+    día la caché de hashes de contenido.
+    """
+    ckey = content_key(key_a, key_b)
+    a, b = SyncSide(sf_a, key_a, ckey), SyncSide(sf_b, key_b, ckey)
+    a.refresh_hashes()
+    b.refresh_hashes()
+    leaves, compared = diff_trees(build_tree(a.leaf_digests()), build_tree(b.leaf_digests()))
+    to_b: List[str] = []
+    to_a: List[str] = []
+    states_a: Dict[str, State] = {}
+    states_b: Dict[str, State] = {}
+    if leaves:
+        states_a, states_b = a.states_in(leaves), b.states_in(leaves)
+        for uid in set(states_a) | set(states_b):
+            side = _decide(states_a.get(uid), states_b.get(uid))
+            if side == "a":
+                to_b.append(uid)
+            elif side == "b":
+                to_a.append(uid)
+    summary = {"buckets": len(leaves), "compared": compared,
+               "a_to_b": {"copied": sum(states_a[u][0] == "live" for u in to_b),
+                          "purged": sum(states_a[u][0] == "purged" for u in to_b)},
+               "b_to_a": {"copied": sum(states_b[u][0] == "live" for u in to_a),
+                          "purged": sum(states_b[u][0] == "purged" for u in to_a)}}
+    if dry_run:
+        return summary
+    for src, dst, uids, states in ((a, b, to_b, states_a), (b, a, to_a, states_b)):
+        if not uids:
+            continue
+        done = _transfer(src, dst, sorted(uids), states)     # ya sellado si el destino cifra
+        if done["purged"]:
+            attachments.gc_chunks(dst.sf)
+    return summary
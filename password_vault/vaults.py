@@ -0,0 +1,139 @@
+# password_vault/vaults.py
+# Varios vaults abiertos a la vez: cada uno con su engine, sessionmaker, clave y
+# una caché de la vista (entradas ya cargadas por filtro). Cambiar de vault en la
+# app solo cambia el VaultHandle activo: ni scrypt ni reconstrucción de la UI.
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import sessionmaker
+
+from .db import Setting, build_engine, init_db
+from .crypto import derive_key, make_verifier, verify_master
+
+VIEW_CACHE_SIZE = 4    # filtros recordados por vault (vistas + última búsqueda)
+
+class VaultHandle:
+    """Un vault abierto. 'key' es None mientras esté bloqueado."""
+    def __init__(self, name: str, url: str, engine=None, session_factory=None, key: Optional[bytes] = None,
+                 cache_size: int = VIEW_CACHE_SIZE):
+        self.name = name
+        self.url = url
+        self.engine = engine
+        self.SessionLocal = session_factory
+        self.key = key
+        self.sealed = False         # metadatos cifrados (Setting.meta_encryption)
+        self.watcher = None
+        self.search_text = ""
+        self.cache_size = cache_size
+        self._views: "OrderedDict[str, list]" = OrderedDict()
+
+    @property
+    def is_open(self) -> bool:
+        return self.engine is not None
+
+    @property
+    def unlocked(self) -> bool:
+        return self.key is not None
+
+    def open(self) -> None:
+        """Crea engine y sessionmaker (y migra el esquema) si aún no están."""
+        if self.engine is None:
+            self.engine = build_engine(self.url)
+            init_db(self.engine)
+            self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+
+    def needs_setup(self) -> bool:
+        """True si el vault aún no tiene contraseña maestra (primer uso)."""
+        self.open()
+        with self.SessionLocal() as s:
+            return s.query(Setting).first() is None
+
+    def unlock(self, master_password: str) -> bool:
+        """Deriva la clave (scrypt, una sola vez) y la valida; en un vault nuevo la crea."""
+        self.open()
+        with self.SessionLocal() as s:
+            st = s.query(Setting).first()
+            if st is None:
+                salt = os.urandom(16)
+                key = derive_key(master_password, salt)
+                s.add(Setting(kdf_salt=salt, verifier=make_verifier(key)))
+                s.commit()
+                self.key = key
+                return True
+        key = derive_key(master_password, st.kdf_salt)
+        if not verify_master(key, st.verifier):
+            return False
+        self.key = key
+        self.sealed = bool(st.meta_encryption)
+        return True
+
+    # --- Caché de la vista ---
+    def cached_view(self, query: str) -> Optional[list]:
+        entries = self._views.get(query)
+        if entries is not None:
+            self._views.move_to_end(query)
+        return entries
+
+    def cache_view(self, query: str, entries: list) -> None:
+        self._views[query] = entries
+        self._views.move_to_end(query)
+        while len(self._views) > self.cache_size:
+            self._views.popitem(last=False)
+
+    def invalidate(self) -> None:
+        self._views.clear()
+
+    def lock(self) -> None:
+        self.key = None
+        self.invalidate()
+
+    def close(self) -> None:
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        self.lock()
+        if self.engine is not None:
+            self.engine.dispose()
+        self.engine = None
+        self.SessionLocal = None
+
+class VaultRegistry:
+    """Vaults conocidos por nombre, en orden de alta."""
+    def __init__(self):
+        self._vaults: Dict[str, VaultHandle] = {}
+
+    def add(self, handle: VaultHandle) -> VaultHandle:
+        if handle.name in self._vaults:
+            raise ValueError(f"Ya hay un vault llamado {handle.name!r}")
+        self._vaults[handle.name] = handle
+        return handle
+
+    def add_url(self, name: str, url: str) -> VaultHandle:
+        return self.add(VaultHandle(name, url))
+
+    def get(self, name: str) -> VaultHandle:
+        return self._vaults[name]
+
+    def find_url(self, url: str) -> Optional[VaultHandle]:
+        for h in self._vaults.values():
+            if h.url == url:
+                return h
+        return None
+
+    def handles(self) -> List[VaultHandle]:
+        return list(self._vaults.values())
+
+    def unique_name(self, base: str) -> str:
+        name, n = base, 2
+        while name in self._vaults:
+            name, n = f"{base} ({n})", n + 1
+        return name
+
+    def remove(self, name: str) -> None:
+        h = self._vaults.pop(name)
+        h.close()
+
+    def close_all(self) -> None:
+        for h in self._vaults.values():
+            h.close()
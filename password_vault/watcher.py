@@ -0,0 +1,223 @@
+# password_vault/watcher.py
+# Detecta cambios hechos por otros procesos (otra instancia de la app, scripts...)
+# sobre el mismo vault y los publica en vault_events.entry_changed.
+#   - SQLite: PRAGMA data_version en una conexión propia (no toca tablas si no cambió)
+#   - Otros motores (MySQL...): huella barata MAX(changed_at) + MAX(id) + COUNT(*) de
+#     entradas y MAX(id) de tombstones, resueltas con índices
+# Solo cuando la comprobación barata indica un cambio se consultan las filas con
+# changed_at >= marca de agua o id > último id visto (altas que conservan fechas
+# antiguas), y se emite un aviso por id (agrupados con batch()).
+import sqlite3
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from .db import Entry, EntryTombstone
+from .events import vault_events
+from .sqlite_snapshot import sqlite_path_of, sqlite_uri
+
+DEFAULT_INTERVAL_MS = 1500
+MAX_IDS_PER_POLL = 500     # por encima se emite un único aviso genérico
+
+class ChangeWatcher:
+    """
+    Sondeo de cambios externos. Con Tk: watcher.start(root) programa poll() con
+    root.after cada 'interval_ms'; sin UI basta con llamar a poll() periódicamente.
+    Los cambios que la propia app ya anunció en vault_events se descartan.
+    """
+    def __init__(self, session_factory, interval_ms: int = DEFAULT_INTERVAL_MS, events=vault_events):
+        self._sf = session_factory
+        self.interval_ms = interval_ms
+        self._events = events
+        self._root = None
+        self._after_id = None
+        self._sqlite_path = sqlite_path_of(session_factory)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._version = None
+        self._fingerprint = None
+        self._local_ids = set()
+        self._local_bulk = False
+        self._local_deletes = 0
+        self._emitting = False
+        self._paused = False
+        self._watermark, self._at_watermark, self._tomb_id, self._max_id, self._count = self._current_marks()
+        events.entry_changed.connect(self._note_local, weak=True)
+        if self._sqlite_path:
+            self._conn = sqlite3.connect(sqlite_uri(self._sqlite_path, readonly=True), uri=True,
+                                         check_same_thread=False)
+            self._version = self._data_version()
+        else:
+            self._fingerprint = self._read_fingerprint()
+
+    # --- Tk ---
+    def start(self, root) -> None:
+        self._root = root
+        self._schedule()
+
+    def stop(self) -> None:
+        if self._root is not None and self._after_id is not None:
+            try:
+                self._root.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self._after_id = None
+        self._root = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def pause(self) -> None:
+        """Deja de sondear (vault en segundo plano) sin perder la marca de agua."""
+        self._paused = True
+        if self._root is not None and self._after_id is not None:
+            try:
+                self._root.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self._after_id = None
+
+    def resume(self) -> None:
+        """Vuelve a sondear; lo ocurrido mientras estaba en pausa sale en el primer poll()."""
+        if not self._paused:
+            return
+        self._paused = False
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._root is not None and not self._paused:
+            self._after_id = self._root.after(self.interval_ms, self._tick)
+
+    def _tick(self) -> None:
+        try:
+            self.poll()
+        finally:
+            self._schedule()
+
+    # --- Comprobación barata ---
+    def _data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _read_fingerprint(self) -> Tuple:
+        with self._sf() as s:
+            return (
+                s.execute(select(func.max(Entry.changed_at))).scalar(),
+                s.execute(select(func.max(Entry.id))).scalar(),
+                s.execute(select(func.count()).select_from(Entry)).scalar(),
+                s.execute(select(func.max(EntryTombstone.id))).scalar(),
+            )
+
+    def changed(self) -> bool:
+        """True si alguien hizo commit desde la última comprobación."""
+        if self._conn is not None:
+            v = self._data_version()
+            if v == self._version:
+                return False
+            self._version = v
+            return True
+        fp = self._read_fingerprint()
+        if fp == self._fingerprint:
+            return False
+        self._fingerprint = fp
+        return True
+
+    # --- Cambios locales (ya anunciados por la app) ---
+    def _note_local(self, action: str, entry_id: Optional[int] = None, **_ignored) -> None:
+        # En pausa, los avisos son de otro vault (los ids no son comparables)
+        if self._emitting or self._paused:
+            return
+        if entry_id is not None:
+            self._local_ids.add(entry_id)
+        elif action == "import":
+            self._local_bulk = True
+        if action == "delete" and entry_id is not None and not self._exists(entry_id):
+            # Solo las eliminadas para siempre: mover a la papelera es una edición
+            self._local_deletes += 1
+
+    def _exists(self, entry_id: int) -> bool:
+        with self._sf() as s:
+            return s.execute(select(Entry.id).where(Entry.id == entry_id)).first() is not None
+
+    # --- Detalle ---
+    def _current_marks(self) -> Tuple[Optional[datetime], set, int, int, int]:
+        with self._sf() as s:
+            wm = s.execute(select(func.max(Entry.changed_at))).scalar()
+            at = set(s.execute(select(Entry.id).where(Entry.changed_at == wm)).scalars()) if wm else set()
+            tomb = s.execute(select(func.max(EntryTombstone.id))).scalar() or 0
+            max_id = s.execute(select(func.max(Entry.id))).scalar() or 0
+            count = s.execute(select(func.count()).select_from(Entry)).scalar() or 0
+        return wm, at, tomb, max_id, count
+
+    def _collect_changes(self) -> Tuple[List[Tuple[int, str]], int]:
+        """([(id, 'add'|'edit')], nº de eliminadas para siempre) desde la última marca."""
+        t = Entry.__table__
+        # changed_at lo fija la app en cada escritura (no se conserva al importar);
+        # id > último visto cubre altas con SQL externo que no lo rellenan
+        stmt = select(t.c.id, t.c.changed_at).order_by(t.c.changed_at)
+        if self._watermark is not None:
+            stmt = stmt.where((t.c.changed_at >= self._watermark) | (t.c.id > self._max_id))
+        changes = []
+        with self._sf() as s:
+            for eid, changed in s.execute(stmt):
+                if changed is not None and changed == self._watermark and eid in self._at_watermark:
+                    continue
+                changes.append((eid, "add" if eid > self._max_id else "edit"))
+                if changed is None:
+                    continue
+                if self._watermark is None or changed > self._watermark:
+                    self._watermark, self._at_watermark = changed, set()
+                if changed == self._watermark:
+                    self._at_watermark.add(eid)
+            tomb = s.execute(select(func.max(EntryTombstone.id))).scalar() or 0
+            max_id = s.execute(select(func.max(t.c.id))).scalar() or 0
+            count = s.execute(select(func.count()).select_from(t)).scalar() or 0
+        purged = 0
+        if tomb > self._tomb_id:
+            with self._sf() as s:
+                purged = s.execute(select(func.count()).select_from(EntryTombstone)
+                                   .where(EntryTombstone.id > self._tomb_id)).scalar()
+            self._tomb_id = tomb
+        # Borrados que no dejan tombstone (DELETE externo): los delata el recuento
+        added = sum(1 for _, action in changes if action == "add")
+        purged = max(purged, self._count + added - count)
+        self._max_id, self._count = max(self._max_id, max_id), count
+        return changes, purged
+
+    def poll(self) -> int:
+        """Comprueba y emite los cambios externos. Devuelve cuántos avisos se emitieron."""
+        if not self.changed():
+            return 0
+        changes, purged = self._collect_changes()
+        local_ids, self._local_ids = self._local_ids, set()
+        local_bulk, self._local_bulk = self._local_bulk, False
+        local_deletes, self._local_deletes = self._local_deletes, 0
+        if local_bulk:
+            # La app acaba de importar y ya refrescó la tabla entera
+            return 0
+        changes = [(eid, action) for eid, action in changes if eid not in local_ids]
+        purged = max(0, purged - local_deletes)
+        if not changes and not purged:
+            return 0
+
+        self._emitting = True
+        try:
+            return self._emit(changes, purged)
+        finally:
+            self._emitting = False
+
+    def _emit(self, changes: List[Tuple[int, str]], purged: int) -> int:
+        emitted = 0
+        with self._events.batch():
+            if len(changes) > MAX_IDS_PER_POLL:
+                self._events.entry_changed.emit(action="import", entry_id=None,
+                                                message=f"{len(changes)} cambios externos")
+                emitted += 1
+            else:
+                for eid, action in changes:
+                    self._events.entry_changed.emit(action=action, entry_id=eid, message="Cambio externo")
+                    emitted += 1
+            if purged:
+                self._events.entry_changed.emit(action="delete", entry_id=None,
+                                                message=f"{purged} eliminadas en otra instancia")
+                emitted += 1
+        return emitted
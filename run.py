@@ -1,4 +1,7 @@
+import multiprocessing
+
 from password_vault.app import main
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # pools de procesos en el ejecutable de PyInstaller
     main()
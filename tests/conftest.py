@@ -0,0 +1,61 @@
+# tests/conftest.py
+# Vaults SQLite temporarios para las pruebas. APPDATA se redirige antes de importar
+# password_vault.db, que crea la carpeta de datos al importarse.
+import os
+import sys
+import tempfile
+
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="pv-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import func, select
+
+from password_vault import sealed
+from password_vault.crypto import encrypt_text
+from password_vault.db import Entry, EntryToken
+from password_vault.vaults import VaultHandle
+
+@pytest.fixture
+def make_vault(tmp_path):
+    """Fábrica de vaults desbloqueados: make_vault(nombre, contraseña)."""
+    handles = []
+
+    def _make(name: str = "vault", password: str = "clave-maestra") -> VaultHandle:
+        path = str(tmp_path / f"{name}.db")
+        h = VaultHandle(name, "sqlite:///" + path)
+        assert h.unlock(password)
+        handles.append(h)
+        return h
+    yield _make
+    for h in handles:
+        h.close()
+
+def add_entries(h: VaultHandle, titles, **fields) -> list:
+    """Crea entradas (selladas si el vault cifra metadatos). Devuelve sus uids."""
+    seal = sealed.is_enabled(h.SessionLocal)
+    with h.SessionLocal() as s:
+        entries = []
+        for title in titles:
+            e = Entry(title=title, username=fields.get("username", "ana"), url=fields.get("url", ""),
+                      notes="", password_encrypted=encrypt_text(h.key, f"pw-{title}"))
+            s.add(e)
+            entries.append(e)
+        s.flush()
+        if seal:
+            for e in entries:
+                sealed.seal_entry(s, h.key, e)
+        s.commit()
+        return [e.uid for e in entries]
+
+def titles_of(h: VaultHandle, include_deleted: bool = False) -> set:
+    with h.SessionLocal() as s:
+        stmt = select(Entry)
+        if not include_deleted:
+            stmt = stmt.where(Entry.deleted_at.is_(None))
+        return {sealed.opened(h.key, e).title for e in s.scalars(stmt)}
+
+def orphan_tokens(h: VaultHandle) -> int:
+    with h.SessionLocal() as s:
+        return s.scalar(select(func.count()).select_from(EntryToken)
+                        .where(EntryToken.entry_id.not_in(select(Entry.id))))
@@ -0,0 +1,118 @@
+# tests/test_bundle_crypto.py
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet
+
+from password_vault import bundle_crypto as bc
+
+CHUNK = 1024
+
+@pytest.fixture
+def key():
+    return Fernet.generate_key()
+
+@pytest.fixture
+def sealed_file(tmp_path, key):
+    """(ruta cifrada, texto plano) con 4 bloques, el último corto."""
+    plain = os.urandom(3 * CHUNK + 100)
+    src, dst = tmp_path / "plain.bin", tmp_path / "sealed.pmvault"
+    src.write_bytes(plain)
+    bc.encrypt_file(str(src), str(dst), key, chunk_size=CHUNK)
+    return dst, plain
+
+def _blocks(path):
+    data = path.read_bytes()
+    body = data[bc.HEADER_SIZE:]
+    stride = CHUNK + bc.TAG_SIZE
+    return data[:bc.HEADER_SIZE], [body[i:i + stride] for i in range(0, len(body), stride)]
+
+def _decrypt(path, key, tmp_path):
+    out = tmp_path / "out.bin"
+    bc.decrypt_file(str(path), str(out), key)
+    return out.read_bytes()
+
+def test_roundtrip(sealed_file, key, tmp_path):
+    path, plain = sealed_file
+    assert bc.is_encrypted_bundle(str(path))
+    assert bc.verify_encrypted_bundle(str(path), key) == 4
+    assert _decrypt(path, key, tmp_path) == plain
+
+def test_reader_random_access(sealed_file, key):
+    path, plain = sealed_file
+    with bc.EncryptedBundleReader(str(path), key) as r:
+        r.seek(CHUNK - 10)
+        assert r.read(50) == plain[CHUNK - 10:CHUNK + 40]
+        r.seek(-20, os.SEEK_END)
+        assert r.read() == plain[-20:]
+
+def test_wrong_key_fails(sealed_file, tmp_path):
+    path, _ = sealed_file
+    with pytest.raises(InvalidTag):
+        _decrypt(path, Fernet.generate_key(), tmp_path)
+
+@pytest.mark.parametrize("where", ["header", "body", "tag"])
+def test_tamper_detected(sealed_file, key, tmp_path, where):
+    path, _ = sealed_file
+    data = bytearray(path.read_bytes())
+    # header: byte reservado (no cambia la geometría, solo la AAD)
+    pos = {"header": 10, "body": bc.HEADER_SIZE + CHUNK + bc.TAG_SIZE + 5, "tag": len(data) - 1}[where]
+    data[pos] ^= 0x01
+    path.write_bytes(bytes(data))
+    with pytest.raises(InvalidTag):
+        _decrypt(path, key, tmp_path)
+
+def test_salt_tamper_detected(sealed_file, key, tmp_path):
+    path, _ = sealed_file
+    data = bytearray(path.read_bytes())
+    data[bc.HEADER_SIZE - 1] ^= 0x01    # último byte del salt
+    path.write_bytes(bytes(data))
+    with pytest.raises(InvalidTag):
+        _decrypt(path, key, tmp_path)
+
+def test_reordered_blocks_detected(sealed_file, key, tmp_path):
+    path, _ = sealed_file
+    header, blocks = _blocks(path)
+    blocks[0], blocks[1] = blocks[1], blocks[0]
+    path.write_bytes(header + b"".join(blocks))
+    with pytest.raises(InvalidTag):
+        _decrypt(path, key, tmp_path)
+
+def test_truncated_at_block_boundary_detected(sealed_file, key, tmp_path):
+    # Sin el último bloque, el penúltimo queda como final pero se selló como "no último"
+    path, _ = sealed_file
+    header, blocks = _blocks(path)
+    path.write_bytes(header + b"".join(blocks[:-1]))
+    with pytest.raises(InvalidTag):
+        _decrypt(path, key, tmp_path)
+
+def test_truncated_mid_block_detected(sealed_file, key, tmp_path):
+    path, _ = sealed_file
+    path.write_bytes(path.read_bytes()[:-7])
+    with pytest.raises((InvalidTag, ValueError)):
+        _decrypt(path, key, tmp_path)
+
+def test_truncated_header_rejected(sealed_file, key):
+    path, _ = sealed_file
+    path.write_bytes(path.read_bytes()[:bc.HEADER_SIZE - 1])
+    with pytest.raises(ValueError):
+        bc.EncryptedBundleReader(str(path), key)
+
+def test_appended_block_detected(sealed_file, key, tmp_path):
+    # Un bloque final duplicado: el original ya no es el último
+    path, _ = sealed_file
+    header, blocks = _blocks(path)
+    path.write_bytes(header + b"".join(blocks) + blocks[-1])
+    with pytest.raises(InvalidTag):
+        _decrypt(path, key, tmp_path)
+
+def test_zero_chunk_size_rejected(sealed_file, key, tmp_path):
+    path, _ = sealed_file
+    data = bytearray(path.read_bytes())
+    data[12:16] = b"\0\0\0\0"
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        bc.EncryptedBundleReader(str(path), key)
+    with open(tmp_path / "x", "wb") as fh, pytest.raises(ValueError):
+        bc.EncryptingWriter(fh, key, chunk_size=0)
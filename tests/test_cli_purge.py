@@ -0,0 +1,71 @@
+# tests/test_cli_purge.py
+import argparse
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from password_vault import attachments, cli, sealed
+from password_vault.db import Attachment, Chunk, Entry, EntryTombstone, EntryToken
+
+from conftest import add_entries, orphan_tokens, titles_of
+
+def _purge(h, older_than=None, dry_run=False):
+    return cli.cmd_purge(argparse.Namespace(older_than=older_than, dry_run=dry_run), h.SessionLocal)
+
+def _trash(h, uids, when=None):
+    with h.SessionLocal() as s:
+        for e in s.scalars(select(Entry).where(Entry.uid.in_(uids))):
+            e.deleted_at = when or datetime.utcnow()
+        s.commit()
+
+def _count(h, model):
+    with h.SessionLocal() as s:
+        return s.scalar(select(func.count()).select_from(model))
+
+@pytest.fixture
+def sealed_vault(make_vault):
+    h = make_vault()
+    sealed.enable(h.SessionLocal, h.key)
+    return h
+
+def test_purge_sealed_vault_drops_tokens(sealed_vault, capsys):
+    h = sealed_vault
+    uids = add_entries(h, ["gitlab", "github", "correo", "banco"])
+    _trash(h, uids[:2])
+    assert _purge(h) == 0
+
+    out = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert {o["uid"] for o in out} == set(uids[:2]) and all(o["purged"] for o in out)
+    assert titles_of(h, include_deleted=True) == {"correo", "banco"}
+    assert orphan_tokens(h) == 0
+    with h.SessionLocal() as s:
+        assert set(s.scalars(select(EntryTombstone.uid))) == set(uids[:2])
+        ikey = sealed.index_key(h.key)
+        assert s.scalars(select(Entry.uid).where(sealed.token_filter(ikey, "git"))).all() == []
+        assert s.scalars(select(Entry.uid).where(sealed.token_filter(ikey, "banco"))).all() == [uids[3]]
+
+def test_dry_run_and_older_than(sealed_vault):
+    h = sealed_vault
+    uids = add_entries(h, ["vieja", "reciente"])
+    _trash(h, uids[:1], datetime.utcnow() - timedelta(days=40))
+    _trash(h, uids[1:])
+    tokens = _count(h, EntryToken)
+    _purge(h, dry_run=True)
+    assert _count(h, Entry) == 2 and _count(h, EntryToken) == tokens
+
+    _purge(h, older_than=30)
+    assert titles_of(h, include_deleted=True) == {"reciente"}
+    assert orphan_tokens(h) == 0
+
+def test_purge_collects_attachment_chunks(sealed_vault):
+    h = sealed_vault
+    uids = add_entries(h, ["con adjunto"])
+    with h.SessionLocal() as s:
+        entry_id = s.scalar(select(Entry.id).where(Entry.uid == uids[0]))
+    attachments.add_attachment(h.SessionLocal, h.key, entry_id, io.BytesIO(b"x" * 5000), "a.txt")
+    _trash(h, uids)
+    _purge(h)
+    assert _count(h, Attachment) == 0 and _count(h, Chunk) == 0
@@ -0,0 +1,99 @@
+# tests/test_pmvault_chain.py
+import shutil
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from password_vault.db import Entry, EntryTombstone
+from password_vault.pmvault_bundle import apply_pmvault_chain, export_unified_pmvault, read_bundle_meta
+from password_vault.vaults import VaultHandle
+
+from conftest import add_entries, titles_of
+
+PASSWORD = "clave-maestra"
+
+@pytest.fixture
+def pair(make_vault, tmp_path):
+    """Origen A y destino B vacío con la misma clave (copia del vault recién creado)."""
+    a = make_vault("a", PASSWORD)
+    a.engine.dispose()
+    shutil.copy(tmp_path / "a.db", tmp_path / "b.db")
+    b = VaultHandle("b", "sqlite:///" + str(tmp_path / "b.db"))
+    assert b.unlock(PASSWORD)
+    yield a, b
+    b.close()
+
+def _export(h, path, since=None, encrypt=False):
+    time.sleep(0.01)      # watermarks distintos entre exportaciones seguidas
+    export_unified_pmvault(h.SessionLocal, h.key, str(path), since=since, encrypt=encrypt)
+    return read_bundle_meta(str(path), h.key)
+
+def _edit(h, uid, **values):
+    with h.SessionLocal() as s:
+        e = s.execute(select(Entry).where(Entry.uid == uid)).scalar_one()
+        for k, v in values.items():
+            setattr(e, k, v)
+        s.commit()
+
+def _purge(h, uid):
+    with h.SessionLocal() as s:
+        s.delete(s.execute(select(Entry).where(Entry.uid == uid)).scalar_one())
+        s.commit()
+
+def test_chain_replays_edits_deletes_and_purges(pair, tmp_path):
+    a, b = pair
+    uids = add_entries(a, [f"e{i}" for i in range(5)])
+    base = _export(a, tmp_path / "base.pmvault")
+
+    _edit(a, uids[1], title="e1 editada")
+    _edit(a, uids[3], deleted_at=datetime.utcnow())
+    _purge(a, uids[2])
+    add_entries(a, ["nueva"])
+    d1 = _export(a, tmp_path / "d1.pmvault", since=base["watermark"], encrypt=True)
+    assert d1["mode"] == "delta"
+
+    _edit(a, uids[0], title="e0 editada")
+    _purge(a, uids[4])
+    _export(a, tmp_path / "d2.pmvault", since=d1["watermark"])
+
+    paths = [str(tmp_path / n) for n in ("base.pmvault", "d1.pmvault", "d2.pmvault")]
+    res = apply_pmvault_chain(b.SessionLocal, b.key, paths)
+    assert [r["mode"] for r in res] == ["full", "delta", "delta"]
+
+    assert titles_of(b, include_deleted=True) == titles_of(a, include_deleted=True)
+    assert titles_of(b) == {"e0 editada", "e1 editada", "nueva"}
+    with b.SessionLocal() as s:
+        assert s.execute(select(Entry.deleted_at).where(Entry.uid == uids[3])).scalar_one() is not None
+        assert not s.scalars(select(Entry).where(Entry.uid.in_([uids[2], uids[4]]))).all()
+        assert {uids[2], uids[4]} <= set(s.scalars(select(EntryTombstone.uid)))
+
+def test_chain_is_idempotent(pair, tmp_path):
+    a, b = pair
+    uids = add_entries(a, ["x", "y"])
+    base = _export(a, tmp_path / "base.pmvault")
+    _edit(a, uids[0], title="x2")
+    _export(a, tmp_path / "d1.pmvault", since=base["watermark"])
+    paths = [str(tmp_path / "base.pmvault"), str(tmp_path / "d1.pmvault")]
+    apply_pmvault_chain(b.SessionLocal, b.key, paths)
+    apply_pmvault_chain(b.SessionLocal, b.key, paths)
+    with b.SessionLocal() as s:
+        assert len(s.scalars(select(Entry)).all()) == 2
+    assert titles_of(b) == {"x2", "y"}
+
+def test_gap_in_chain_rejected_before_writing(pair, tmp_path):
+    a, b = pair
+    add_entries(a, ["x"])
+    base = _export(a, tmp_path / "base.pmvault")
+    add_entries(a, ["y"])
+    d1 = _export(a, tmp_path / "d1.pmvault", since=base["watermark"])
+    add_entries(a, ["z"])
+    _export(a, tmp_path / "d2.pmvault", since=d1["watermark"])
+    # Falta d1: d2 empieza después de la watermark de la base
+    with pytest.raises(ValueError):
+        apply_pmvault_chain(b.SessionLocal, b.key, [str(tmp_path / "base.pmvault"), str(tmp_path / "d2.pmvault")])
+    # Una exportación completa tampoco vale como eslabón
+    with pytest.raises(ValueError):
+        apply_pmvault_chain(b.SessionLocal, b.key, [str(tmp_path / "base.pmvault")] * 2)
+    assert titles_of(b) == set()
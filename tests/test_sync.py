@@ -0,0 +1,130 @@
+# tests/test_sync.py
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from password_vault import sealed
+from password_vault.crypto import decrypt_text, encrypt_text
+from password_vault.db import Entry, EntryTombstone
+from password_vault.sync import SyncSide, sync_vaults
+
+from conftest import add_entries, orphan_tokens, titles_of
+
+@pytest.fixture
+def vaults(make_vault):
+    """Dos vaults con contraseñas (y claves) distintas."""
+    return make_vault("a", "alfa"), make_vault("b", "beta")
+
+def _sync(a, b, **kw):
+    return sync_vaults(a.SessionLocal, a.key, b.SessionLocal, b.key, **kw)
+
+def _entry(h, uid):
+    with h.SessionLocal() as s:
+        return s.execute(select(Entry).where(Entry.uid == uid)).scalar_one_or_none()
+
+def _edit(h, uid, **values):
+    with h.SessionLocal() as s:
+        e = s.execute(select(Entry).where(Entry.uid == uid)).scalar_one()
+        for k, v in values.items():
+            setattr(e, k, v)
+        if e.meta_encrypted is not None:
+            sealed.seal_entry(s, h.key, e)
+        s.commit()
+
+def _purge(h, uid):
+    with h.SessionLocal() as s:
+        s.delete(s.execute(select(Entry).where(Entry.uid == uid)).scalar_one())
+        s.commit()
+
+def test_initial_sync_copies_both_ways(vaults):
+    a, b = vaults
+    ua = add_entries(a, ["a1", "a2"])
+    add_entries(b, ["b1"])
+    r = _sync(a, b)
+    assert r["a_to_b"] == {"copied": 2, "purged": 0}
+    assert r["b_to_a"] == {"copied": 1, "purged": 0}
+    assert titles_of(a) == titles_of(b) == {"a1", "a2", "b1"}
+    # La contraseña se re-cifra con la clave del destino
+    assert decrypt_text(b.key, _entry(b, ua[0]).password_encrypted) == "pw-a1"
+
+def test_noop_sync_does_not_decrypt(vaults, monkeypatch):
+    a, b = vaults
+    add_entries(a, [f"t{i}" for i in range(20)])
+    _sync(a, b)
+    calls = []
+    orig = SyncSide._content
+    monkeypatch.setattr(SyncSide, "_content", lambda self, r: calls.append(r) or orig(self, r))
+    r = _sync(a, b)
+    assert r["buckets"] == 0 and calls == []
+
+def test_newer_edit_wins_either_side(vaults):
+    a, b = vaults
+    u1, u2 = add_entries(a, ["x", "y"])
+    _sync(a, b)
+    _edit(a, u1, title="x desde A")
+    _edit(b, u2, title="y desde B", password_encrypted=encrypt_text(b.key, "nueva"))
+    r = _sync(a, b)
+    assert r["a_to_b"]["copied"] == 1 and r["b_to_a"]["copied"] == 1
+    assert titles_of(a) == titles_of(b) == {"x desde A", "y desde B"}
+    assert decrypt_text(a.key, _entry(a, u2).password_encrypted) == "nueva"
+
+def test_soft_delete_propagates(vaults):
+    a, b = vaults
+    (u,) = add_entries(a, ["x"])
+    _sync(a, b)
+    _edit(b, u, deleted_at=datetime.utcnow())
+    _sync(a, b)
+    assert _entry(a, u).deleted_at is not None
+
+@pytest.mark.parametrize("purged_on", ["a", "b"])
+def test_purge_propagates_with_tombstone(vaults, purged_on):
+    a, b = vaults
+    u, keep = add_entries(a, ["borrar", "seguir"])
+    _sync(a, b)
+    src, dst = (a, b) if purged_on == "a" else (b, a)
+    _purge(src, u)
+    r = _sync(a, b)
+    assert r["a_to_b" if purged_on == "a" else "b_to_a"]["purged"] == 1
+    assert _entry(dst, u) is None and _entry(dst, keep) is not None
+    with dst.SessionLocal() as s:
+        assert s.scalar(select(EntryTombstone.uid).where(EntryTombstone.uid == u)) == u
+    # Con la tombstone en los dos lados ya no hay nada que hacer
+    assert _sync(a, b)["buckets"] == 0
+
+def test_edit_after_purge_resurrects(vaults):
+    a, b = vaults
+    (u,) = add_entries(a, ["x"])
+    _sync(a, b)
+    _purge(a, u)
+    with a.SessionLocal() as s:      # purga antigua: la edición de B es posterior
+        s.execute(EntryTombstone.__table__.update().values(purged_at=datetime(2000, 1, 1)))
+        s.commit()
+    _edit(b, u, title="x editada")
+    _sync(a, b)
+    assert _entry(a, u) is not None and titles_of(a) == {"x editada"}
+
+def test_dry_run_writes_nothing(vaults):
+    a, b = vaults
+    add_entries(a, ["x"])
+    r = _sync(a, b, dry_run=True)
+    assert r["a_to_b"]["copied"] == 1
+    assert titles_of(b) == set()
+
+def test_sync_into_sealed_vault(vaults):
+    a, b = vaults
+    sealed.enable(b.SessionLocal, b.key)
+    ua = add_entries(a, ["claro"])
+    ub = add_entries(b, ["sellada"])
+    _sync(a, b)
+    copied = _entry(b, ua[0])
+    assert copied.meta_encrypted is not None and copied.title != "claro"
+    assert sealed.opened(b.key, copied).title == "claro"
+    with b.SessionLocal() as s:
+        hits = s.scalars(select(Entry.uid).where(sealed.token_filter(sealed.index_key(b.key), "claro"))).all()
+    assert hits == ua
+    # B -> A: en A (sin cifrar) la copia es legible con la clave de A
+    assert sealed.opened(a.key, _entry(a, ub[0])).title == "sellada"
+    _purge(a, ua[0])
+    _sync(a, b)
+    assert _entry(b, ua[0]) is None and orphan_tokens(b) == 0